@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from qualia2.core import *
+from qualia2.nn import Embedding
+from qualia2.nlp.util import EmbeddingIndex, IVFIndex
+import numpy
+import tempfile
+import time
+import argparse
+
+def latency(fn, queries):
+    times = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q))
+        times.append(time.perf_counter()-start)
+    times = numpy.array(times)*1e3
+    return results, numpy.percentile(times, 50), numpy.percentile(times, 99)
+
+def recall(exact, approx):
+    return numpy.mean([len(set(e) & set(a))/len(e) for e, a in zip(exact, approx)])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recall@k vs. latency of IVFIndex against the exact search of EmbeddingIndex with Qualia2.0')
+    parser.add_argument('-v', '--vocab', type=int, default=200000, help='Vocabulary size. Default: 200000')
+    parser.add_argument('-d', '--dim', type=int, default=100, help='Embedding size. Default: 100')
+    parser.add_argument('-k', '--topk', type=int, default=10, help='Number of neighbours. Default: 10')
+    parser.add_argument('-q', '--queries', type=int, default=200, help='Number of queries. Default: 200')
+    parser.add_argument('-c', '--clusters', type=int, default=2000, help='Number of topics the synthetic word vectors are drawn around. Default: 2000')
+
+    args = parser.parse_args()
+    # word vectors are clustered around topics as trained embeddings are, whereas i.i.d. gaussian rows have no neighbours to find
+    rng = numpy.random.default_rng(0)
+    topics = rng.standard_normal((args.clusters, args.dim))
+    embedding = Embedding(args.vocab, args.dim)
+    embedding.weight.data = np.asarray(topics[rng.integers(0, args.clusters, args.vocab)] + 1.2*rng.standard_normal((args.vocab, args.dim)), dtype='float32')
+    word2idx = {'w{}'.format(i): i for i in range(args.vocab)}
+    queries = ['w{}'.format(i) for i in rng.choice(args.vocab, args.queries, replace=False)]
+
+    exact = EmbeddingIndex(word2idx, embedding)
+    exact.most_similar(queries[0], args.topk)
+    truth, p50, p99 = latency(lambda q: [w for w, _ in exact.most_similar(q, args.topk)], queries)
+    print('[*] {:<24} recall@{}: {:.3f}  p50: {:7.3f} ms  p99: {:7.3f} ms'.format('exact', args.topk, 1.0, p50, p99))
+
+    start = time.time()
+    ivf = IVFIndex.build(word2idx, embedding, seed=0)
+    print('[*] built {} in {:.1f} s'.format(ivf, time.time()-start))
+    with tempfile.TemporaryDirectory() as path:
+        ivf.save(path)
+        for nprobe in [1, 4, 8, 16, 32]:
+            index = IVFIndex.load(path, nprobe)
+            found, p50, p99 = latency(lambda q: [w for w, _ in index.most_similar(q, args.topk)], queries)
+            print('[*] {:<24} recall@{}: {:.3f}  p50: {:7.3f} ms  p99: {:7.3f} ms'.format('ivf (mmap) nprobe={}'.format(nprobe), args.topk, recall(truth, found), p50, p99))
+            del index
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import qualia2
+from qualia2.core import *
+from qualia2.vision import ResNet
+from qualia2.functions import mse_loss, set_conv_memory_saving
+from qualia2.nn import SGD
+import subprocess
+import resource
+import sys
+import time
+import argparse
+
+def train(args):
+    set_conv_memory_saving(args.mode == 'memory_saving')
+    model = ResNet.resnet18()
+    optim = SGD(model.params, 0.01)
+    x = qualia2.randn(args.batch, 3, args.size, args.size)
+    target = qualia2.zeros((args.batch, 1000), dtype=qualia2.get_default_dtype())
+    start = time.time()
+    for _ in range(args.steps):
+        output = model(x)
+        loss = mse_loss(output, target)
+        model.zero_grad()
+        loss.backward()
+        optim.step()
+    elapsed = (time.time()-start)/args.steps
+    # ru_maxrss is reported in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+    print('[*] {:<14} peak RSS: {:8.1f} MB  time/step: {:6.2f} s'.format(args.mode, peak, elapsed))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Peak memory of ResNet-18 training with and without the memory-saving conv mode with Qualia2.0')
+    parser.add_argument('mode', metavar='str', type=str, nargs='?', choices=['default', 'memory_saving'], help='run only one mode in this process. Both modes are run in separate processes if omitted.')
+    parser.add_argument('-b', '--batch', type=int, default=8, help='Batch size. Default: 8')
+    parser.add_argument('-s', '--size', type=int, default=112, help='Height and width of the input images. Default: 112')
+    parser.add_argument('-n', '--steps', type=int, default=2, help='Number of training steps. Default: 2')
+
+    args = parser.parse_args()
+    if args.mode is None:
+        for mode in ['default', 'memory_saving']:
+            subprocess.run([sys.executable, __file__, mode, '-b', str(args.batch), '-s', str(args.size), '-n', str(args.steps)], check=True)
+    else:
+        train(args)
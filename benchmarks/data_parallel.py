@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import qualia2
+from qualia2.core import *
+from qualia2.nn import Sequential, Linear, ReLU, SGD
+from qualia2.data import DataLoader
+from qualia2.functions import mse_loss
+from qualia2.util import Trainer, DataParallelTrainer
+import numpy
+import os
+import subprocess
+import sys
+import time
+import argparse
+
+class Synthetic(DataLoader):
+    def __init__(self, num_data, features, classes):
+        super().__init__()
+        rng = numpy.random.default_rng(0)
+        self.train_data = rng.standard_normal((num_data, features)).astype('float32')
+        self.train_label = numpy.eye(classes, dtype='float32')[rng.integers(0, classes, num_data)]
+
+def train(args):
+    qualia2.manual_seed(0)
+    data = Synthetic(args.batch*args.steps, args.features, 10)
+    model = Sequential(Linear(args.features, args.hidden), ReLU(), Linear(args.hidden, args.hidden), ReLU(), Linear(args.hidden, 10))
+    optim = SGD(model.params, 0.01, momentum=0.9)
+    trainer = DataParallelTrainer(args.batch, args.workers) if args.workers > 1 else Trainer(args.batch)
+    trainer.after_train = lambda: None
+    start = time.time()
+    trainer.train(model, data, optim, mse_loss, epochs=1)
+    elapsed = time.time()-start
+    print('\n[*] workers: {:>3}  samples/sec: {:10.1f}'.format(args.workers, args.batch*args.steps/elapsed))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput of DataParallelTrainer against the single-process Trainer with Qualia2.0')
+    parser.add_argument('workers', metavar='int', type=int, nargs='?', help='run only this number of workers in this process. 1, 2, 4, ... up to the number of cores are run in separate processes if omitted.')
+    parser.add_argument('-b', '--batch', type=int, default=512, help='Batch size. Default: 512')
+    parser.add_argument('-n', '--steps', type=int, default=20, help='Number of training steps. Default: 20')
+    parser.add_argument('-f', '--features', type=int, default=512, help='Number of input features. Default: 512')
+    parser.add_argument('-d', '--hidden', type=int, default=1024, help='Hidden size of the MLP. Default: 1024')
+
+    args = parser.parse_args()
+    if args.workers is None:
+        workers = 1
+        while workers <= os.cpu_count():
+            # each process gets its share of the cores for BLAS
+            env = dict(os.environ, OMP_NUM_THREADS=str(max(os.cpu_count()//workers, 1)))
+            subprocess.run([sys.executable, __file__, str(workers), '-b', str(args.batch), '-n', str(args.steps), '-f', str(args.features), '-d', str(args.hidden)], check=True, env=env)
+            workers *= 2
+    else:
+        train(args)
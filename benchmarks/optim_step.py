@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from qualia2.core import *
+from qualia2.vision import ResNet
+from qualia2.nn import SGD, Adam, Nadam, RAdam
+import numpy
+import time
+import argparse
+
+optimizers = {
+    'sgd': lambda params: SGD(params, 0.01, momentum=0.9, weight_decay=1e-4),
+    'adam': lambda params: Adam(params, 0.001),
+    'nadam': lambda params: Nadam(params, 0.001),
+    'radam': lambda params: RAdam(params, 0.001),
+}
+
+def bench(name, flat, args):
+    model = ResNet.resnet18()
+    if flat:
+        model.flatten()
+    params = [var for var in model.params() if var.requires_grad]
+    rng = numpy.random.default_rng(0)
+    for var in params:
+        grad = np.asarray(rng.standard_normal(var.shape), dtype=var.data.dtype)
+        if var.flat_view:
+            var.grad[...] = grad
+        else:
+            var.grad = grad
+    optim = optimizers[name](model.params)
+    optim.step()
+    if gpu:
+        np.cuda.Stream.null.synchronize()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        optim.step()
+    if gpu:
+        np.cuda.Stream.null.synchronize()
+    elapsed = (time.perf_counter()-start)/args.steps*1e3
+    print('[*] {:<6} {:<10} params: {:>9}  time/step: {:8.2f} ms'.format(name, 'flat' if flat else 'per-param', sum(var.data.size for var in params), elapsed))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time of an optimizer step over the parameters of ResNet-18 with and without the flat buffers with Qualia2.0')
+    parser.add_argument('-o', '--optim', type=str, nargs='*', default=list(optimizers), choices=list(optimizers), help='Optimizers to time. Default: all')
+    parser.add_argument('-n', '--steps', type=int, default=10, help='Number of timed steps. Default: 10')
+
+    args = parser.parse_args()
+    for name in args.optim:
+        for flat in [False, True]:
+            bench(name, flat, args)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import qualia2
+from qualia2.core import *
+from qualia2.autograd import Tensor
+import timeit
+import argparse
+
+def bench(stmt, number, repeat):
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e6
+
+def construct(x):
+    return lambda: Tensor(x)
+
+def elementwise(a, b):
+    return lambda: a * b + a
+
+def chain(x, length):
+    def fn():
+        h = x
+        for _ in range(length):
+            h = h * 0.5 + x
+        h.backward()
+    return fn
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-op overhead of Tensor with Qualia2.0')
+    parser.add_argument('-s', '--size', type=int, default=4, help='Number of elements of each Tensor. Default: 4')
+    parser.add_argument('-l', '--length', type=int, default=1000, help='Number of ops in the chain that is differentiated. Default: 1000')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='Number of calls per timing. Default: 1000')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of timings, the best one is reported. Default: 5')
+
+    args = parser.parse_args()
+    data = np.random.randn(args.size).astype(qualia2.get_default_dtype())
+    a = Tensor(data)
+    b = Tensor(data)
+
+    print('[*] Tensor construction:      {:8.2f} us'.format(bench(construct(data), args.number, args.repeat)))
+    print('[*] a * b + a (forward):      {:8.2f} us'.format(bench(elementwise(a, b), args.number, args.repeat)))
+    per_op = bench(chain(a, args.length), max(args.number//args.length, 1), args.repeat) / (2*args.length)
+    print('[*] forward+backward per op:  {:8.2f} us'.format(per_op))
@@ -18,16 +18,16 @@ def copy(tensor):
 def numel(obj):
     return _mul(*obj.shape)
 
-def array(obj, dtype='float64'):
+def array(obj, dtype=None):
     return Tensor(np.array(obj), dtype=dtype)
 
-def arange(*args, dtype='float64'):
+def arange(*args, dtype=None):
     return Tensor(np.arange(*args), dtype=dtype)
 
-def empty(shape, dtype='float64'):
+def empty(shape, dtype=None):
     return Tensor(np.empty(shape), dtype=dtype)
 
-def empty_like(obj, dtype='float64'):
+def empty_like(obj, dtype=None):
     return Tensor(np.empty(obj.shape), dtype=dtype)
 
 def zeros(shape, dtype='int64'):
@@ -42,17 +42,17 @@ def ones(shape, dtype='int64'):
 def ones_like(obj, dtype='int64'):
     return Tensor(np.ones(obj.shape), dtype=dtype)
 
-def rand(*args, dtype='float64'):
+def rand(*args, dtype=None):
     return Tensor(np.random.rand(*args), dtype=dtype)
 
-def rand_like(obj, dtype='float64'):
+def rand_like(obj, dtype=None):
     return Tensor(np.random.rand(*obj.shape), dtype=dtype)
 
-def randn(*args, dtype='float64'):
+def randn(*args, dtype=None):
     return Tensor(np.random.randn(*args), dtype=dtype)
 
-def randn_like(obj, dtype='float64'):
+def randn_like(obj, dtype=None):
     return Tensor(np.random.randn(*obj.shape), dtype=dtype)
 
-def uniform(*args, dtype='float64'):
+def uniform(*args, dtype=None):
     return Tensor(np.random.uniform(*args), dtype=dtype)
@@ -1,21 +1,46 @@
 # -*- coding: utf-8 -*- 
 from .core import *
-from functools import reduce
+from functools import reduce, wraps
+
+_default_dtype = 'float32'
+
+def get_default_dtype():
+    '''Returns the data type of Tensors created without an explicit dtype.
+    '''
+    return _default_dtype
+
+def set_default_dtype(dtype):
+    '''Sets the data type of Tensors created without an explicit dtype.\n
+    Functions and modules create their results and parameters as Tensors without an explicit dtype, 
+    hence this setting is respected through the whole model.
+    Args:
+        dtype (str): data type such as 'float32' or 'float64'
+    '''
+    global _default_dtype
+    _default_dtype = np.dtype(dtype).name
 
 class Tensor(object):
     '''Wrapper class to execute automatic differentiation\n 
     Args: 
         data (ndarray|int|float): tensor to compute the automatic differentiation 
         requires_grad (bool): Whether to store grads. If False is set, grad of the Tensor will be zeros. Default: True
-        dtype (str): data type of the tensor Default: 'float64'
+        dtype (str): data type of the tensor. If None, complex data keeps its type and other data is converted to get_default_dtype(). Default: None
      
     Attributes: 
         data (ndarray): Stores data of the Tensor 
         grad (ndarray): Stores gradients of the Tensor  
         creator (Function): Stores the creator of the Tensor, which will be called at the backpropagation. 
         requires_grad (bool): Whether to store grads. If False is set, grad of the Tensor will be zeros. 
-        shape (tuple): Stores the shape of Tensor's data 
-        ndim (int): Stores the number of Tensor's data dimentions  
+        hook (callable): Applied to each gradient that flows into the Tensor. Set by register_hook.
+        flat_view (bool): True if data and grad are views into the flat buffers of a Module (see Module.flatten), 
+            in which case gradients are accumulated into grad in place and zero_grad zeroes it instead of releasing it.
+        version (int): Counts the in place writes to data by Module.load, Optimizer.step and __setitem__, so that caches derived from data can tell it changed.
+        shape (tuple): Shape of Tensor's data 
+        ndim (int): Number of Tensor's data dimentions  
+        dtype (str): Data type of Tensor's data. Assigning it casts the data.
+
+    Note:
+        An ndarray that already has the requested dtype is not copied, so the Tensor shares its buffer.
      
     Examples:: 
         The following example will compute the dy/dx
@@ -29,30 +54,93 @@ class Tensor(object):
         >>> # Print gradient 
         >>> print(x.grad)
     ''' 
-    def __init__(self, data, requires_grad=True, dtype='float64'):
-        super().__setattr__('hook', None) 
+    __slots__ = ('data', 'grad', 'creator', 'requires_grad', 'hook', 'flat_view', 'version', '__weakref__')
+
+    def __init__(self, data, requires_grad=True, dtype=None):
         if type(data) is not np.ndarray: 
             import numpy
             if type(data) is list or type(data) is numpy.ndarray:
-                self.data = np.array(data).astype(dtype)
+                data = np.asarray(data)
             else: 
-                self.data = np.array([data], dtype=dtype)
-        else:
-            self.data = data.astype(dtype)
-        self.dtype = dtype
+                data = np.array([data])
+        if dtype is None:
+            dtype = data.dtype if data.dtype.kind == 'c' else _default_dtype
+        self.data = data.astype(dtype, copy=False)
         self.grad = None
         self.creator = None
         self.requires_grad = requires_grad
-
-    def backward(self, *args):
+        self.hook = None
+        self.flat_view = False
+        self.version = 0
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def ndim(self):
+        return self.data.ndim
+
+    @property
+    def dtype(self):
+        return self.data.dtype.name
+
+    @dtype.setter
+    def dtype(self, value):
+        self.data = self.data.astype(value, copy=False)
+
+    def backward(self, *args, retain_graph=False):
+        '''Computes the gradients of the graph that ends with this Tensor.\n
+        The graph is collected once and visited in reverse topological order, so that
+        the gradient of each node is fully accumulated before its creator is called exactly once.
+        Args:
+            *args (ndarray): gradient of this Tensor. Default: ones
+            retain_graph (bool): if False, each creator releases its saved Tensors and buffers once its gradients are propagated. 
+                Set True to call backward on the same graph more than once. Default: False
+        Raises:
+            RuntimeError: if the backward reaches a creator released by a previous backward
+        '''
         if not bool(args):
-            args = [np.ones_like(self.data, dtype=self.dtype)]     
-        if self.creator is None:
-            self.grad = args[0]
-        else:
-            self.creator.backward(*args) 
+            args = [np.ones_like(self.data, dtype=self.dtype)]
+        graph = self.topological_sort()
+        for var in graph:
+            if var.creator is not None:
+                var.grad = None
+        self.grad = args[0] if self.hook is None else self.hook(args[0])
+        for var in graph:
+            if var.creator is None:
+                continue
+            if var.grad is not None:
+                if var.creator.released:
+                    raise RuntimeError('[*] trying to backward through the graph a second time, but {} was already freed. Specify retain_graph=True when calling backward the first time.'.format(var.creator.__class__.__name__))
+                var.creator.backward(var.grad)
+            if not retain_graph:
+                # the released creator stays on the Tensor, so that a later backward through it fails instead of treating it as a leaf
+                var.creator.release()
+
+    def topological_sort(self):
+        '''Returns the Tensors of the graph that ends with this Tensor in reverse topological order.\n
+        The graph is traversed iteratively, hence deep graphs do not hit the recursion limit.
+        '''
+        order = []
+        visited = set()
+        stack = [(self, False)]
+        while stack:
+            var, expanded = stack.pop()
+            if expanded:
+                order.append(var)
+                continue
+            if id(var) in visited:
+                continue
+            visited.add(id(var))
+            stack.append((var, True))
+            if var.creator is not None:
+                for v in var.creator.var:
+                    if isinstance(v, Tensor) and id(v) not in visited:
+                        stack.append((v, False))
+        return order[::-1]
 
-    def set_creator(self, obj): 
+    def set_creator(self, obj):
         self.creator = obj     
         
     def asnumpy(self):
@@ -69,11 +157,11 @@ class Tensor(object):
             return self.grad
     
     def uniform(self, low=0, high=1):
-        self.data = np.random.uniform(low=low, high=high, size=self.shape)
+        self.data = np.random.uniform(low=low, high=high, size=self.shape).astype(self.dtype)
         self.creator = None
 
     def normal(self, mean=0, std=1):
-        self.data = np.random.normal(loc=mean, scale=std, size=self.shape)
+        self.data = np.random.normal(loc=mean, scale=std, size=self.shape).astype(self.dtype)
         self.creator = None
 
     def ones(self):
@@ -90,11 +178,11 @@ class Tensor(object):
     
     def copy(self, data):
         if isinstance(data, np.ndarray):
-            self.data = np.copy(data)    
+            self.data = np.array(data, dtype=self.dtype)    
         else:
             import numpy
             if isinstance(data, numpy.ndarray):
-                self.data = np.array(data)
+                self.data = np.array(data, dtype=self.dtype)
             else:
                 raise ValueError
     
@@ -124,7 +212,7 @@ class Tensor(object):
         return Expand_dims.forward(self, axis)
     
     def detach(self):
-        '''Returns a new Tensor, detached from the current graph.
+        '''Returns a new Tensor, detached from the current graph. The data is shared with this Tensor.
         '''
         return Tensor(self.data, dtype=self.dtype)
     
@@ -132,6 +220,10 @@ class Tensor(object):
         return Clamp.forward(self, low, high)
     
     def register_hook(self, hook):
+        '''Registers a hook that is called with each gradient flowing into this Tensor during backward.\n
+        Args:
+            hook (callable): takes the gradient (ndarray) and returns the gradient to be accumulated instead.
+        '''
         self.hook = hook
     
     def __str__(self):
@@ -140,22 +232,12 @@ class Tensor(object):
     def __repr__(self):
         return '{}({}, requires_grad={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.data, self.requires_grad, id(self), 16)
 
-    def __setattr__(self, key, value):   
-        super().__setattr__(key, value)
-        if key == 'data':
-            super().__setattr__('shape', self.data.shape)
-            super().__setattr__('ndim', self.data.ndim) 
-        if key == 'dtype':
-            super().__setattr__('data', self.data.astype(value)) 
-        if self.hook is not None:
-            if key == 'grad':
-                super().__setattr__('grad', self.hook(value))
-
     def __getitem__(self, slice):
         return Slice.forward(self, slice)
     
     def __setitem__(self, idx, obj):
         self.data[idx] = obj
+        self.version += 1
 
     def __len__(self): 
         return self.ndim
@@ -208,6 +290,114 @@ class Tensor(object):
     def __rpow__(self, other): 
         raise Exception('__rpow__ is not defined.')
 
+class SparseGrad(object):
+    '''Row-sparse gradient of a 2D parameter such as an embedding matrix.\n
+    Only the rows that were looked up are stored. Duplicate indices are coalesced on construction,
+    hence indices are unique and sorted, and values holds the summed gradient of each row.
+    Args:
+        indices (ndarray): row indices of any shape
+        values (ndarray): gradient rows with shape indices.shape + (shape[1],)
+        shape (tuple of int): shape of the dense gradient
+    Attributes:
+        indices (ndarray): unique row indices in ascending order
+        values (ndarray): summed gradient of each row in indices
+        shape (tuple of int): shape of the dense gradient
+    '''
+    __slots__ = ('indices', 'values', 'shape')
+
+    def __init__(self, indices, values, shape):
+        self.shape = tuple(shape)
+        self.indices, self.values = SparseGrad.coalesce(np.asarray(indices, dtype='int64').reshape(-1), values.reshape(-1, self.shape[1]), self.shape)
+
+    @staticmethod
+    def coalesce(indices, values, shape):
+        order = np.argsort(indices)
+        indices = indices[order]
+        values = values[order]
+        boundary = indices[1:] != indices[:-1]
+        if bool(boundary.all()):
+            return indices, values
+        if gpu:
+            inverse = np.concatenate((np.zeros(1, dtype='int64'), np.cumsum(boundary)))
+            rows = np.zeros((int(inverse[-1])+1, shape[1]), dtype=values.dtype)
+            np.scatter_add(rows, inverse, values)
+        else:
+            rows = np.add.reduceat(values, np.concatenate(([0], np.flatnonzero(boundary)+1)), axis=0)
+        return indices[np.concatenate((np.ones(1, dtype=bool), boundary))], rows
+
+    def __repr__(self):
+        return '{}(nnz={}, shape={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.indices.size, self.shape, id(self), 16)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def todense(self):
+        result = np.zeros(self.shape, dtype=self.values.dtype)
+        result[self.indices] = self.values
+        return result
+
+    def __add__(self, other):
+        if isinstance(other, SparseGrad):
+            assert self.shape == other.shape
+            return SparseGrad(np.concatenate((self.indices, other.indices)), np.concatenate((self.values, other.values)), self.shape)
+        result = np.array(other, dtype=np.result_type(other, self.values), copy=True)
+        result[self.indices] += self.values
+        return result
+
+    __radd__ = __add__
+
+_grad_enabled = True
+
+def is_grad_enabled():
+    '''Returns True if the computational graph is currently recorded.
+    '''
+    return _grad_enabled
+
+def set_grad_enabled(mode):
+    '''Globally enables or disables the construction of the computational graph.\n
+    Args:
+        mode (bool): if False, functions neither set a creator nor keep their inputs and intermediates for calc_grad.
+    '''
+    global _grad_enabled
+    _grad_enabled = bool(mode)
+
+class no_grad(object):
+    '''Context-manager that disables the construction of the computational graph.\n
+    Functions called in this context do not set a creator to their results, so that no inputs, masks, indices or
+    im2col buffers are kept alive. It can also be used as a decorator.
+
+    Examples::
+        >>> with qualia2.no_grad():
+        >>>     output = model(x)
+        >>> # as a decorator
+        >>> @qualia2.no_grad()
+        >>> def predict(x):
+        >>>     return model(x)
+    '''
+    def __enter__(self):
+        self.prev = is_grad_enabled()
+        set_grad_enabled(False)
+
+    def __exit__(self, *args):
+        set_grad_enabled(self.prev)
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.__class__():
+                return fn(*args, **kwargs)
+        return wrapper
+
+inference_mode = no_grad
+
+class enable_grad(no_grad):
+    '''Context-manager that enables the construction of the computational graph inside a no_grad context.
+    '''
+    def __enter__(self):
+        self.prev = is_grad_enabled()
+        set_grad_enabled(True)
+
 class Function(object):
     '''
     All function should inherit this class. 
@@ -215,17 +405,21 @@ class Function(object):
     Attributes:
         output_shape (tuple of int): output shape of a function
         var (tuple of Tensor): Tensor(s) that was feeded
+        released (bool): True once release freed the inputs after a backward without retain_graph
     '''
     def __init__(self, output_shape, *args, **kwargs):
         self.output_shape = output_shape
         self.var = args
         self.kwargs = kwargs
+        self.released = False
         
     def __call__(self, *args, **kwargs):
         return self.forward(*args, **kwargs)
     
     @classmethod
     def prepare(cls, output_shape, *args, **kwargs):
+        if not _grad_enabled:
+            return None
         return cls(output_shape, *args, **kwargs)
 
     @staticmethod
@@ -235,6 +429,13 @@ class Function(object):
     def calc_grad(self, *args):
         raise NotImplementedError
 
+    def release(self):
+        '''Frees the input Tensors and the intermediates saved for calc_grad.
+        '''
+        self.var = ()
+        self.kwargs = {}
+        self.released = True
+
     @staticmethod
     def handle_broadcast(arg, trg):
         if arg.shape != trg.shape:
@@ -257,21 +458,28 @@ class Function(object):
         return arg    
 
     def backward(self, *args):
+        '''Accumulates the gradients of the inputs. Propagation to the rest of the graph is handled by Tensor.backward.
+        '''
         grads = self.calc_grad(*args)
         if type(grads) is list:
             grads = tuple(grads)
         if type(grads) is not tuple:
             grads = (grads,)
         for dx, var in zip(grads, self.var):
-            if not var.requires_grad:
+            if dx is None or not var.requires_grad:
                 continue
-            if var.grad is None:
+            if var.hook is not None:
+                dx = var.hook(dx)
+            if var.flat_view:
+                if isinstance(dx, SparseGrad):
+                    var.grad[dx.indices] += dx.values
+                else:
+                    np.add(var.grad, dx, out=var.grad)
+            elif var.grad is None:
                 var.grad = dx
             else:
-                var.grad += dx
-        for var in self.var:
-            if var.creator is not None:
-                var.backward(var.grad)
+                # out-of-place since calc_grad may hand the same array to several inputs
+                var.grad = var.grad + dx if isinstance(var.grad, SparseGrad) or isinstance(dx, SparseGrad) else np.add(var.grad, dx)
 
 class Slice(Function):
     @staticmethod
@@ -447,7 +655,7 @@ class Pow(Function):
         return result
 
     def calc_grad(self, dx):
-        return np.multiply(self.var[1].data, np.multiply(np.power(self.var[0].data, np.subtract(self.var[1].data, np.array([1]))), dx)), None
+        return np.multiply(self.var[1].data, np.multiply(np.power(self.var[0].data, np.subtract(self.var[1].data, 1)), dx)), None
 
 class Div(Function):
     '''
@@ -2,6 +2,9 @@
 import os
 import time
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from logging import getLogger, Formatter, FileHandler, StreamHandler
 
 home_dir = os.path.dirname(os.path.abspath(__file__))
@@ -64,3 +67,107 @@ except:
     def to_gpu(obj):
         logger.error('[*] GPU acceleration is disabled.')
         raise Exception('[*] Cannot convert to GPU object.')
+
+@lru_cache(maxsize=None)
+def _blas_threads():
+    for var in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']:
+        if os.environ.get(var, '').isdigit():
+            return max(int(os.environ[var]), 1)
+    try:
+        from threadpoolctl import threadpool_info
+        return max([info['num_threads'] for info in threadpool_info() if info['user_api'] == 'blas'] + [1])
+    except ImportError:
+        # numpy's BLAS uses all cores unless it is limited
+        return os.cpu_count() or 1
+
+_num_threads = int(os.environ.get('QUALIA_NUM_THREADS', os.cpu_count() or 1))
+_executor = None
+_local = threading.local()
+
+def get_num_threads():
+    '''Returns the number of threads of the intra-op thread pool.
+    '''
+    return _num_threads
+
+def set_num_threads(n):
+    '''Sets the number of threads of the intra-op thread pool used by conv and pooling kernels.\n
+    The default is os.cpu_count(), or QUALIA_NUM_THREADS if it is set. Kernels that call BLAS only use 
+    n // (BLAS threads) of them, so that the pool does not oversubscribe the cores that BLAS already uses. 
+    Limit BLAS with OMP_NUM_THREADS (or OPENBLAS_NUM_THREADS, MKL_NUM_THREADS) to split those kernels over the batch instead.
+    Args:
+        n (int): number of threads. 1 disables the pool.
+    '''
+    global _num_threads, _executor
+    _num_threads = max(int(n), 1)
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+def parallel_for(fn, n, blas=False):
+    '''Splits range(n) into contiguous chunks and calls fn(start, stop) for each chunk in the intra-op thread pool.\n
+    NumPy releases the GIL in copies, reductions and BLAS calls, so that chunks of a batch are processed on several cores.
+    Calls from inside the pool and calls on GPU run serially.
+    Args:
+        fn (callable): function that processes the chunk [start, stop)
+        n (int): size of the range, typically the batch size
+        blas (bool): whether fn mainly calls BLAS, which is multi-threaded by itself
+    Returns:
+        (list): return values of fn in the order of the chunks
+    '''
+    global _executor
+    workers = _num_threads // _blas_threads() if blas else _num_threads
+    workers = min(workers, n)
+    if workers <= 1 or gpu or getattr(_local, 'active', False):
+        return [fn(0, n)]
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_num_threads)
+    def work(start, stop):
+        _local.active = True
+        try:
+            return fn(start, stop)
+        finally:
+            _local.active = False
+    bounds = [n*i//workers for i in range(workers+1)]
+    futures = [_executor.submit(work, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+    return [future.result() for future in futures]
+
+
+_generator = np.random.default_rng()
+
+def manual_seed(seed):
+    '''Seeds the random number generator of the functions that sample at every call such as dropout, and np.random that initializes the parameters.\n
+    The generator persists over the calls, hence a run is reproducible once it is seeded.
+    Args:
+        seed (int): seed
+    '''
+    global _generator
+    _generator = np.random.default_rng(seed)
+    np.random.seed(seed)
+
+def get_generator():
+    '''Returns the random number generator of the functions that sample at every call such as dropout.
+    '''
+    return _generator
+
+def get_rng_state():
+    '''Returns the states of the random number generators of random, numpy.random and get_generator() as a picklable dict.\n
+    On GPU, the generators of cupy are not captured.
+    '''
+    import random
+    import numpy
+    state = {'python': random.getstate(), 'numpy': numpy.random.get_state()}
+    if not gpu:
+        state['generator'] = _generator.bit_generator.state
+    return state
+
+def set_rng_state(state):
+    '''Restores the states of the random number generators returned by get_rng_state.
+    Args:
+        state (dict): states of the generators
+    '''
+    import random
+    import numpy
+    random.setstate(state['python'])
+    numpy.random.set_state(state['numpy'])
+    if not gpu and 'generator' in state:
+        _generator.bit_generator.state = state['generator']
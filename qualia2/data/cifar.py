@@ -13,21 +13,22 @@ class CIFAR10(ImageLoader):
     Args:
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 3*32*32]. Default: False 
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
 
     Shape: 
         - data: [N, 3, 32, 32] if flatten [N, 3*32*32]
     '''
-    def __init__(self, normalize=True, flatten=False):
+    def __init__(self, normalize=True, flatten=False, one_hot=True):
         super().__init__() 
         self.download()
         self.train_data = np.empty((50000,3*32*32))
-        self.train_label = np.empty((50000,10))
+        self.train_label = np.empty((50000,10)) if one_hot else np.empty(50000, dtype=np.int64)
         for i in range(5):
             self.train_data[i*10000:(i+1)*10000] = self._load_data(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'train')
-            self.train_label[i*10000:(i+1)*10000] = CIFAR10.to_one_hot(self._load_label(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'train'), 10)
+            self.train_label[i*10000:(i+1)*10000] = CIFAR10.to_label(self._load_label(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'train'), 10, one_hot)
 
         self.test_data = self._load_data(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'test')
-        self.test_label = CIFAR10.to_one_hot(self._load_label(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'test'), 10)
+        self.test_label = CIFAR10.to_label(self._load_label(home_dir + '/data/download/cifar10/cifar-10.tar.gz', i+1, 'test'), 10, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -85,9 +86,9 @@ class CIFAR10(ImageLoader):
                 plt.yticks([]) 
                 plt.grid(False)
                 if label is None:
-                    img = self.train_data[(self.train_label[:,j]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
+                    img = self.train_data[self.is_class(self.train_label, j)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
                 else:
-                    img = self.train_data[(self.train_label[:,label]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
+                    img = self.train_data[self.is_class(self.train_label, label)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
                 plt.imshow(to_cpu(img) if gpu else img, interpolation='nearest') 
         plt.show()        
 
@@ -97,19 +98,20 @@ class CIFAR100(ImageLoader):
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 3*32*32]. Default: False 
         label_type (str): "fine" label (the class to which it belongs) or "coarse" label (the superclass to which it belongs)
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
     Shape: 
         - data: [N, 3, 32, 32] if flatten [N, 3*32*32]
     '''
-    def __init__(self, normalize=True, flatten=False, label_type='coarse'):
+    def __init__(self, normalize=True, flatten=False, label_type='coarse', one_hot=True):
         super().__init__()         
         assert label_type in ['fine', 'coarse']
         self.label_type = label_type
         self.download()        
         self.train_data = self._load_data(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'train')
-        self.train_label = CIFAR100.to_one_hot(self._load_label(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'train'), 100)
+        self.train_label = CIFAR100.to_label(self._load_label(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'train'), 100, one_hot)
 
         self.test_data = self._load_data(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'test')
-        self.test_label = CIFAR100.to_one_hot(self._load_label(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'test'), 100)
+        self.test_label = CIFAR100.to_label(self._load_label(home_dir + '/data/download/cifar100/cifar-100.tar.gz', 'test'), 100, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -283,8 +285,8 @@ class CIFAR100(ImageLoader):
             plt.yticks([]) 
             plt.grid(False)
             if label is None:
-                img = self.train_data[(self.train_label[:,i]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
+                img = self.train_data[self.is_class(self.train_label, i)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
             else:
-                img = self.train_data[(self.train_label[:,label]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
+                img = self.train_data[self.is_class(self.train_label, label)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(3,32,32).transpose(1,2,0)
             plt.imshow(to_cpu(img) if gpu else img, interpolation='nearest') 
         plt.show()
@@ -11,7 +11,11 @@ class DataLoader(object):
         self.train_label = None
         self.test_data = None
         self.test_label = None
+        self.train_order = None
+        self.test_order = None
         self.batch = 1
+        self.idx = 0
+        self.resume = 0
         print('[*] preparing data...')
         print('    this might take few minutes.') 
 
@@ -28,7 +32,9 @@ class DataLoader(object):
             return self.test_data.shape[0] // self.batch
 
     def __iter__(self):
-        self.idx = 0
+        # a loaded state resumes the epoch at its position once
+        self.idx = self.resume
+        self.resume = 0
         return self
 
     def __next__(self):
@@ -46,7 +52,8 @@ class DataLoader(object):
             features = data[self.idx*self.batch:(self.idx+1)*self.batch]
             target = label[self.idx*self.batch:(self.idx+1)*self.batch]
             self.idx += 1
-            return Tensor(features, requires_grad=False), Tensor(target, requires_grad=False)
+            # class indices keep their integer type
+            return Tensor(features, requires_grad=False), Tensor(target, requires_grad=False, dtype=target.dtype if target.ndim == 1 and target.dtype.kind in 'iu' else None)
         else:
             features = data[self.idx*self.batch:(self.idx+1)*self.batch]
             self.idx += 1
@@ -80,18 +87,51 @@ class DataLoader(object):
             
     def shuffle(self):
         if self.training:
-            self.train_data, self.train_label = self._shuffle(self.train_data, self.train_label)
+            self.train_data, self.train_label, self.train_order = self._shuffle(self.train_data, self.train_label, self.train_order)
         else:
-            self.test_data, self.test_label = self._shuffle(self.test_data, self.test_label)
+            self.test_data, self.test_label, self.test_order = self._shuffle(self.test_data, self.test_label, self.test_order)
     
-    def _shuffle(self, data, label):
-        i = np.random.permutation(data.shape[0])
+    def _shuffle(self, data, label, order=None, i=None):
+        if i is None:
+            i = np.random.permutation(data.shape[0])
         new_data = data[i]
         if label is not None:
             new_label = label[i]    
         else:
             new_label = None
-        return new_data, new_label
+        # order keeps the indices of the data as it was loaded
+        new_order = i if order is None else order[i]
+        return new_data, new_label, new_order
+
+    def state_dict(self):
+        '''Returns the position in the current epoch and the orders the data was shuffled into, 
+        hence a dataloader loaded anew with the same data can resume the epoch with load_state_dict.
+        '''
+        state_dict = {'training': self.training, 'idx': self.idx}
+        if self.train_order is not None:
+            state_dict['train_order'] = self.train_order
+        if self.test_order is not None:
+            state_dict['test_order'] = self.test_order
+        return state_dict
+
+    def load_state_dict(self, state_dict):
+        '''Restores the orders of the data and the position returned by state_dict. The next iteration resumes from the position.
+        '''
+        for split in ['train', 'test']:
+            data = getattr(self, split+'_data')
+            order = getattr(self, split+'_order')
+            target = state_dict.get(split+'_order')
+            if data is None or (order is None and target is None):
+                continue
+            target = np.arange(data.shape[0]) if target is None else np.asarray(target)
+            # indices from the current order to the saved one
+            i = target if order is None else np.argsort(order)[target]
+            data, label, _ = self._shuffle(data, getattr(self, split+'_label'), None, i)
+            setattr(self, split+'_data', data)
+            setattr(self, split+'_label', label)
+            setattr(self, split+'_order', target)
+        self.training = bool(state_dict['training'])
+        self.resume = int(state_dict['idx'])
 
     def show(self):
         raise NotImplementedError
@@ -99,19 +139,34 @@ class DataLoader(object):
     @staticmethod
     def to_one_hot(label, num_class):
         if isinstance(label, Tensor):
-            one_hot = np.zeros((len(label.data), num_class), dtype=np.int32)    
-        else:
-            one_hot = np.zeros((len(label), num_class), dtype=np.int32)
-        for c in range(num_class):
-            one_hot[:,c][label==c] = 1
+            label = label.data
+        one_hot = np.zeros((len(label), num_class), dtype=np.int32)
+        one_hot[np.arange(len(label)), label.astype(np.int64)] = 1
         return one_hot
 
     @staticmethod
     def to_vector(label):
         if isinstance(label, Tensor):
-            return np.argmax(label.data, axis=1)
-        else:
-            return np.argmax(label, axis=1)
+            label = label.data
+        if label.ndim == 1:
+            return label
+        return np.argmax(label, axis=1)
+
+    @staticmethod
+    def to_label(label, num_class, one_hot=True):
+        '''Returns the class indices as one-hot vectors if one_hot is True, otherwise as the compact integer array.
+        '''
+        if one_hot:
+            return DataLoader.to_one_hot(label, num_class)
+        return label
+
+    @staticmethod
+    def is_class(label, c):
+        '''Returns the mask of the samples of class c for both one-hot labels and class indices.
+        '''
+        if label.ndim == 1:
+            return label == c
+        return label[:,c] > 0
         
 class ImageLoader(DataLoader):
     @property
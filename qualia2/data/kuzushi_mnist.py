@@ -12,18 +12,19 @@ class KuzushiMNIST(ImageLoader):
     Args:
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 28*28]. Default: False 
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
 
     Shape: 
         - data: [N, 1, 28, 28] if flatten [N, 28*28]
     '''
-    def __init__(self, normalize=True, flatten=False):
+    def __init__(self, normalize=True, flatten=False, one_hot=True):
         super().__init__()
  
         self.download()
         self.train_data = self._load_data(home_dir + '/data/download/kuzushi_mnist/train_data.gz')
-        self.train_label = KuzushiMNIST.to_one_hot(self._load_label(home_dir + '/data/download/kuzushi_mnist/train_labels.gz'), 10)
+        self.train_label = KuzushiMNIST.to_label(self._load_label(home_dir + '/data/download/kuzushi_mnist/train_labels.gz'), 10, one_hot)
         self.test_data = self._load_data(home_dir + '/data/download/kuzushi_mnist/test_data.gz')
-        self.test_label = KuzushiMNIST.to_one_hot(self._load_label(home_dir + '/data/download/kuzushi_mnist/test_labels.gz'), 10)
+        self.test_label = KuzushiMNIST.to_label(self._load_label(home_dir + '/data/download/kuzushi_mnist/test_labels.gz'), 10, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -85,9 +86,9 @@ class KuzushiMNIST(ImageLoader):
                 plt.yticks([]) 
                 plt.grid(False)
                 if label is None:
-                    img = self.train_data[(self.train_label[:,j]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
+                    img = self.train_data[self.is_class(self.train_label, j)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
                 else:
-                    img = self.train_data[(self.train_label[:,label]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
+                    img = self.train_data[self.is_class(self.train_label, label)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
                 plt.imshow(to_cpu(img) if gpu else img, cmap='gray', interpolation='nearest') 
         plt.show()
 
@@ -96,18 +97,19 @@ class Kuzushi49(ImageLoader):
     Args:
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 28*28]. Default: False 
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
 
     Shape: 
         - data: [N, 1, 28, 28] if flatten [N, 28*28]
     '''
-    def __init__(self, normalize=True, flatten=False):
+    def __init__(self, normalize=True, flatten=False, one_hot=True):
         super().__init__() 
 
         self.download()
         self.train_data = self._load_data(home_dir + '/data/download/kuzushi49/train_data.npz')
-        self.train_label = KuzushiMNIST.to_one_hot(self._load_label(home_dir + '/data/download/kuzushi49/train_labels.npz'), 49)
+        self.train_label = KuzushiMNIST.to_label(self._load_label(home_dir + '/data/download/kuzushi49/train_labels.npz'), 49, one_hot)
         self.test_data = self._load_data(home_dir + '/data/download/kuzushi49/test_data.npz')
-        self.test_label = KuzushiMNIST.to_one_hot(self._load_label(home_dir + '/data/download/kuzushi49/test_labels.npz'), 49)
+        self.test_label = KuzushiMNIST.to_label(self._load_label(home_dir + '/data/download/kuzushi49/test_labels.npz'), 49, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -205,8 +207,8 @@ class Kuzushi49(ImageLoader):
             plt.yticks([]) 
             plt.grid(False)
             if label is None:
-                img = self.train_data[(self.train_label[:,i]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
+                img = self.train_data[self.is_class(self.train_label, i)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
             else:
-                img = self.train_data[(self.train_label[:,label]>0)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
+                img = self.train_data[self.is_class(self.train_label, label)][random.randint(0, self.train_data.shape[0]//len(self.label_dict)-1)].reshape(28,28)
             plt.imshow(to_cpu(img) if gpu else img, cmap='gray', interpolation='nearest') 
         plt.show()
@@ -12,20 +12,21 @@ class MNIST(ImageLoader):
     Args:
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 28*28]. Default: False 
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
 
     Shape: 
         - data: [N, 1, 28, 28] if flatten [N, 28*28]
     '''
-    def __init__(self, normalize=True, flatten=False):
+    def __init__(self, normalize=True, flatten=False, one_hot=True):
         super().__init__() 
         path = os.path.dirname(os.path.abspath(__file__)) 
 
         print('[*] preparing data...')
         self.download()
         self.train_data = self._load_data(path + '/download/mnist/train_data.gz')
-        self.train_label = MNIST.to_one_hot(self._load_label(path + '/download/mnist/train_labels.gz'), 10)
+        self.train_label = MNIST.to_label(self._load_label(path + '/download/mnist/train_labels.gz'), 10, one_hot)
         self.test_data = self._load_data(path + '/download/mnist/test_data.gz')
-        self.test_label = MNIST.to_one_hot(self._load_label(path + '/download/mnist/test_labels.gz'), 10)
+        self.test_label = MNIST.to_label(self._load_label(path + '/download/mnist/test_labels.gz'), 10, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -71,6 +72,6 @@ class MNIST(ImageLoader):
                 plt.xticks([]) 
                 plt.yticks([]) 
                 plt.grid(False)
-                img = self.train_data[(self.train_label[:,j]>0)][i*10+j].reshape(28,28)
+                img = self.train_data[self.is_class(self.train_label, j)][i*10+j].reshape(28,28)
                 plt.imshow(to_cpu(img) if gpu else img, cmap='gray', interpolation='nearest') 
         plt.show()        
@@ -12,11 +12,12 @@ class STL10(ImageLoader):
     Args:
         normalize (bool): If true, the intensity value of a specific pixel in a specific image will be rescaled from [0, 255] to [0, 1]. Default: True 
         flatten (bool): If true, data will have a shape of [N, 28*28]. Default: False 
+        one_hot (bool): If true, labels will be one-hot vectors of [N, num_class], otherwise class indices of [N]. Default: True
 
     Shape: 
         - data: [N, 3, 96, 96] if flatten [N, 3*96*96]
     '''
-    def __init__(self, normalize=True, flatten=False):
+    def __init__(self, normalize=True, flatten=False, one_hot=True):
         super().__init__() 
         path = os.path.dirname(os.path.abspath(__file__)) 
 
@@ -26,9 +27,9 @@ class STL10(ImageLoader):
             os.makedirs(path + '/download/stl10/') 
             self.download(path+'/download/stl10/')
         self.train_data = self._load_data(path + '/download/stl10/stl10_binary/train_X.bin')
-        self.train_label = STL10.to_one_hot(self._load_label(path + '/download/stl10/stl10_binary/train_y.bin'), 10)
+        self.train_label = STL10.to_label(self._load_label(path + '/download/stl10/stl10_binary/train_y.bin'), 10, one_hot)
         self.test_data = self._load_data(path + '/download/stl10/stl10_binary/test_X.bin')
-        self.test_label = STL10.to_one_hot(self._load_label(path + '/download/stl10/stl10_binary/test_y.bin'), 10)
+        self.test_label = STL10.to_label(self._load_label(path + '/download/stl10/stl10_binary/test_y.bin'), 10, one_hot)
         print('[*] done.')
 
         if normalize: 
@@ -89,6 +90,6 @@ class STL10(ImageLoader):
                 plt.xticks([]) 
                 plt.yticks([]) 
                 plt.grid(False)
-                img = self.train_data[(self.train_label[:,j]>0)][i*10+j].reshape(3,96,96).transpose(2,1,0)
+                img = self.train_data[self.is_class(self.train_label, j)][i*10+j].reshape(3,96,96).transpose(2,1,0)
                 plt.imshow(to_cpu(img) if gpu else img, interpolation='nearest') 
         plt.show()        
\ No newline at end of file
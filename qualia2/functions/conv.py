@@ -1,10 +1,122 @@
 # -*- coding: utf-8 -*- 
 from ..core import *
 from ..autograd import *
+from itertools import product
+import json
+import os
+import time
+
+def _sliding_window(x, out_size, kernel_size, stride, dilation):
+    '''Returns a zero-copy view of the windows of a padded input.\n
+    Args:
+        x (ndarray): padded input with shape of [batch, channel, *spatial]
+        out_size (tuple of int): number of windows along each spatial dimension
+        kernel_size (tuple of int): size of the kernel along each spatial dimension
+        stride (tuple of int): stride between windows
+        dilation (tuple of int): spacing between kernel elements
+    Returns:
+        (ndarray): view with shape of [batch, *out_size, channel, *kernel_size]. The windows overlap in memory, hence the view must not be written.
+    '''
+    batch, channel = x.shape[:2]
+    for o, k, s, d, n in zip(out_size, kernel_size, stride, dilation, x.shape[2:]):
+        if (o-1)*s+(k-1)*d+1 > n:
+            raise ValueError('[*] windows exceed the padded input of size {}.'.format(x.shape[2:]))
+    strides = (x.strides[0],) + tuple(st*s for st, s in zip(x.strides[2:], stride)) + (x.strides[1],) + tuple(st*d for st, d in zip(x.strides[2:], dilation))
+    return np.lib.stride_tricks.as_strided(x, shape=(batch, *out_size, channel, *kernel_size), strides=strides)
+
+def _fold_window(delta, padded_shape, stride, dilation):
+    '''Scatter-adds the windows back to the padded input, which is the adjoint of _sliding_window.\n
+    The loop runs over the kernel elements only. Each step adds all windows at once, since the elements of 
+    different windows at the same kernel offset never overlap.
+    Args:
+        delta (ndarray): windows with shape of [batch, *out_size, channel, *kernel_size]
+        padded_shape (tuple of int): shape of the padded input
+        stride (tuple of int): stride between windows
+        dilation (tuple of int): spacing between kernel elements
+    Returns:
+        (ndarray): array with shape of padded_shape
+    '''
+    n = len(padded_shape)-2
+    out_size = delta.shape[1:n+1]
+    kernel_size = delta.shape[n+2:]
+    result = np.zeros(padded_shape, dtype=delta.dtype)
+    def work(start, stop):
+        chunk = result[start:stop]
+        for offset in product(*[range(k) for k in kernel_size]):
+            idx = (slice(None), slice(None)) + tuple(slice(i*d, i*d+(o-1)*s+1, s) for i, o, s, d in zip(offset, out_size, stride, dilation))
+            chunk[idx] += np.moveaxis(delta[(slice(start, stop),)+(slice(None),)*(n+1)+offset], -1, 1)
+    parallel_for(work, padded_shape[0])
+    return result
+
+def _tensordot(a, b, axes):
+    '''np.tensordot split over the leading (batch) axis of a in the intra-op thread pool. 
+    If the batch axis is contracted, b is split along the paired axis and the products of the chunks are summed.
+    '''
+    axes_a, axes_b = [tuple(ax) if isinstance(ax, (tuple, list)) else (ax,) for ax in axes]
+    if 0 in axes_a:
+        axis = axes_b[axes_a.index(0)]
+        fn = lambda start, stop: np.tensordot(a[start:stop], b[(slice(None),)*axis+(slice(start, stop),)], axes)
+    else:
+        fn = lambda start, stop: np.tensordot(a[start:stop], b, axes)
+    results = parallel_for(fn, a.shape[0], blas=True)
+    if len(results) == 1:
+        return results[0]
+    if 0 in axes_a:
+        return sum(results[1:], results[0])
+    return np.concatenate(results)
+
+def _spread_index(x_shape, padded_shape, stride):
+    '''Returns the index of the elements of the input of a transposed convolution in its padded array.
+    '''
+    return (slice(None), slice(None)) + tuple(slice((p-(n-1)*s-1)//2, (p-(n-1)*s-1)//2+(n-1)*s+1, s) for n, p, s in zip(x_shape[2:], padded_shape[2:], stride))
+
+def _fold_transposed(delta, x_shape, padded_shape, stride, dilation):
+    '''Folds the windows of a transposed convolution, whose input was spread by stride over the padded array,
+    and gathers the gradient at the positions of the input.
+    '''
+    result = _fold_window(delta, padded_shape, (1,)*len(stride), dilation)
+    return result[_spread_index(x_shape, padded_shape, stride)]
+
+def _pad(x, padded_shape):
+    '''Places x at the center of a zero array with shape of padded_shape.
+    '''
+    result = np.zeros(padded_shape, dtype=x.dtype)
+    result[(slice(None), slice(None)) + tuple(slice((p-n)//2, (p-n)//2+n) for n, p in zip(x.shape[2:], padded_shape[2:]))] = x
+    return result
+
+def _spread(x, padded_shape, stride):
+    '''Spreads x by stride over a zero array with shape of padded_shape as the input of a transposed convolution.
+    '''
+    result = np.zeros(padded_shape, dtype=x.dtype)
+    result[_spread_index(x.shape, padded_shape, stride)] = x
+    return result
+
+_memory_saving = False
+
+def get_conv_memory_saving():
+    '''Returns True if convolutions recompute their windows in backward by default.
+    '''
+    return _memory_saving
+
+def set_conv_memory_saving(mode):
+    '''Sets whether convolutions keep the padded input for backward or recompute it from the input.\n
+    In the memory-saving mode, a convolution does not keep its padded input (for transposed convolutions, the input spread by stride) 
+    alive until backward, and rebuilds it together with the window view in calc_grad. The mode can be overridden per call or per module 
+    with the memory_saving argument.
+    Args:
+        mode (bool): if True, the memory-saving mode is used by default.
+    '''
+    global _memory_saving
+    _memory_saving = bool(mode)
+
+def _saved(reshaped, memory_saving):
+    if memory_saving is None:
+        memory_saving = _memory_saving
+    return None if memory_saving else reshaped
 
 class Conv1d(Function):
     @staticmethod
-    def forward(x, kernel, bias=None, stride=1, padding=1, dilation=1):
+    def forward(x, kernel, bias=None, stride=1, padding=1, dilation=1, memory_saving=None):
         '''Applies a 2D convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, width] 
@@ -13,6 +125,7 @@ class Conv1d(Function):
             stride (int): Stride of the convolution. Default: 1
             padding (int): Padding controls the amount of implicit zero-paddings on both sides for padding number of points for each dimension. Default: 1
             dilation (int): Spacing between kernel elements. Default: 1
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
         Returns: 
             (Tensor): Output tensor will have shape of [batch, patch, out_width] 
 
@@ -27,61 +140,195 @@ class Conv1d(Function):
 
         ow = int((width+2*padding-dilation*(kernel_width-1)-1)/stride+1)
 
-        padded = np.zeros((batch, channel, width+2*padding))
+        padded = np.zeros((batch, channel, width+2*padding), dtype=x.dtype)
         padded[:,:,padding:width+padding] = x.data
         reshaped = Conv1d.unfold(padded, batch, ow, kernel.shape, stride, dilation)
         if bias is None:
-            result = Tensor(np.tensordot(reshaped, kernel.data, ((2,3),(1,2))).transpose(0,2,1))
-            result.set_creator(Conv1d.prepare(result.shape, x, kernel, bias=False, reshaped=reshaped, stride=stride, padded_shape=padded.shape, dilation=dilation, ow=ow))
+            result = Tensor(_tensordot(reshaped, kernel.data, ((2,3),(1,2))).transpose(0,2,1))
+            result.set_creator(Conv1d.prepare(result.shape, x, kernel, bias=False, reshaped=_saved(reshaped, memory_saving), stride=stride, padded_shape=padded.shape, dilation=dilation, ow=ow))
         else:
-            result = Tensor(np.add(np.tensordot(reshaped, kernel.data, ((2,3),(1,2))).transpose(0,2,1), np.reshape(bias.data, (1,-1,1))))
-            result.set_creator(Conv1d.prepare(result.shape, x, kernel, bias, bias=True, reshaped=reshaped, stride=stride, padded_shape=padded.shape, dilation=dilation, ow=ow))
+            result = Tensor(np.add(_tensordot(reshaped, kernel.data, ((2,3),(1,2))).transpose(0,2,1), np.reshape(bias.data, (1,-1,1))))
+            result.set_creator(Conv1d.prepare(result.shape, x, kernel, bias, bias=True, reshaped=_saved(reshaped, memory_saving), stride=stride, padded_shape=padded.shape, dilation=dilation, ow=ow))
         return result
 
     @staticmethod
     def unfold(x, batch, ow, kernel_shape, stride, dilation): 
-        _, _, xw = x.shape
-        _, channel, kernel_width = kernel_shape 
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros((batch, ow, channel, kernel_width)) 
-        for j in range(ow):
-            if j*stride+fw > xw:
-                continue
-            tmp = x[:, :, j*stride:j*stride+fw] 
-            result[:, j, :, :] = tmp[:, :, ::dilation] 
-        return result 
+        '''Returns a zero-copy view of x with shape of [batch, ow, channel, kernel_width]
+        '''
+        return _sliding_window(x, (ow,), kernel_shape[2:], (stride,), (dilation,))
 
     @staticmethod
     def fold(delta, ow, x_shape, kernel_shape, padded_shape, stride, dilation):
         batch, channel, width = x_shape 
-        _, _, kernel_width = kernel_shape
         _, _, pw = padded_shape 
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros(padded_shape)
-        for j in range(ow): 
-            if j*stride+fw > pw:
-                continue
-            tmp = np.zeros((batch, channel, fw))
-            tmp[:, :, ::dilation] = delta[:, j, :, :] 
-            result[:, :, j*stride:j*stride+fw] += tmp
+        result = _fold_window(delta, padded_shape, (stride,), (dilation,))
         return result[:,:,int((pw-width)/2):int((pw-width)/2)+width]
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _pad(self.var[0].data, self.kwargs['padded_shape'])
+        return Conv1d.unfold(padded, None, self.kwargs['ow'], self.var[1].shape, self.kwargs['stride'], self.kwargs['dilation'])
+
     def calc_grad(self, dx):
         batch, patch, _ = dx.shape 
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.var[1].data, (1,0))
+        delta = _tensordot(np.reshape(dx,(batch,patch,-1)), self.var[1].data, (1,0))
         delta = Conv1d.fold(delta, self.kwargs['ow'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], self.kwargs['stride'], self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
+        dk = _tensordot(np.reshape(dx,(batch,patch,-1)), self.unfolded(), ((0,2),(0,1))) 
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = Conv1d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 conv1d = Conv1d(None)
 
+_conv_algorithm = 'auto'
+# a user cache directory, since the installed package may be read-only
+_autotune_file = os.path.join(os.environ.get('QUALIA2_CACHE_DIR', os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'qualia2')), 'conv2d_autotune.json')
+_autotune_cache = None
+
+def get_conv_algorithm():
+    '''Returns the algorithm used for the forward computation of conv2d.
+    '''
+    return _conv_algorithm
+
+def set_conv_algorithm(algo):
+    '''Sets the algorithm used for the forward computation of conv2d.\n
+    With 'auto', each applicable algorithm is benchmarked once per (input shape, kernel shape, stride, dilation) 
+    and the fastest one is cached on disk, so that later runs reuse the choice. The cache is kept in $QUALIA2_CACHE_DIR, 
+    or in qualia2 under $XDG_CACHE_HOME (~/.cache by default). A fixed algorithm that does not 
+    apply to a layer falls back to 'im2col'. The gradients are always computed with im2col.
+    Args:
+        algo (str): 'auto', 'im2col', '1x1', 'winograd' or 'fft'
+    '''
+    global _conv_algorithm
+    if algo != 'auto' and algo not in _conv2d_algorithms:
+        raise ValueError('[*] unknown conv algorithm: {}'.format(algo))
+    _conv_algorithm = algo
+
+def _conv2d_im2col(padded, kernel, oh, ow, stride, dilation):
+    reshaped = _sliding_window(padded, (oh, ow), kernel.shape[2:], stride, dilation)
+    return _tensordot(reshaped, kernel, ((3,4,5),(1,2,3))).transpose(0,3,1,2)
+
+def _conv2d_1x1(padded, kernel, oh, ow, stride, dilation):
+    x = padded[:, :, :(oh-1)*stride[0]+1:stride[0], :(ow-1)*stride[1]+1:stride[1]]
+    return np.tensordot(kernel[:,:,0,0], x, (1,1)).transpose(1,0,2,3)
+
+def _conv2d_winograd(padded, kernel, oh, ow, stride, dilation):
+    '''Winograd F(2x2,3x3), which computes each 2x2 output tile from a 4x4 input tile with 16 instead of 36 multiplications.
+
+    Reference:
+        https://arxiv.org/abs/1509.09308
+    '''
+    batch, channel, ph, pw = padded.shape
+    patch = kernel.shape[0]
+    th, tw = (oh+1)//2, (ow+1)//2
+    if 2*th+2 > ph or 2*tw+2 > pw:
+        x = np.zeros((batch, channel, 2*th+2, 2*tw+2), dtype=padded.dtype)
+        x[:,:,:ph,:pw] = padded
+    else:
+        x = padded
+    bt = np.array([[1,0,-1,0],[0,1,1,0],[0,-1,1,0],[0,1,0,-1]], dtype=padded.dtype)
+    g = np.array([[1,0,0],[0.5,0.5,0.5],[0.5,-0.5,0.5],[0,0,1]], dtype=padded.dtype)
+    at = np.array([[1,1,1,0],[0,1,-1,-1]], dtype=padded.dtype)
+    # [batch, th, tw, channel, 4, 4]
+    tiles = _sliding_window(x, (th, tw), (4, 4), (2, 2), (1, 1))
+    # transformed tiles and kernels with shape of [4, 4, batch*th*tw, channel] and [4, 4, channel, patch]
+    v = np.tensordot(np.tensordot(bt, tiles, (1,4)), bt, (5,1)).transpose(0,5,1,2,3,4).reshape(16, -1, channel)
+    u = np.tensordot(np.tensordot(g, kernel, (1,2)), g, (3,1)).transpose(0,3,2,1).reshape(16, channel, patch)
+    m = np.matmul(v, u).reshape(4, 4, -1, patch)
+    y = np.tensordot(np.tensordot(at, m, (1,0)), at, (1,1)).reshape(2, batch, th, tw, patch, 2)
+    return y.transpose(1,4,2,0,3,5).reshape(batch, patch, 2*th, 2*tw)[:,:,:oh,:ow]
+
+def _conv2d_fft(padded, kernel, oh, ow, stride, dilation):
+    _, _, ph, pw = padded.shape
+    _, _, kernel_height, kernel_width = kernel.shape
+    x = np.fft.rfft2(padded, s=(ph, pw))
+    k = np.fft.rfft2(kernel[:,:,::-1,::-1], s=(ph, pw))
+    y = np.matmul(x.transpose(2,3,0,1), k.transpose(2,3,1,0)).transpose(2,3,0,1)
+    y = np.fft.irfft2(y, s=(ph, pw))
+    return y[:,:,kernel_height-1:kernel_height-1+oh,kernel_width-1:kernel_width-1+ow].astype(padded.dtype, copy=False)
+
+_conv2d_algorithms = {
+    'im2col': _conv2d_im2col,
+    '1x1': _conv2d_1x1,
+    'winograd': _conv2d_winograd,
+    'fft': _conv2d_fft,
+}
+
+def _conv2d_candidates(kernel_shape, stride, dilation):
+    _, _, kernel_height, kernel_width = kernel_shape
+    candidates = ['im2col']
+    if kernel_height == 1 and kernel_width == 1:
+        candidates.append('1x1')
+    elif tuple(stride) == (1,1) and tuple(dilation) == (1,1):
+        if kernel_height == 3 and kernel_width == 3:
+            candidates.append('winograd')
+        candidates.append('fft')
+    return candidates
+
+def _load_autotune_cache():
+    global _autotune_cache
+    if _autotune_cache is None:
+        _autotune_cache = {}
+        if os.path.exists(_autotune_file):
+            try:
+                with open(_autotune_file, 'r') as f:
+                    _autotune_cache = json.load(f)
+            except (OSError, ValueError):
+                logger.warning('[*] failed to read the conv autotune cache at {}.'.format(_autotune_file))
+    return _autotune_cache
+
+def _save_autotune_cache():
+    try:
+        os.makedirs(os.path.dirname(_autotune_file), exist_ok=True)
+        # merges the choices of other processes and replaces the file at once, hence concurrent writers never leave it truncated
+        if os.path.exists(_autotune_file):
+            try:
+                with open(_autotune_file, 'r') as f:
+                    _autotune_cache.update({key: value for key, value in json.load(f).items() if key not in _autotune_cache})
+            except ValueError:
+                pass
+        tmp = '{}.{}.tmp'.format(_autotune_file, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(_autotune_cache, f, indent=1, sort_keys=True)
+        os.replace(tmp, _autotune_file)
+    except OSError:
+        logger.warning('[*] failed to write the conv autotune cache at {}.'.format(_autotune_file))
+
+def _conv2d_forward(padded, kernel, oh, ow, stride, dilation):
+    '''Computes conv2d of a padded input with the algorithm chosen by set_conv_algorithm.
+    '''
+    candidates = _conv2d_candidates(kernel.shape, stride, dilation)
+    if _conv_algorithm != 'auto':
+        algo = _conv_algorithm if _conv_algorithm in candidates else 'im2col'
+        return _conv2d_algorithms[algo](padded, kernel, oh, ow, stride, dilation)
+    if len(candidates) == 1:
+        return _conv2d_im2col(padded, kernel, oh, ow, stride, dilation)
+    key = '{}-{}-{}-{}-{}-{}'.format('gpu' if gpu else 'cpu', padded.dtype, tuple(padded.shape), tuple(kernel.shape), tuple(stride), tuple(dilation))
+    cache = _load_autotune_cache()
+    if cache.get(key) in candidates:
+        return _conv2d_algorithms[cache[key]](padded, kernel, oh, ow, stride, dilation)
+    best, best_time, result = None, None, None
+    for algo in candidates:
+        start = time.perf_counter()
+        out = _conv2d_algorithms[algo](padded, kernel, oh, ow, stride, dilation)
+        if gpu:
+            np.cuda.Stream.null.synchronize()
+        elapsed = time.perf_counter() - start
+        if best_time is None or elapsed < best_time:
+            best, best_time, result = algo, elapsed, out
+    cache[key] = best
+    _save_autotune_cache()
+    logger.debug('[*] conv2d autotune {}: {}'.format(key, best))
+    return result
+
 class Conv2d(Function):        
     @staticmethod
-    def forward(x, kernel, bias=None, stride=(1,1), padding=(1,1), dilation=(1,1)):
+    def forward(x, kernel, bias=None, stride=(1,1), padding=(1,1), dilation=(1,1), memory_saving=None):
         '''Applies a 2D convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, height, width] 
@@ -90,6 +337,7 @@ class Conv2d(Function):
             stride (tuple of int): Stride of the convolution. Default: (1,1) 
             padding (tuple of int): Padding controls the amount of implicit zero-paddings on both sides for padding number of points for each dimension. Default: (1,1)
             dilation (tuple of int): Spacing between kernel elements. Default: (1,1)
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
         Returns: 
             (Tensor): Output tensor will have shape of [batch, patch, out_height, out_width] 
 
@@ -106,63 +354,53 @@ class Conv2d(Function):
         oh = int((height+2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1]] = x.data
         reshaped = Conv2d.unfold(padded, batch, oh, ow, kernel.shape, stride, dilation)
         if bias is None: 
-            result = Tensor(np.tensordot(reshaped, kernel.data, ((2,3,4),(1,2,3))).transpose(0,2,1).reshape(-1,patch,oh,ow)) 
-            result.set_creator(Conv2d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, reshaped=reshaped, padded_shape=padded.shape, stride=stride, dilation=dilation)) 
+            result = Tensor(_conv2d_forward(padded, kernel.data, oh, ow, stride, dilation)) 
+            result.set_creator(Conv2d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, dilation=dilation)) 
         else: 
-            result = Tensor(np.add(np.tensordot(reshaped, kernel.data, ((2,3,4),(1,2,3))).transpose(0,2,1).reshape(-1,patch,oh,ow), np.reshape(bias.data, (1,-1,1,1)))) 
-            result.set_creator(Conv2d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, reshaped=reshaped, padded_shape=padded.shape, stride=stride, dilation=dilation))
+            result = Tensor(np.add(_conv2d_forward(padded, kernel.data, oh, ow, stride, dilation), np.reshape(bias.data, (1,-1,1,1)))) 
+            result.set_creator(Conv2d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, dilation=dilation))
         return result 
     
     @staticmethod
     def unfold(x, batch, oh, ow, kernel_shape, stride, dilation):
-        _, _, xh, xw = x.shape 
-        _, channel, kernel_height, kernel_width = kernel_shape 
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1) 
-        result = np.zeros((batch, oh*ow, channel, kernel_height, kernel_width)) 
-        for i in range(oh): 
-            for j in range(ow): 
-                if i*stride[0]+fh > xh or j*stride[1]+fw > xh:
-                    continue
-                tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] 
-                result[:, i*ow+j, :, :, :] = tmp[:, :, ::dilation[0], ::dilation[1]] 
-        return result 
+        '''Returns a zero-copy view of x with shape of [batch, oh, ow, channel, kernel_height, kernel_width]
+        '''
+        return _sliding_window(x, (oh, ow), kernel_shape[2:], stride, dilation)
 
     @staticmethod
     def fold(delta, oh, ow, x_shape, kernel_shape, padded_shape, stride, dilation):
         batch, channel, height, width = x_shape 
-        _, _, kernel_height, kernel_width = kernel_shape
         _, _, ph, pw = padded_shape 
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1)
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                if i*stride[0]+fh > ph or j*stride[1]+fw > pw:
-                    continue
-                tmp = np.zeros((batch, channel, fh, fw))
-                tmp[:, :, ::dilation[0], ::dilation[1]] = delta[:, i*ow+j, :, :, :] 
-                result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] += tmp
+        result = _fold_window(delta, padded_shape, stride, dilation)
         return result[:,:,int((ph-height)/2):int((ph-height)/2)+height,int((pw-width)/2):int((pw-width)/2)+width]
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _pad(self.var[0].data, self.kwargs['padded_shape'])
+        return Conv2d.unfold(padded, None, self.kwargs['oh'], self.kwargs['ow'], self.var[1].shape, self.kwargs['stride'], self.kwargs['dilation'])
+
     def calc_grad(self, dx):
-        batch, patch, _, _ = dx.shape 
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.var[1].data, (1,0))
+        delta = _tensordot(dx, self.var[1].data, (1,0))
         delta = Conv2d.fold(delta, self.kwargs['oh'], self.kwargs['ow'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], self.kwargs['stride'], self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
+        dk = _tensordot(dx, self.unfolded(), ((0,2,3),(0,1,2))) 
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = Conv2d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 conv2d = Conv2d(None)
 
 class Conv3d(Function):
     @staticmethod
-    def forward(x, kernel, bias=None, stride=(1,1,1), padding=(1,1,1), dilation=(1,1,1)):
+    def forward(x, kernel, bias=None, stride=(1,1,1), padding=(1,1,1), dilation=(1,1,1), memory_saving=None):
         '''Applies a 3D convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, height, width, depth] 
@@ -171,6 +409,7 @@ class Conv3d(Function):
             stride (tuple of int): Stride of the convolution. Default: (1,1,1) 
             padding (tuple of int): Padding controls the amount of implicit zero-paddings on both sides for padding number of points for each dimension. Default: (1,1,1)
             dilation (tuple of int): Spacing between kernel elements. Default: (1,1,1)
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
         Returns: 
             (Tensor): Output tensor will have shape of [batch, patch, out_height, out_width, out_depth] 
 
@@ -189,65 +428,53 @@ class Conv3d(Function):
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
         od = int((depth+2*padding[2]-dilation[2]*(kernel_depth-1)-1)/stride[2]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1],padding[2]:depth+padding[2]] = x.data
         reshaped = Conv3d.unfold(padded, batch, oh, ow, od, kernel.shape, stride, dilation)
         if bias is None: 
-            result = Tensor(np.tensordot(reshaped, kernel.data, ((2,3,4,5),(1,2,3,4))).transpose(0,2,1).reshape(-1,patch,oh,ow,od)) 
-            result.set_creator(Conv3d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, od=od, reshaped=reshaped, padded_shape=padded.shape, stride=stride, dilation=dilation)) 
+            result = Tensor(_tensordot(reshaped, kernel.data, ((4,5,6,7),(1,2,3,4))).transpose(0,4,1,2,3)) 
+            result.set_creator(Conv3d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, od=od, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, dilation=dilation)) 
         else: 
-            result = Tensor(np.add(np.tensordot(reshaped, kernel.data, ((2,3,4,5),(1,2,3,4))).transpose(0,2,1).reshape(-1,patch,oh,ow,od), np.reshape(bias.data, (1,-1,1,1,1)))) 
-            result.set_creator(Conv3d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, od=od, reshaped=reshaped, padded_shape=padded.shape, stride=stride, dilation=dilation))
+            result = Tensor(np.add(_tensordot(reshaped, kernel.data, ((4,5,6,7),(1,2,3,4))).transpose(0,4,1,2,3), np.reshape(bias.data, (1,-1,1,1,1)))) 
+            result.set_creator(Conv3d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, od=od, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, dilation=dilation))
         return result 
 
     @staticmethod
     def unfold(x, batch, oh, ow, od, kernel_shape, stride, dilation): 
-        _, _, xh, xw, xd = x.shape 
-        _, channel, kernel_height, kernel_width, kernel_depth = kernel_shape 
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros((batch, oh*ow*od, channel, kernel_height, kernel_width, kernel_depth)) 
-        for i in range(oh): 
-            for j in range(ow): 
-                for k in range(od):
-                    if i*stride[0]+fh > xh or j*stride[1]+fw > xw or k*stride[2]+fd > xd:
-                        continue
-                    tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] 
-                    result[:, i*ow*od+j*od+k, :, :, :, :] = tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]] 
-        return result 
+        '''Returns a zero-copy view of x with shape of [batch, oh, ow, od, channel, kernel_height, kernel_width, kernel_depth]
+        '''
+        return _sliding_window(x, (oh, ow, od), kernel_shape[2:], stride, dilation)
 
     @staticmethod
     def fold(delta, oh, ow, od, x_shape, kernel_shape, padded_shape, stride, dilation):
         batch, channel, height, width, depth = x_shape 
-        _, _, kernel_height, kernel_width, kernel_depth = kernel_shape
         _, _, ph, pw, pd = padded_shape 
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                for k in range(od):
-                    if i*stride[0]+fh > ph or j*stride[1]+fw > pw or k*stride[2]+fd > pd:
-                        continue
-                    tmp = np.zeros((batch, channel, fh, fw, fd))
-                    tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]] = delta[:, i*ow*od+j*od+k, :, :, :, :] 
-                    result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] += tmp
+        result = _fold_window(delta, padded_shape, stride, dilation)
         return result[:,:,int((ph-height)/2):int((ph-height)/2)+height,int((pw-width)/2):int((pw-width)/2)+width,int((pd-depth)/2):int((pd-depth)/2)+depth]
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _pad(self.var[0].data, self.kwargs['padded_shape'])
+        return Conv3d.unfold(padded, None, self.kwargs['oh'], self.kwargs['ow'], self.kwargs['od'], self.var[1].shape, self.kwargs['stride'], self.kwargs['dilation'])
+
     def calc_grad(self, dx):
-        batch, patch, _, _, _ = dx.shape 
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.var[1].data, (1,0))
+        delta = _tensordot(dx, self.var[1].data, (1,0))
         delta = Conv3d.fold(delta, self.kwargs['oh'], self.kwargs['ow'], self.kwargs['od'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], self.kwargs['stride'], self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
+        dk = _tensordot(dx, self.unfolded(), ((0,2,3,4),(0,1,2,3))) 
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = Conv3d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 conv3d = Conv3d(None)
 
 class ConvTranspose1d(Function):
     @staticmethod
-    def forward(x, kernel, bias=None, stride=1, padding=1, output_padding=0, dilation=1):
+    def forward(x, kernel, bias=None, stride=1, padding=1, output_padding=0, dilation=1, memory_saving=None):
         '''Applies a 1D transposed convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, height] 
@@ -257,6 +484,7 @@ class ConvTranspose1d(Function):
             padding (tuple of int):  Zero-padding added to both sides of the input. Default: 1
             output_padding (tuple of int): Zero-padding added to both sides of the output. Default: 0
             dilation (tuple of int): Spacing between kernel elements. Default: 1
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
      
         Shape: 
             - Input: [N, in_channels, H] 
@@ -274,41 +502,49 @@ class ConvTranspose1d(Function):
         oh = int((height-1)*stride-2*padding+dilation*(kernel_height-1)+1)
 
         offset_h = dilation*(kernel_height-1)+1-padding
-        padded = np.zeros((batch, channel, (height-1)*stride-1+offset_h*2))
+        padded = np.zeros((batch, channel, (height-1)*stride-1+offset_h*2), dtype=x.dtype)
         padded[:,:,offset_h-1:(height-1)*stride+offset_h][:,:, ::stride] = x.data
         reshaped = Conv1d.unfold(padded, batch, oh, kernel.shape, 1, dilation)
         if bias is None: 
-            tmp = np.tensordot(reshaped, np.rot90(kernel.data, 2, axes=(1,2)), ((2,3),(0,2))).transpose(0,2,1).reshape(-1,patch,oh)
-            out = np.zeros((batch, patch, oh+2*output_padding))
+            tmp = _tensordot(reshaped, np.flip(kernel.data, 2), ((2,3),(0,2))).transpose(0,2,1).reshape(-1,patch,oh)
+            out = np.zeros((batch, patch, oh+2*output_padding), dtype=x.dtype)
             out[:,:,output_padding:oh+output_padding] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose1d.prepare(result.shape, x, kernel, bias=False, oh=oh, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation)) 
+            result.set_creator(ConvTranspose1d.prepare(result.shape, x, kernel, bias=False, oh=oh, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation)) 
         else:
-            tmp = np.add(np.tensordot(reshaped, np.rot90(kernel.data, 2, axes=(1,2)), ((2,3),(0,2))).transpose(0,2,1).reshape(-1,patch,oh), np.reshape(bias.data, (1,-1,1)))
-            out = np.zeros((batch, patch, oh+2*output_padding))
+            tmp = np.add(_tensordot(reshaped, np.flip(kernel.data, 2), ((2,3),(0,2))).transpose(0,2,1).reshape(-1,patch,oh), np.reshape(bias.data, (1,-1,1)))
+            out = np.zeros((batch, patch, oh+2*output_padding), dtype=x.dtype)
             out[:,:,output_padding:oh+output_padding] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose1d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation))
+            result.set_creator(ConvTranspose1d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation))
         return result 
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _spread(self.var[0].data, self.kwargs['padded_shape'], (self.kwargs['stride'],))
+        return Conv1d.unfold(padded, None, self.kwargs['oh'], self.var[1].shape, 1, self.kwargs['dilation'])
+
     def calc_grad(self, dx):
         batch, patch, _ = dx.shape 
         dx = dx[:,:,self.kwargs['output_padding']:self.kwargs['oh']+self.kwargs['output_padding']]
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), np.rot90(self.var[1].data, 2, axes=(1,2)), (1,1))
-        delta = Conv1d.fold(delta, self.kwargs['oh'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], 1, self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
-        dk = np.rot90(dk, 2, axes=(1,2)).transpose(1,0,2)
+        delta = _tensordot(np.reshape(dx,(batch,patch,-1)), np.flip(self.var[1].data, 2), (1,1))
+        delta = _fold_transposed(delta, self.var[0].shape, self.kwargs['padded_shape'], (self.kwargs['stride'],), (self.kwargs['dilation'],))
+        dk = _tensordot(np.reshape(dx,(batch,patch,-1)), self.unfolded(), ((0,2),(0,1))) 
+        dk = np.flip(dk, 2).transpose(1,0,2)
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = ConvTranspose2d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 convtranspose1d = ConvTranspose1d(None)
 
 class ConvTranspose2d(Function):
     @staticmethod
-    def forward(x, kernel, bias=None, stride=(1,1), padding=(1,1), output_padding=(0,0), dilation=(1,1)):
+    def forward(x, kernel, bias=None, stride=(1,1), padding=(1,1), output_padding=(0,0), dilation=(1,1), memory_saving=None):
         '''Applies a 2D transposed convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, height, width]
@@ -318,6 +554,7 @@ class ConvTranspose2d(Function):
             padding (tuple of int):  Zero-padding added to both sides of the input. Default: (1,1)
             output_padding (tuple of int): Zero-padding added to both sides of the output. Default: (0,0)
             dilation (tuple of int): Spacing between kernel elements. Default: (1,1)
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
      
         Shape: 
             - Input: [N, in_channels, H, W] 
@@ -338,41 +575,49 @@ class ConvTranspose2d(Function):
 
         offset_h = dilation[0]*(kernel_height-1)+1-padding[0]
         offset_w = dilation[1]*(kernel_width-1)+1-padding[1]
-        padded = np.zeros((batch, channel, (height-1)*stride[0]-1+offset_h*2, (width-1)*stride[1]-1+offset_w*2))
+        padded = np.zeros((batch, channel, (height-1)*stride[0]-1+offset_h*2, (width-1)*stride[1]-1+offset_w*2), dtype=x.dtype)
         padded[:,:,offset_h-1:(height-1)*stride[0]+offset_h,offset_w-1:(width-1)*stride[1]+offset_w][:,:, ::stride[0], ::stride[1]] = x.data
         reshaped = Conv2d.unfold(padded, batch, oh, ow, kernel.shape, (1,1), dilation)
         if bias is None: 
-            tmp = np.tensordot(reshaped, np.rot90(kernel.data ,2, axes=(2,3)), ((2,3,4),(0,2,3))).transpose(0,2,1).reshape(-1,patch,oh,ow)
-            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1]))
+            tmp = _tensordot(reshaped, np.rot90(kernel.data ,2, axes=(2,3)), ((3,4,5),(0,2,3))).transpose(0,3,1,2)
+            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1]), dtype=x.dtype)
             out[:,:,output_padding[0]:oh+output_padding[0],output_padding[1]:ow+output_padding[1]] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose2d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation)) 
+            result.set_creator(ConvTranspose2d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation)) 
         else:
-            tmp = np.add(np.tensordot(reshaped, np.rot90(kernel.data ,2, axes=(2,3)), ((2,3,4),(0,2,3))).transpose(0,2,1).reshape(-1,patch,oh,ow), np.reshape(bias.data, (1,-1,1,1)))
-            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1]))
+            tmp = np.add(_tensordot(reshaped, np.rot90(kernel.data ,2, axes=(2,3)), ((3,4,5),(0,2,3))).transpose(0,3,1,2), np.reshape(bias.data, (1,-1,1,1)))
+            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1]), dtype=x.dtype)
             out[:,:,output_padding[0]:oh+output_padding[0],output_padding[1]:ow+output_padding[1]] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose2d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation))
+            result.set_creator(ConvTranspose2d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation))
         return result
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _spread(self.var[0].data, self.kwargs['padded_shape'], self.kwargs['stride'])
+        return Conv2d.unfold(padded, None, self.kwargs['oh'], self.kwargs['ow'], self.var[1].shape, (1,1), self.kwargs['dilation'])
+
     def calc_grad(self, dx):
         batch, patch, _, _ = dx.shape 
         dx = dx[:,:,self.kwargs['output_padding'][0]:self.kwargs['oh']+self.kwargs['output_padding'][0], self.kwargs['output_padding'][1]:self.kwargs['ow']+self.kwargs['output_padding'][1]]
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), np.rot90(self.var[1].data ,2, axes=(2,3)), (1,1))
-        delta = Conv2d.fold(delta, self.kwargs['oh'], self.kwargs['ow'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], (1,1), self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
+        delta = _tensordot(dx, np.rot90(self.var[1].data ,2, axes=(2,3)), (1,1))
+        delta = _fold_transposed(delta, self.var[0].shape, self.kwargs['padded_shape'], self.kwargs['stride'], self.kwargs['dilation'])
+        dk = _tensordot(dx, self.unfolded(), ((0,2,3),(0,1,2))) 
         dk = np.rot90(dk ,2, axes=(2,3)).transpose(1,0,2,3)
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = ConvTranspose2d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 convtranspose2d = ConvTranspose2d(None)
 
 class ConvTranspose3d(Function):
     @staticmethod
-    def forward(x, kernel, bias=None, stride=(1,1,1), padding=(1,1,1), output_padding=(0,0,0), dilation=(1,1,1)):
+    def forward(x, kernel, bias=None, stride=(1,1,1), padding=(1,1,1), output_padding=(0,0,0), dilation=(1,1,1), memory_saving=None):
         '''Applies a 2D transposed convolution over an input signal composed of several input planes.\n 
         Args: 
             x (Tensor): Input tensor with shepe of [batch, channel, height, width, depth] 
@@ -382,6 +627,7 @@ class ConvTranspose3d(Function):
             padding (tuple of int):  Zero-padding added to both sides of the input. Default: (1,1,1)
             output_padding (tuple of int): Zero-padding added to both sides of the output. Default: (0,0,0)
             dilation (tuple of int): Spacing between kernel elements. Default: (1,1,1)
+            memory_saving (bool): If True, the padded input is not kept for backward but recomputed. If None, get_conv_memory_saving() is used. Default: None
      
         Shape: 
             - Input: [N, in_channels, H, W, D] 
@@ -395,7 +641,7 @@ class ConvTranspose3d(Function):
             https://arxiv.org/pdf/1603.07285.pdf
         ''' 
         batch, channel, height, width, depth = x.shape 
-        patch, _, kernel_height, kernel_width, kernel_depth = kernel.shape 
+        _, patch, kernel_height, kernel_width, kernel_depth = kernel.shape 
 
         # output padding term is purposely dropped from oh and oh calculation below.
         oh = int((height-1)*stride[0]-2*padding[0]+dilation[0]*(kernel_height-1)+1) 
@@ -405,34 +651,42 @@ class ConvTranspose3d(Function):
         offset_h = dilation[0]*(kernel_height-1)+1-padding[0]
         offset_w = dilation[1]*(kernel_width-1)+1-padding[1]
         offset_d = dilation[2]*(kernel_depth-1)+1-padding[2]
-        padded = np.zeros((batch, channel, (height-1)*stride[0]-1+offset_h*2, (width-1)*stride[1]-1+offset_w*2, (depth-1)*stride[2]-1+offset_d*2))
+        padded = np.zeros((batch, channel, (height-1)*stride[0]-1+offset_h*2, (width-1)*stride[1]-1+offset_w*2, (depth-1)*stride[2]-1+offset_d*2), dtype=x.dtype)
         padded[:,:,offset_h-1:(height-1)*stride[0]+offset_h,offset_w-1:(width-1)*stride[1]+offset_w,offset_d-1:(depth-1)*stride[2]+offset_d][:,:, ::stride[0], ::stride[1], ::stride[2]] = x.data
         reshaped = Conv3d.unfold(padded, batch, oh, ow, od, kernel.shape, (1,1,1), dilation)
         if bias is None: 
-            tmp = np.tensordot(reshaped, np.rot90(kernel.data.reshape(*kernel.shape[:-2],-1), k=2, axes=(2,3)).reshape(*kernel.shape), ((2,3,4,5),(0,2,3,4))).transpose(0,2,1).reshape(-1,patch,oh,ow,od)
-            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1], od+2*output_padding[2]))
+            tmp = _tensordot(reshaped, np.rot90(kernel.data.reshape(*kernel.shape[:-2],-1), k=2, axes=(2,3)).reshape(*kernel.shape), ((4,5,6,7),(0,2,3,4))).transpose(0,4,1,2,3)
+            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1], od+2*output_padding[2]), dtype=x.dtype)
             out[:,:,output_padding[0]:oh+output_padding[0],output_padding[1]:ow+output_padding[1],output_padding[2]:od+output_padding[2]] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose3d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, od=od, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation)) 
+            result.set_creator(ConvTranspose3d.prepare(result.shape, x, kernel, bias=False, oh=oh, ow=ow, od=od, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation)) 
         else:
-            tmp = np.add(np.tensordot(reshaped, np.rot90(kernel.data.reshape(*kernel.shape[:-2],-1), k=2, axes=(2,3)).reshape(*kernel.shape), ((2,3,4,5),(0,2,3,4))).transpose(0,2,1).reshape(-1,patch,oh,ow,od), np.reshape(bias.data, (1,-1,1,1,1)))
-            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1], od+2*output_padding[2]))
+            tmp = np.add(_tensordot(reshaped, np.rot90(kernel.data.reshape(*kernel.shape[:-2],-1), k=2, axes=(2,3)).reshape(*kernel.shape), ((4,5,6,7),(0,2,3,4))).transpose(0,4,1,2,3), np.reshape(bias.data, (1,-1,1,1,1)))
+            out = np.zeros((batch, patch, oh+2*output_padding[0], ow+2*output_padding[1], od+2*output_padding[2]), dtype=x.dtype)
             out[:,:,output_padding[0]:oh+output_padding[0],output_padding[1]:ow+output_padding[1],output_padding[2]:od+output_padding[2]] = tmp
             result = Tensor(out) 
-            result.set_creator(ConvTranspose3d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, od=od, reshaped=reshaped, padded_shape=padded.shape, output_padding=output_padding, dilation=dilation))
+            result.set_creator(ConvTranspose3d.prepare(result.shape, x, kernel, bias, bias=True, oh=oh, ow=ow, od=od, reshaped=_saved(reshaped, memory_saving), padded_shape=padded.shape, stride=stride, output_padding=output_padding, dilation=dilation))
         return result 
 
+    def unfolded(self):
+        '''Returns the windows of the padded input saved in forward, or rebuilds them in the memory-saving mode.
+        '''
+        if self.kwargs['reshaped'] is not None:
+            return self.kwargs['reshaped']
+        padded = _spread(self.var[0].data, self.kwargs['padded_shape'], self.kwargs['stride'])
+        return Conv3d.unfold(padded, None, self.kwargs['oh'], self.kwargs['ow'], self.kwargs['od'], self.var[1].shape, (1,1,1), self.kwargs['dilation'])
+
     def calc_grad(self, dx):
         batch, patch, _, _, _ = dx.shape 
         dx = dx[:,:,self.kwargs['output_padding'][0]:self.kwargs['oh']+self.kwargs['output_padding'][0], self.kwargs['output_padding'][1]:self.kwargs['ow']+self.kwargs['output_padding'][1], self.kwargs['output_padding'][2]:self.kwargs['od']+self.kwargs['output_padding'][2]]
-        delta = np.tensordot(np.reshape(dx,(batch,patch,-1)), np.rot90(self.var[1].data.reshape(*self.var[1].shape[:-2],-1), k=2, axes=(2,3)).reshape(*self.var[1].shape), (1,1))
-        delta = Conv3d.fold(delta, self.kwargs['oh'], self.kwargs['ow'], self.kwargs['od'], self.var[0].shape, self.var[1].shape, self.kwargs['padded_shape'], (1,1,1), self.kwargs['dilation'])
-        dk = np.tensordot(np.reshape(dx,(batch,patch,-1)), self.kwargs['reshaped'], ((0,2),(0,1))) 
+        delta = _tensordot(dx, np.rot90(self.var[1].data.reshape(*self.var[1].shape[:-2],-1), k=2, axes=(2,3)).reshape(*self.var[1].shape), (1,1))
+        delta = _fold_transposed(delta, self.var[0].shape, self.kwargs['padded_shape'], self.kwargs['stride'], self.kwargs['dilation'])
+        dk = _tensordot(dx, self.unfolded(), ((0,2,3,4),(0,1,2,3))) 
         dk = np.rot90(dk.reshape(*dk.shape[:-2],-1), k=2, axes=(2,3)).reshape(*dk.shape).transpose(1,0,2,3,4)
         if not self.kwargs['bias']:
             return delta, dk
         else:
-            db = ConvTranspose2d.handle_broadcast(dx, self.var[2])
+            db = np.sum(dx, axis=(0,)+tuple(range(2, dx.ndim)))
             return delta, dk, db
 
 convtranspose3d = ConvTranspose3d(None)
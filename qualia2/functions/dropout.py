@@ -7,26 +7,34 @@ class Dropout(Function):
     def forward(x, p=0.5, training=True):
         '''
         During training, randomly zeroes some of the elements of the input tensor with probability p using samples from a Bernoulli distribution. 
-        Each channel will be zeroed out independently on every forward call.
+        Each channel will be zeroed out independently on every forward call. The remaining elements are scaled by 1/(1-p), 
+        hence the output is the input as it is during evaluation. The samples are drawn from the generator seeded by manual_seed 
+        and the mask is kept bit-packed for the backward.
         Args:
             x (Tensor): Input tensor with any shepe
             p (float): probability that randomly zeroes some of the elements of the input tensor
             training (bool): True if the model is in training
         '''
-        if training:
-            np.random.seed()
-            mask = (np.random.binomial(1,p,x.shape) == 1)
-            tmp = x.data.copy()
-            tmp[mask] = 0
-            result = Tensor(tmp)
-            result.set_creator(Dropout.prepare(result.shape, x, mask=mask))
+        if not training or p == 0:
+            return x
+        if p >= 1:
+            result = Tensor(np.zeros_like(x.data))
+            result.set_creator(Dropout.prepare(result.shape, x, mask=None, scale=0))
             return result
-        else:
-            return x        
+        mask = get_generator().random(x.shape, dtype='float32') >= p
+        scale = 1/(1-p)
+        tmp = np.multiply(x.data, scale)
+        np.multiply(tmp, mask, out=tmp)
+        result = Tensor(tmp)
+        result.set_creator(Dropout.prepare(result.shape, x, mask=np.packbits(mask, axis=None), scale=scale))
+        return result
     
     def calc_grad(self, dx):
-        tmp = dx.copy()
-        tmp[self.kwargs['mask']] = 0
+        if self.kwargs['mask'] is None:
+            return np.zeros_like(dx)
+        mask = np.unpackbits(self.kwargs['mask'])[:dx.size].reshape(dx.shape)
+        tmp = np.multiply(dx, self.kwargs['scale'])
+        np.multiply(tmp, mask, out=tmp)
         return tmp
 
 dropout = Dropout(None)
\ No newline at end of file
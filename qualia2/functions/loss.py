@@ -162,16 +162,18 @@ class LogisticBinaryCrossEntropy(Function):
     Model: 
         l_n = y_n*log(1+exp(-x_n))+(1-y_n)*log(1+exp(x_n))
 
+    The loss is computed as max(x_n,0)-x_n*y_n+log(1+exp(-|x_n|)), hence it stays finite for any logits. 
+
     Shape:
-        - Input: [N, 1]
-        - Target: [N, 1]
-        - Output: [1] by default
-                  [N] if not reduce
+        - Input: [N, *]
+        - Target: [N, *]
+        - Output: [*] by default
+                  [N, *] if not reduce
     '''
     @staticmethod
     def forward(input, target, reduce=True, size_average=True):
-        sigmoid = np.divide(1, np.add(1, np.exp(np.negative(input.data))))
-        tmp = np.add(np.multiply(target.data, np.log(sigmoid+1e-8)), np.multiply((1-target.data), np.log(1-sigmoid+1e-8)))
+        sigmoid = np.multiply(0.5, np.add(1, np.tanh(np.multiply(0.5, input.data))))
+        tmp = np.maximum(input.data, 0) - np.multiply(input.data, target.data) + np.log1p(np.exp(-np.abs(input.data)))
         if reduce:
             if size_average:
                 result = Tensor(np.mean(tmp,axis=0))
@@ -179,19 +181,26 @@ class LogisticBinaryCrossEntropy(Function):
                 result = Tensor(np.sum(tmp,axis=0))
         else:
             result = Tensor(tmp)
-        result.set_creator(BinaryCrossEntropy.prepare(result.shape, input, target, tmp=sigmoid))
+        result.set_creator(LogisticBinaryCrossEntropy.prepare(result.shape, input, target, tmp=sigmoid))
         return result
     
     def calc_grad(self, dx):
-        return np.subtract(self.kwargs['tmp'], self.var[1].data), np.subtract(np.log(self.kwargs['tmp']), np.log(np.subtract(1, self.kwargs['tmp'])))
+        return np.subtract(self.kwargs['tmp'], self.var[1].data), np.negative(self.var[0].data)
 
 logistic_binary_cross_entropy = LogisticBinaryCrossEntropy(None)
 
+def _class_index(input, target):
+    '''Returns the class index of each sample if target holds class indices with shape of [N], otherwise None for one-hot targets.
+    '''
+    if target.ndim == input.ndim-1:
+        return target.data.astype(np.int64, copy=False)
+    return None
+
 class CrossEntropy(Function):
     ''''Creates a criterion that measures the Cross Entropy between the target and the output\n
     Args:
         input (Tensor): output of the network
-        target (Tensor): one-hot representation of label for the dataset
+        target (Tensor): one-hot representation of label for the dataset, or the class index of each sample
         reduce (bool): the losses are averaged or summed over observations for each minibatch depending on size_average. 
         size_average (bool): the losses are averaged over each loss element in the batch.
         
@@ -200,13 +209,17 @@ class CrossEntropy(Function):
 
     Shape:
         - Input: [N, num_class]
-        - Target: [N, num_class]
+        - Target: [N, num_class] or [N] for class indices
         - Output: [1] by default
                   [N] if not reduce
     '''
     @staticmethod
     def forward(input, target, reduce=True, size_average=True):
-        tmp = -np.sum(np.multiply(target.data, np.log(input.data)), axis=1)
+        idx = _class_index(input, target)
+        if idx is None:
+            tmp = -np.sum(np.multiply(target.data, np.log(input.data)), axis=1)
+        else:
+            tmp = -np.log(input.data[np.arange(len(idx)), idx])
         if reduce:
             if size_average:
                 result = Tensor(np.mean(tmp,axis=0))
@@ -214,21 +227,29 @@ class CrossEntropy(Function):
                 result = Tensor(np.sum(tmp,axis=0))
         else:
             result = Tensor(tmp)
-        result.set_creator(CrossEntropy.prepare(result.shape, input, target))
+        result.set_creator(CrossEntropy.prepare(result.shape, input, target, idx=idx))
         return result
 
     def calc_grad(self, dx):
-        dt = -np.log(self.var[0].data)
-        dx = -np.divide(self.var[1].data, self.var[0].data)
-        return dx, dt
+        idx = self.kwargs['idx']
+        if idx is None:
+            dt = -np.log(self.var[0].data)
+            dx = -np.divide(self.var[1].data, self.var[0].data)
+            return dx, dt
+        rows = np.arange(len(idx))
+        dx = np.zeros_like(self.var[0].data)
+        dx[rows, idx] = -np.divide(1, self.var[0].data[rows, idx])
+        return dx, None
     
 cross_entropy = CrossEntropy(None)
 
 class SoftmaxCrossEntropy(Function):
     ''''Creates a criterion that measures the Cross Entropy between the target and the softmax of output\n
+    The log-softmax is computed with the log-sum-exp of the shifted output, hence the loss stays finite for any logits. 
+    For class indices, neither the forward nor the backward builds the one-hot matrix.
     Args:
         input (Tensor): output of the network
-        target (Tensor): one-hot representation of label for the dataset
+        target (Tensor): one-hot representation of label for the dataset, or the class index of each sample
         reduce (bool): the losses are averaged or summed over observations for each minibatch depending on size_average. 
         size_average (bool): the losses are averaged over each loss element in the batch.
         
@@ -237,16 +258,21 @@ class SoftmaxCrossEntropy(Function):
 
     Shape:
         - Input: [N, num_class]
-        - Target: [N, num_class]
+        - Target: [N, num_class] or [N] for class indices
         - Output: [1] by default
                   [N] if not reduce
     '''
     @staticmethod
     def forward(input, target, reduce=True, size_average=True):
-        const = np.max(input.data, axis=1, keepdims=True)
-        exp = np.exp(np.subtract(input.data, const))
-        softmax = np.divide(exp, np.sum(exp, axis=1, keepdims=True))
-        tmp = -np.sum(np.multiply(target.data, np.log(softmax)), axis=1)
+        idx = _class_index(input, target)
+        shifted = np.subtract(input.data, np.max(input.data, axis=1, keepdims=True))
+        softmax = np.exp(shifted)
+        sumexp = np.sum(softmax, axis=1, keepdims=True)
+        if idx is None:
+            tmp = -np.sum(np.multiply(target.data, np.subtract(shifted, np.log(sumexp))), axis=1)
+        else:
+            tmp = np.subtract(np.log(sumexp[:,0]), shifted[np.arange(len(idx)), idx])
+        softmax /= sumexp
         if reduce:
             if size_average:
                 result = Tensor(np.mean(tmp,axis=0))
@@ -254,10 +280,16 @@ class SoftmaxCrossEntropy(Function):
                 result = Tensor(np.sum(tmp,axis=0))
         else:
             result = Tensor(tmp)
-        result.set_creator(SoftmaxCrossEntropy.prepare(result.shape, input, target, tmp=softmax))
+        result.set_creator(SoftmaxCrossEntropy.prepare(result.shape, input, target, tmp=softmax, idx=idx))
         return result
     
     def calc_grad(self, dx):
-        return np.subtract(self.kwargs['tmp'], self.var[1].data), -np.log(self.kwargs['tmp'])
+        idx = self.kwargs['idx']
+        if idx is None:
+            return np.subtract(self.kwargs['tmp'], self.var[1].data), -np.log(self.kwargs['tmp'])
+        # softmax - onehot
+        dx = np.copy(self.kwargs['tmp'])
+        dx[np.arange(len(idx)), idx] -= 1
+        return dx, None
 
 softmax_cross_entropy = SoftmaxCrossEntropy(None)
@@ -1,6 +1,91 @@
 # -*- coding: utf-8 -*- 
 from ..core import *
 from ..autograd import *
+from .conv import _sliding_window
+from itertools import product
+from math import prod
+
+def _reduce(f, x, axis):
+    '''Applies the reduction f to the batch chunks of x in the intra-op thread pool.
+    '''
+    results = parallel_for(lambda start, stop: f(x[start:stop], axis=axis), x.shape[0])
+    return results[0] if len(results) == 1 else np.concatenate(results)
+
+def _pool_windows(x, out_size, kernel_size, stride, dilation):
+    '''Returns the windows of a padded input with shape of [batch, channel, prod(out_size), prod(kernel_size)].\n
+    Non-overlapping windows (kernel_size == stride without dilation) are taken by reshaping the input, and 
+    other windows by a strided view, so that no Python loop runs over the output positions.
+    '''
+    batch, channel = x.shape[:2]
+    n = len(out_size)
+    if tuple(kernel_size) == tuple(stride) and all(d == 1 for d in dilation):
+        x = x[(slice(None), slice(None)) + tuple(slice(0, o*k) for o, k in zip(out_size, kernel_size))]
+        x = x.reshape((batch, channel) + tuple(s for o, k in zip(out_size, kernel_size) for s in (o, k)))
+        x = x.transpose((0, 1) + tuple(range(2, 2*n+2, 2)) + tuple(range(3, 2*n+3, 2)))
+    else:
+        x = np.moveaxis(_sliding_window(x, out_size, kernel_size, stride, dilation), n+1, 1)
+    return x.reshape(batch, channel, prod(out_size), prod(kernel_size))
+
+def _scatter_argmax(delta, argmax, padded_shape, kernel_size, stride, dilation):
+    '''Scatters delta with shape of [batch, channel, *out_size] to the elements of the windows selected by argmax, 
+    which holds the flat index of the element in each window.
+    '''
+    batch, channel = delta.shape[:2]
+    out_size = delta.shape[2:]
+    n = len(out_size)
+    size = prod(padded_shape[2:])
+    pos = 0
+    for i, k in enumerate(np.unravel_index(argmax, kernel_size)):
+        o = np.arange(out_size[i]).reshape((-1,)+(1,)*(n-1-i))
+        pos = pos*padded_shape[2+i] + o*stride[i] + k*dilation[i]
+    pos = pos + (np.arange(batch*channel)*size).reshape((batch, channel)+(1,)*n)
+    if all((k-1)*d < s for k, s, d in zip(kernel_size, stride, dilation)):
+        # each element belongs to one window at most
+        result = np.zeros(batch*channel*size, dtype=delta.dtype)
+        result[pos.reshape(-1)] = delta.reshape(-1)
+    else:
+        result = np.bincount(pos.reshape(-1), weights=delta.reshape(-1), minlength=batch*channel*size).astype(delta.dtype)
+    return result.reshape(padded_shape)
+
+def _scatter_average(delta, padded_shape, kernel_size, stride, dilation):
+    '''Spreads delta with shape of [batch, channel, *out_size] uniformly over the elements of each window.
+    '''
+    out_size = delta.shape[2:]
+    delta = delta / prod(kernel_size)
+    result = np.zeros(padded_shape, dtype=delta.dtype)
+    def work(start, stop):
+        chunk = result[start:stop]
+        for offset in product(*[range(k) for k in kernel_size]):
+            idx = (slice(None), slice(None)) + tuple(slice(i*d, i*d+(o-1)*s+1, s) for i, o, s, d in zip(offset, out_size, stride, dilation))
+            chunk[idx] += delta[start:stop]
+    parallel_for(work, padded_shape[0])
+    return result
+
+def _crop(x, shape):
+    '''Returns the center of x with the spatial size of shape, which removes the padding.
+    '''
+    return x[(slice(None), slice(None)) + tuple(slice((p-n)//2, (p-n)//2+n) for n, p in zip(shape[2:], x.shape[2:]))]
+
+def _adaptive_windows(in_size, out_size):
+    '''Returns the windows of an adaptive pooling as flat indices of the input and a mask of the valid elements.\n
+    The i-th window along a dimension spans [floor(i*in/out), ceil((i+1)*in/out)). Windows shorter than the longest 
+    one are filled up by repeating their last index, which is masked out.
+    Returns:
+        (ndarray): indices with shape of [prod(out_size), K]
+        (ndarray): mask with shape of [prod(out_size), K]
+    '''
+    n = len(out_size)
+    pos, mask = 0, 1
+    for i, (size, out) in enumerate(zip(in_size, out_size)):
+        start = (np.arange(out)*size)//out
+        end = -((-(np.arange(out)+1)*size)//out)
+        idx = start[:,None] + np.arange(int((end-start).max()))[None,:]
+        shape = [1]*(2*n)
+        shape[i], shape[n+i] = idx.shape
+        pos = pos*size + np.minimum(idx, end[:,None]-1).reshape(shape)
+        mask = mask * (idx < end[:,None]).reshape(shape)
+    shape = np.broadcast(pos, mask).shape
+    return np.broadcast_to(pos, shape).reshape(prod(out_size), -1), np.broadcast_to(mask, shape).reshape(prod(out_size), -1)
 
 class MaxPool1d(Function):
     @staticmethod
@@ -21,10 +106,11 @@ class MaxPool1d(Function):
  
         ow = int((width+2*padding-dilation*(kernel_width-1)-1)/stride+1)
 
-        padded = np.zeros((batch, channel, width+2*padding))
+        padded = np.zeros((batch, channel, width+2*padding), dtype=x.dtype)
         padded[:,:,padding:width+padding] = x.data
         reshaped = MaxPool1d.unfold(padded, batch, ow, channel, kernel_width, stride, dilation)
-        tmp, idx = map(lambda f: np.reshape(f(reshaped, axis=3),(batch, channel, ow)), [np.max, np.argmax])
+        idx = _reduce(np.argmax, reshaped, 3)
+        tmp, idx = map(lambda a: np.reshape(a, (batch, channel, ow)), [np.take_along_axis(reshaped, idx[...,None], 3), idx])
         result = Tensor(tmp)
         result.set_creator(MaxPool1d.prepare(result.shape, x, idx=idx, kernel_width=kernel_width, padded_shape=padded.shape, stride=stride, dilation=dilation))
         if return_indices:
@@ -34,24 +120,12 @@ class MaxPool1d(Function):
 
     @staticmethod
     def unfold(x, batch, ow, channel, kernel_width, stride, dilation):
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros((batch, channel, ow, kernel_width))
-        for j in range(ow): 
-            tmp = x[:, :, j*stride:j*stride+fw] 
-            result[:, :, j, :] = tmp[:, :, ::dilation] 
-        return result
+        return _pool_windows(x, (ow,), (kernel_width,), (stride,), (dilation,))
 
     @staticmethod
     def fold(delta, kernel_width, argmax, ow, x_shape, padded_shape, stride, dilation): 
-        batch, channel, width = x_shape
-        _, _, pw = padded_shape 
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros(padded_shape)
-        for j in range(ow): 
-            tmp = np.zeros((batch, channel, fw))
-            tmp[:, :, ::dilation][:,:,argmax[:,:,j]] = delta[:,:,j] 
-            result[:, :, j*stride:j*stride+fw] += tmp 
-        return result[:,:,int((pw-width)/2):pw-int((pw-width)/2)]
+        result = _scatter_argmax(delta, argmax, padded_shape, (kernel_width,), (stride,), (dilation,))
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, ow = dx.shape
@@ -78,13 +152,14 @@ class MaxPool2d(Function):
         batch, channel, height, width = x.shape
         kernel_height, kernel_width = kernel_size
 
-        oh = int((height-2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
+        oh = int((height+2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1]] = x.data
         reshaped = MaxPool2d.unfold(padded, batch, oh, ow, channel, kernel_height, kernel_width, stride, dilation)
-        tmp, idx = map(lambda f: np.reshape(f(reshaped, axis=3),(batch, channel, oh, ow)), [np.max, np.argmax])
+        idx = _reduce(np.argmax, reshaped, 3)
+        tmp, idx = map(lambda a: np.reshape(a, (batch, channel, oh, ow)), [np.take_along_axis(reshaped, idx[...,None], 3), idx])
         result = Tensor(tmp)
         result.set_creator(MaxPool2d.prepare(result.shape, x, idx=idx, kernel_size=kernel_size, padded_shape=padded.shape, stride=stride, dilation=dilation))
         if return_indices:
@@ -94,27 +169,12 @@ class MaxPool2d(Function):
 
     @staticmethod
     def unfold(x, batch, oh, ow, channel, kernel_height, kernel_width, stride, dilation):
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1) 
-        result = np.zeros((batch, channel, oh*ow, kernel_height, kernel_width))
-        for i in range(oh): 
-            for j in range(ow): 
-                tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] 
-                result[:, :, i*ow+j, :, :] = tmp[:, :, ::dilation[0], ::dilation[1]] 
-        return np.reshape(result, (batch, channel, oh*ow, kernel_height*kernel_width))
+        return _pool_windows(x, (oh, ow), (kernel_height, kernel_width), stride, dilation)
 
     @staticmethod
     def fold(delta, kernel_size, argmax, oh, ow, x_shape, padded_shape, stride, dilation): 
-        batch, channel, height, width = x_shape 
-        kernel_height, kernel_width = kernel_size
-        _, _, ph, pw = padded_shape 
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1)
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                tmp = np.zeros((batch, channel, fh, fw))
-                tmp[:, :, ::dilation[0], ::dilation[1]].reshape(batch, channel,-1)[:,:,argmax[:,:,i,j]] = delta[:,:,i,j] 
-                result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] += tmp 
-        return result[:,:,int((ph-height)/2):ph-int((ph-height)/2),int((pw-width)/2):pw-int((pw-width)/2)]
+        result = _scatter_argmax(delta, argmax, padded_shape, kernel_size, stride, dilation)
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, oh, ow = dx.shape
@@ -142,14 +202,15 @@ class MaxPool3d(Function):
         batch, channel, height, width, depth = x.shape
         kernel_height, kernel_width, kernel_depth = kernel_size
 
-        oh = int((height-2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
+        oh = int((height+2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
         od = int((depth+2*padding[2]-dilation[2]*(kernel_depth-1)-1)/stride[2]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1],padding[2]:depth+padding[2]] = x.data
         reshaped = MaxPool3d.unfold(padded, batch, oh, ow, od, channel, kernel_height, kernel_width, kernel_depth, stride, dilation)
-        tmp, idx = map(lambda f: np.reshape(f(reshaped, axis=3),(batch, channel, oh, ow, od)), [np.max, np.argmax])
+        idx = _reduce(np.argmax, reshaped, 3)
+        tmp, idx = map(lambda a: np.reshape(a, (batch, channel, oh, ow, od)), [np.take_along_axis(reshaped, idx[...,None], 3), idx])
         result = Tensor(tmp)
         result.set_creator(MaxPool3d.prepare(result.shape, x, idx=idx, kernel_size=kernel_size, padded_shape=padded.shape, stride=stride, dilation=dilation))
         if return_indices:
@@ -159,30 +220,12 @@ class MaxPool3d(Function):
 
     @staticmethod
     def unfold(x, batch, oh, ow, od, channel, kernel_height, kernel_width, kernel_depth, stride, dilation):
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros((batch, channel, oh*ow*od, kernel_height, kernel_width, kernel_depth))
-        for i in range(oh): 
-            for j in range(ow):
-                for k in range(od):
-                    tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] 
-                    result[:, :, i*ow*od+j*ow+k, :, :, :] = tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]] 
-
-        return np.reshape(result, (batch, channel, oh*ow*od, kernel_height*kernel_width*kernel_depth))
+        return _pool_windows(x, (oh, ow, od), (kernel_height, kernel_width, kernel_depth), stride, dilation)
 
     @staticmethod
     def fold(delta, kernel_size, argmax, oh, ow, od, x_shape, padded_shape, stride, dilation): 
-        batch, channel, height, width, depth = x_shape 
-        kernel_height, kernel_width, kernel_depth = kernel_size
-        _, _, ph, pw, pd = padded_shape 
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                for k in range(od):
-                    tmp = np.zeros((batch, channel, fh, fw, fd))
-                    tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]].reshape(batch, channel,-1)[:,:,argmax[:,:,i,j,k]] = delta[:,:,i,j,k] 
-                    result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] += tmp 
-        return result[:,:,int((ph-height)/2):ph-int((ph-height)/2),int((pw-width)/2):pw-int((pw-width)/2),int((pd-depth)/2):pd-int((pd-depth)/2)]
+        result = _scatter_argmax(delta, argmax, padded_shape, kernel_size, stride, dilation)
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, oh, ow, od = dx.shape
@@ -208,33 +251,21 @@ class AvePool1d(Function):
  
         ow = int((width+2*padding-dilation*(kernel_width-1)-1)/stride+1)
 
-        padded = np.zeros((batch, channel, width+2*padding))
+        padded = np.zeros((batch, channel, width+2*padding), dtype=x.dtype)
         padded[:,:,padding:width+padding] = x.data
         reshaped = AvePool1d.unfold(padded, batch, ow, channel, kernel_width, stride, dilation)
-        result = Tensor(np.reshape(np.average(reshaped, axis=3),(batch, channel, ow)))
+        result = Tensor(np.reshape(_reduce(np.average, reshaped, 3),(batch, channel, ow)))
         result.set_creator(AvePool1d.prepare(result.shape, x, kernel_width=kernel_width, padded_shape=padded.shape, stride=stride, dilation=dilation))
         return result
 
     @staticmethod
     def unfold(x, batch, ow, channel, kernel_width, stride, dilation):
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros((batch, channel, ow, kernel_width))
-        for j in range(ow): 
-            tmp = x[:, :, j*stride:j*stride+fw] 
-            result[:, :, j, :] = tmp[:, :, ::dilation] 
-        return result
+        return _pool_windows(x, (ow,), (kernel_width,), (stride,), (dilation,))
 
     @staticmethod
     def fold(delta, kernel_width, ow, x_shape, padded_shape, stride, dilation): 
-        batch, channel, width = x_shape
-        _, _, pw = padded_shape 
-        fw = (kernel_width-1)*dilation+1
-        result = np.zeros(padded_shape)
-        for j in range(ow): 
-            tmp = np.zeros((batch, channel, fw))
-            tmp[:, :, ::dilation] = delta[:,:,j]/kernel_width
-            result[:, :, j*stride:j*stride+fw] += tmp 
-        return result[:,:,int((pw-width)/2):pw-int((pw-width)/2)]
+        result = _scatter_average(delta, padded_shape, (kernel_width,), (stride,), (dilation,))
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, ow = dx.shape
@@ -260,39 +291,24 @@ class AvePool2d(Function):
         batch, channel, height, width = x.shape
         kernel_height, kernel_width = kernel_size
 
-        oh = int((height-2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
+        oh = int((height+2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1]] = x.data
         reshaped = AvePool2d.unfold(padded, batch, oh, ow, channel, kernel_height, kernel_width, stride, dilation)
-        result = Tensor(np.reshape(np.average(reshaped, axis=3),(batch, channel, oh, ow)))
+        result = Tensor(np.reshape(_reduce(np.average, reshaped, 3),(batch, channel, oh, ow)))
         result.set_creator(AvePool2d.prepare(result.shape, x, kernel_size=kernel_size, padded_shape=padded.shape, stride=stride, dilation=dilation))
         return result
 
     @staticmethod
     def unfold(x, batch, oh, ow, channel, kernel_height, kernel_width, stride, dilation):
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1) 
-        result = np.zeros((batch, channel, oh*ow, kernel_height, kernel_width))
-        for i in range(oh): 
-            for j in range(ow): 
-                tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] 
-                result[:, :, i*ow+j, :, :] = tmp[:, :, ::dilation[0], ::dilation[1]] 
-        return np.reshape(result, (batch, channel, oh*ow, kernel_height*kernel_width))
+        return _pool_windows(x, (oh, ow), (kernel_height, kernel_width), stride, dilation)
 
     @staticmethod
     def fold(delta, kernel_size, oh, ow, x_shape, padded_shape, stride, dilation): 
-        batch, channel, height, width = x_shape 
-        kernel_height, kernel_width = kernel_size
-        _, _, ph, pw = padded_shape 
-        fh, fw = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1)
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                tmp = np.zeros((batch, channel, fh, fw))
-                tmp[:, :, ::dilation[0], ::dilation[1]] = delta[:,:,i,j]/(kernel_height*kernel_width) 
-                result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw] += tmp 
-        return result[:,:,int((ph-height)/2):ph-int((ph-height)/2),int((pw-width)/2):pw-int((pw-width)/2)]
+        result = _scatter_average(delta, padded_shape, kernel_size, stride, dilation)
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, oh, ow = dx.shape
@@ -319,44 +335,26 @@ class AvePool3d(Function):
         batch, channel, height, width, depth = x.shape
         kernel_height, kernel_width, kernel_depth = kernel_size
 
-        oh = int((height-2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
+        oh = int((height+2*padding[0]-dilation[0]*(kernel_height-1)-1)/stride[0]+1) 
         ow = int((width+2*padding[1]-dilation[1]*(kernel_width-1)-1)/stride[1]+1)
         od = int((depth+2*padding[2]-dilation[2]*(kernel_depth-1)-1)/stride[2]+1)
 
-        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]))
+        padded = np.zeros((batch, channel, height+2*padding[0], width+2*padding[1], depth+2*padding[2]), dtype=x.dtype)
         padded[:,:,padding[0]:height+padding[0],padding[1]:width+padding[1],padding[2]:depth+padding[2]] = x.data
         reshaped = AvePool3d.unfold(padded, batch, oh, ow, od, channel, kernel_height, kernel_width, kernel_depth, stride, dilation)
 
-        result = Tensor(np.reshape(np.average(reshaped, axis=3),(batch, channel, oh, ow, od)))
+        result = Tensor(np.reshape(_reduce(np.average, reshaped, 3),(batch, channel, oh, ow, od)))
         result.set_creator(AvePool3d.prepare(result.shape, x, kernel_size=kernel_size, padded_shape=padded.shape, stride=stride, dilation=dilation))
         return result
 
     @staticmethod
     def unfold(x, batch, oh, ow, od, channel, kernel_height, kernel_width, kernel_depth, stride, dilation):
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros((batch, channel, oh*ow*od, kernel_height, kernel_width, kernel_depth))
-        for i in range(oh): 
-            for j in range(ow):
-                for k in range(od):
-                    tmp = x[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] 
-                    result[:, :, i*ow*od+j*ow+k, :, :, :] = tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]] 
-
-        return np.reshape(result, (batch, channel, oh*ow*od, kernel_height*kernel_width*kernel_depth))
+        return _pool_windows(x, (oh, ow, od), (kernel_height, kernel_width, kernel_depth), stride, dilation)
 
     @staticmethod
     def fold(delta, kernel_size, oh, ow, od, x_shape, padded_shape, stride, dilation): 
-        batch, channel, height, width, depth = x_shape 
-        kernel_height, kernel_width, kernel_depth = kernel_size
-        _, _, ph, pw, pd = padded_shape 
-        fh, fw, fd = ((kernel_height-1)*dilation[0]+1, (kernel_width-1)*dilation[1]+1, (kernel_depth-1)*dilation[2]+1) 
-        result = np.zeros(padded_shape)
-        for i in range(oh): 
-            for j in range(ow): 
-                for k in range(od):
-                    tmp = np.zeros((batch, channel, fh, fw, fd))
-                    tmp[:, :, ::dilation[0], ::dilation[1], ::dilation[2]] = delta[:,:,i,j,k]/(kernel_height*kernel_width*kernel_depth) 
-                    result[:, :, i*stride[0]:i*stride[0]+fh, j*stride[1]:j*stride[1]+fw, k*stride[2]:k*stride[2]+fd] += tmp 
-        return result[:,:,int((ph-height)/2):ph-int((ph-height)/2),int((pw-width)/2):pw-int((pw-width)/2),int((pd-depth)/2):pd-int((pd-depth)/2)]
+        result = _scatter_average(delta, padded_shape, kernel_size, stride, dilation)
+        return _crop(result, x_shape)
 
     def calc_grad(self, dx):
         _, _, oh, ow, od = dx.shape
@@ -394,6 +392,90 @@ class GlobalAvePool3d(Function):
 
 globalavepool3d = GlobalAvePool3d(None)
 
+class AdaptiveMaxPool(Function):
+    @staticmethod
+    def forward(x, output_size):
+        '''Applies an adaptive max pooling over an input signal composed of several input planes.\n
+        The i-th window along a dimension of size n spans [floor(i*n/out), ceil((i+1)*n/out)). 
+        If the input size is divisible by the output size, the strided max pooling is used.
+        Args:
+            x (Tensor): input tensor with 1 to 3 spatial dimensions 
+            output_size (int|tuple of int): the size of the output
+        Shape:
+            - Input: [N,C,*]
+            - Output: [N,C,*output_size]
+        '''
+        batch, channel = x.shape[:2]
+        in_size = x.shape[2:]
+        output_size = (output_size,)*len(in_size) if isinstance(output_size, int) else tuple(output_size)
+        if all(n % o == 0 for n, o in zip(in_size, output_size)):
+            kernel_size = tuple(n//o for n, o in zip(in_size, output_size))
+            if len(in_size) == 1:
+                return MaxPool1d.forward(x, kernel_size[0], kernel_size[0], 0, 1)
+            if len(in_size) == 2:
+                return MaxPool2d.forward(x, kernel_size, kernel_size, (0,0), (1,1))
+            return MaxPool3d.forward(x, kernel_size, kernel_size, (0,0,0), (1,1,1))
+        pos, _ = _adaptive_windows(in_size, output_size)
+        # the repeated indices of shorter windows do not change the max
+        reshaped = np.reshape(x.data, (batch, channel, -1))[:,:,pos]
+        idx = _reduce(np.argmax, reshaped, 3)
+        result = Tensor(np.take_along_axis(reshaped, idx[...,None], 3)[...,0].reshape(batch, channel, *output_size))
+        result.set_creator(AdaptiveMaxPool.prepare(result.shape, x, pos=pos[np.arange(pos.shape[0]), idx]))
+        return result
+
+    def calc_grad(self, dx):
+        batch, channel = dx.shape[:2]
+        size = prod(self.var[0].shape[2:])
+        pos = self.kwargs['pos'] + (np.arange(batch*channel)*size).reshape(batch, channel, 1)
+        result = np.bincount(pos.reshape(-1), weights=dx.reshape(-1), minlength=batch*channel*size).astype(dx.dtype)
+        return result.reshape(self.var[0].shape)
+
+adaptivemaxpool1d = AdaptiveMaxPool(None)
+adaptivemaxpool2d = AdaptiveMaxPool(None)
+adaptivemaxpool3d = AdaptiveMaxPool(None)
+
+class AdaptiveAvePool(Function):
+    @staticmethod
+    def forward(x, output_size):
+        '''Applies an adaptive average pooling over an input signal composed of several input planes.\n
+        The i-th window along a dimension of size n spans [floor(i*n/out), ceil((i+1)*n/out)). 
+        If the input size is divisible by the output size, the strided average pooling is used.
+        Args:
+            x (Tensor): input tensor with 1 to 3 spatial dimensions 
+            output_size (int|tuple of int): the size of the output
+        Shape:
+            - Input: [N,C,*]
+            - Output: [N,C,*output_size]
+        '''
+        batch, channel = x.shape[:2]
+        in_size = x.shape[2:]
+        output_size = (output_size,)*len(in_size) if isinstance(output_size, int) else tuple(output_size)
+        if all(n % o == 0 for n, o in zip(in_size, output_size)):
+            kernel_size = tuple(n//o for n, o in zip(in_size, output_size))
+            if len(in_size) == 1:
+                return AvePool1d.forward(x, kernel_size[0], kernel_size[0], 0, 1)
+            if len(in_size) == 2:
+                return AvePool2d.forward(x, kernel_size, kernel_size, (0,0), (1,1))
+            return AvePool3d.forward(x, kernel_size, kernel_size, (0,0,0), (1,1,1))
+        pos, mask = _adaptive_windows(in_size, output_size)
+        weight = (mask / np.sum(mask, axis=1, keepdims=True)).astype(x.dtype)
+        reshaped = np.reshape(x.data, (batch, channel, -1))[:,:,pos]
+        result = Tensor(np.sum(reshaped*weight, axis=3).reshape(batch, channel, *output_size))
+        result.set_creator(AdaptiveAvePool.prepare(result.shape, x, pos=pos, weight=weight))
+        return result
+
+    def calc_grad(self, dx):
+        batch, channel = dx.shape[:2]
+        size = prod(self.var[0].shape[2:])
+        pos = self.kwargs['pos'] + (np.arange(batch*channel)*size).reshape(batch, channel, 1, 1)
+        delta = np.reshape(dx, (batch, channel, -1, 1))*self.kwargs['weight']
+        result = np.bincount(pos.reshape(-1), weights=delta.reshape(-1), minlength=batch*channel*size).astype(dx.dtype)
+        return result.reshape(self.var[0].shape)
+
+adaptiveavepool1d = AdaptiveAvePool(None)
+adaptiveavepool2d = AdaptiveAvePool(None)
+adaptiveavepool3d = AdaptiveAvePool(None)
+
 class MaxUnpool1d(Function):
     @staticmethod
     def forward(x, indices, kernel_size=2, stride=2, padding=0, dilation=1):
@@ -421,11 +503,11 @@ class MaxUnpool1d(Function):
     def calc_grad(self, dx):
         b, c, w = dx.shape
         _, _, ow = self.var[0].shape
-        padded = np.zeros(self.kwargs['padded_shape'])
+        padded = np.zeros(self.kwargs['padded_shape'], dtype=dx.dtype)
         padded[:,:,self.kwargs['padding']:w+self.kwargs['padding']] = dx
         reshaped = MaxPool1d.unfold(padded, b, ow, c, self.kwargs['kernel_size'], self.kwargs['stride'], self.kwargs['dilation'])
         idx = self.kwargs['idx'].reshape(b,c,-1,1)
-        return np.choose(np.swapaxes(idx, 0, 3), np.swapaxes(reshaped, 0, 3)).reshape(b, c, ow)
+        return np.take_along_axis(reshaped, idx, 3).reshape(b, c, ow)
         
 maxunpool1d = MaxUnpool1d(None)
 
@@ -458,11 +540,11 @@ class MaxUnpool2d(Function):
     def calc_grad(self, dx):
         b, c, h, w = dx.shape
         _, _, oh, ow = self.var[0].shape
-        padded = np.zeros(self.kwargs['padded_shape'])
+        padded = np.zeros(self.kwargs['padded_shape'], dtype=dx.dtype)
         padded[:,:,self.kwargs['padding'][0]:h+self.kwargs['padding'][0],self.kwargs['padding'][1]:w+self.kwargs['padding'][1]] = dx
         reshaped = MaxPool2d.unfold(padded, b, oh, ow, c, self.kwargs['kernel_size'][0], self.kwargs['kernel_size'][1], self.kwargs['stride'], self.kwargs['dilation'])
         idx = self.kwargs['idx'].reshape(b,c,-1,1)
-        return np.choose(np.swapaxes(idx, 0, 3), np.swapaxes(reshaped, 0, 3)).reshape(b, c, oh, ow)
+        return np.take_along_axis(reshaped, idx, 3).reshape(b, c, oh, ow)
         
 maxunpool2d = MaxUnpool2d(None)
 
@@ -497,10 +579,10 @@ class MaxUnpool3d(Function):
     def calc_grad(self, dx):
         b, c, h, w, d = dx.shape
         _, _, oh, ow, od = self.var[0].shape
-        padded = np.zeros(self.kwargs['padded_shape'])
+        padded = np.zeros(self.kwargs['padded_shape'], dtype=dx.dtype)
         padded[:,:,self.kwargs['padding'][0]:h+self.kwargs['padding'][0],self.kwargs['padding'][1]:w+self.kwargs['padding'][1],self.kwargs['padding'][2]:d+self.kwargs['padding'][2]] = dx
         reshaped = MaxPool3d.unfold(padded, b, oh, ow, od, c, self.kwargs['kernel_size'][0], self.kwargs['kernel_size'][1], self.kwargs['kernel_size'][2], self.kwargs['stride'], self.kwargs['dilation'])
         idx = self.kwargs['idx'].reshape(b,c,-1,1)
-        return np.choose(np.swapaxes(idx, 0, 3), np.swapaxes(reshaped, 0, 3)).reshape(b, c, oh, ow, od)
+        return np.take_along_axis(reshaped, idx, 3).reshape(b, c, oh, ow, od)
 
 maxunpool3d = MaxUnpool3d(None)
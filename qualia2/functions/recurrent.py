@@ -1,7 +1,117 @@
 # -*- coding: utf-8 -*-
 from ..core import *
 from ..autograd import *
-from ..functions import listconcat
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+PackedSequence = namedtuple('PackedSequence', ['data', 'batch_sizes', 'sorted_indices', 'unsorted_indices'])
+PackedSequence.__doc__ = '''Holds the data and the batch sizes of a packed batch of variable length sequences.\n
+The sequences are sorted by length in descending order and stored timestep by timestep, 
+hence the rows of timestep t are the first batch_sizes[t] sequences that are still active.
+Attributes:
+    data (Tensor): packed sequences with shape of [sum(lengths), *]
+    batch_sizes (tuple of int): the number of active sequences at each timestep
+    sorted_indices (ndarray): the batch index of each sorted sequence
+    unsorted_indices (ndarray): the sorted position of each sequence of the batch
+'''
+
+class PackPaddedSequence(Function):
+    @staticmethod
+    def forward(x, lengths):
+        '''Packs a padded batch of variable length sequences.\n
+        Args:
+            x (Tensor): padded sequences with shape of [seq_len, N, *]
+            lengths (list of int): the length of each sequence of the batch
+        Returns:
+            (PackedSequence): the packed sequences 
+        '''
+        seq_len, batch = x.shape[:2]
+        lengths = [int(l) for l in lengths]
+        if len(lengths) != batch or min(lengths) < 1 or max(lengths) > seq_len:
+            raise ValueError('[*] lengths should hold a length between 1 and {} for each of the {} sequences, got: {}.'.format(seq_len, batch, lengths))
+        ascending = sorted(lengths)
+        batch_sizes = tuple(batch-bisect_right(ascending, t) for t in range(ascending[-1]))
+        sorted_indices = np.asarray(sorted(range(batch), key=lambda i: -lengths[i]))
+        idx = np.concatenate([t*batch+sorted_indices[:b] for t, b in enumerate(batch_sizes)])
+        data = Tensor(np.reshape(x.data, (seq_len*batch,)+x.shape[2:])[idx])
+        data.set_creator(PackPaddedSequence.prepare(data.shape, x, idx=idx))
+        return PackedSequence(data, batch_sizes, sorted_indices, np.argsort(sorted_indices))
+
+    def calc_grad(self, dx):
+        seq_len, batch = self.var[0].shape[:2]
+        result = np.zeros((seq_len*batch,)+dx.shape[1:], dtype=dx.dtype)
+        result[self.kwargs['idx']] = dx
+        return result.reshape(self.var[0].shape)
+
+pack_padded_sequence = PackPaddedSequence(None)
+
+class PadPackedSequence(Function):
+    @staticmethod
+    def forward(x, total_length=None):
+        '''Pads a packed batch of variable length sequences, which is the inverse of pack_padded_sequence.\n
+        Args:
+            x (PackedSequence): the packed sequences
+            total_length (int): pads the sequences to this length if given. Default: None
+        Returns:
+            (Tensor): padded sequences with shape of [seq_len, N, *] in the order of the batch before packing
+            (list of int): the length of each sequence of the batch
+        '''
+        batch_sizes, sorted_indices = x.batch_sizes, x.sorted_indices
+        batch = batch_sizes[0]
+        seq_len = len(batch_sizes) if total_length is None else total_length
+        if seq_len < len(batch_sizes):
+            raise ValueError('[*] total_length should be at least the longest length {}, got: {}.'.format(len(batch_sizes), seq_len))
+        idx = np.concatenate([t*batch+sorted_indices[:b] for t, b in enumerate(batch_sizes)])
+        result = np.zeros((seq_len*batch,)+x.data.shape[1:], dtype=x.data.dtype)
+        result[idx] = x.data.data
+        result = Tensor(result.reshape((seq_len, batch)+x.data.shape[1:]))
+        result.set_creator(PadPackedSequence.prepare(result.shape, x.data, idx=idx))
+        lengths = [0]*batch
+        for i, j in enumerate(to_cpu(sorted_indices) if gpu else sorted_indices):
+            lengths[int(j)] = sum(1 for b in batch_sizes if b > i)
+        return result, lengths
+
+    def calc_grad(self, dx):
+        return np.reshape(dx, (-1,)+dx.shape[2:])[self.kwargs['idx']]
+
+pad_packed_sequence = PadPackedSequence(None)
+
+def _packed(x, h):
+    '''Returns the input of a sequence kernel as the 2d data of the packed timesteps, the batch size and the row offset of each timestep 
+    and the initial states in the sorted order of the batch. A dense input of [seq_len, N, input_size] is handled as packed sequences 
+    that all have the full length.
+    '''
+    if isinstance(x, PackedSequence):
+        return x.data.data, x.batch_sizes, (0,)+tuple(accumulate(x.batch_sizes)), [s.data[:, x.sorted_indices] for s in h]
+    batch_sizes = (x.shape[1],)*x.shape[0]
+    return np.reshape(x.data, (x.shape[0]*x.shape[1], -1)), batch_sizes, (0,)+tuple(accumulate(batch_sizes)), [s.data for s in h]
+
+def _sorted(x, states):
+    '''Returns a copy of the states of [num_layers, N, hidden_size] in the sorted order of the batch.
+    '''
+    return states[:, x.sorted_indices] if isinstance(x, PackedSequence) else np.copy(states)
+
+def _unsorted(x, states):
+    '''Returns the states of [num_layers, N, hidden_size] in the original order of the batch.
+    '''
+    return states[:, x.unsorted_indices] if isinstance(x, PackedSequence) else states
+
+def _previous(h, out, batch_sizes, offsets):
+    '''Returns the hidden state that each packed row received from its previous timestep.
+    '''
+    return np.concatenate([h[:batch_sizes[0]]]+[out[offsets[t-1]:offsets[t-1]+b] for t, b in enumerate(batch_sizes) if t > 0])
+
+def _sequence_result(result, x, rows, num_layers, num_states):
+    '''Splits the single output node of a sequence kernel into the output sequence, which keeps the layout of the input x, and the final states.
+    '''
+    out = result[:rows]
+    if isinstance(x, PackedSequence):
+        out = PackedSequence(out, x.batch_sizes, x.sorted_indices, x.unsorted_indices)
+    else:
+        out = out.reshape(x.shape[0], x.shape[1], -1)
+    size = (result.shape[0]-rows)//num_states
+    return (out,)+tuple(result[rows+k*size:rows+(k+1)*size].reshape(num_layers, -1, result.shape[1]) for k in range(num_states))
 
 class RNNCell(Function):
     @staticmethod
@@ -46,36 +156,99 @@ class RNN(Function):
     @staticmethod
     def forward(x, h, weight_x, weight_h, bias_x, bias_h, num_layers):
         '''
+        The whole sequence is a single node of the graph, hence the backpropagation through time runs in one calc_grad. 
+        The input projection of every layer is computed for all the timesteps at once, leaving only the recurrent projection in the loop.
+        For packed sequences, the batch shrinks as the shorter sequences finish, so that nothing is computed for the padding.
         Shape:
-            - x: [seq_len, N, input_size]
+            - x: [seq_len, N, input_size] or PackedSequence
             - h: [num_layers, N, hidden_size]
-            - Output: [seq_len, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
         '''
-        seq_len = x.shape[0]
-        h_out = []
-        tmp = [x]
+        out, batch_sizes, offsets, (h0,) = _packed(x, (h,))
+        bias = bias_x is not None and bias_h is not None
+        hn = np.empty_like(h0)
+        inputs, outs = [], []
         for l in range(num_layers):
-            hx = h[l]
-            tmp.append([])
-            for i in range(seq_len):
-                if bias_x is None or bias_h is None:
-                    hx = rnncell(tmp[l][i], hx, weight_x[l], weight_h[l], None, None)
-                    tmp[l+1].append(hx)
-                else:
-                    hx = rnncell(tmp[l][i], hx, weight_x[l], weight_h[l], bias_x[l], bias_h[l])
-                    tmp[l+1].append(hx)
-            h_out.append(hx)
-        result_x = listconcat(tmp[-1])
-        result_h = listconcat(h_out)
-        return result_x, result_h
+            tmp = np.dot(out, weight_x[l].data)
+            if bias:
+                tmp += bias_x[l].data + bias_h[l].data
+            hx = np.copy(h0[l])
+            for t, b in enumerate(batch_sizes):
+                step = tmp[offsets[t]:offsets[t+1]]
+                step += np.dot(hx[:b], weight_h[l].data)
+                np.tanh(step, out=step)
+                hx[:b] = step
+            hn[l] = hx
+            inputs.append(out)
+            outs.append(tmp)
+            out = tmp
+        # the output and h_n share a single node, which receives the gradients of both
+        result = Tensor(np.concatenate([out, np.reshape(_unsorted(x, hn), (-1, out.shape[1]))]))
+        var = x.data if isinstance(x, PackedSequence) else x
+        if not bias:
+            result.set_creator(RNN.prepare(result.shape, var, h, *weight_x, *weight_h, bias=False, num_layers=num_layers, packed=x, h0=h0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs))
+        else:
+            result.set_creator(RNN.prepare(result.shape, var, h, *weight_x, *weight_h, *bias_x, *bias_h, bias=True, num_layers=num_layers, packed=x, h0=h0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs))
+        return _sequence_result(result, x, out.shape[0], num_layers, 1)
+
+    def calc_grad(self, dx):
+        num_layers = self.kwargs['num_layers']
+        batch_sizes, offsets = self.kwargs['batch_sizes'], self.kwargs['offsets']
+        weight_x = self.var[2:2+num_layers]
+        weight_h = self.var[2+num_layers:2+2*num_layers]
+        dout = dx[:offsets[-1]]
+        dhn = _sorted(self.kwargs['packed'], np.reshape(dx[offsets[-1]:], self.var[1].shape))
+        dh0 = np.empty_like(dhn)
+        dw_x, dw_h, db = [None]*num_layers, [None]*num_layers, [None]*num_layers
+        for l in reversed(range(num_layers)):
+            out = self.kwargs['outs'][l]
+            dtmp = np.empty_like(out)
+            dh = np.copy(dhn[l])
+            for t, b in reversed(list(enumerate(batch_sizes))):
+                np.multiply(dh[:b]+dout[offsets[t]:offsets[t+1]], 1-np.square(out[offsets[t]:offsets[t+1]]), out=dtmp[offsets[t]:offsets[t+1]])
+                dh[:b] = np.dot(dtmp[offsets[t]:offsets[t+1]], weight_h[l].data.T)
+            dh0[l] = dh
+            dw_x[l] = np.dot(self.kwargs['inputs'][l].T, dtmp)
+            dw_h[l] = np.dot(_previous(self.kwargs['h0'][l], out, batch_sizes, offsets).T, dtmp)
+            db[l] = np.sum(dtmp, axis=0)
+            dout = np.dot(dtmp, weight_x[l].data.T)
+        dh0 = _unsorted(self.kwargs['packed'], dh0)
+        if not self.kwargs['bias']:
+            return (dout.reshape(self.var[0].shape), dh0, *dw_x, *dw_h)
+        else:
+            return (dout.reshape(self.var[0].shape), dh0, *dw_x, *dw_h, *db, *db)
 
 rnn = RNN(None)
 
-#TODO
+def _lstm_gates(tmp, hidden_size):
+    '''Activates the pre-activations tmp with shape of [N, 4*hidden_size] in place, ordered as forget, cell, input and output gate.\n
+    All gates go through a single tanh pass, since sigmoid(x) = (tanh(x/2)+1)/2.
+    '''
+    tmp[:, :hidden_size] *= 0.5
+    tmp[:, 2*hidden_size:] *= 0.5
+    np.tanh(tmp, out=tmp)
+    tmp[:, :hidden_size] += 1
+    tmp[:, :hidden_size] *= 0.5
+    tmp[:, 2*hidden_size:] += 1
+    tmp[:, 2*hidden_size:] *= 0.5
+    return tmp
+
+def _lstm_gates_grad(dh, dc, gates, c, tanh_c, hidden_size):
+    '''Returns the gradient of the pre-activations and of the previous cell state for a single step.
+    '''
+    f, g, i, o = (gates[:, k*hidden_size:(k+1)*hidden_size] for k in range(4))
+    dc = dc + dh*o*(1-np.square(tanh_c))
+    dtmp = np.empty_like(gates)
+    dtmp[:, :hidden_size] = dc*c*f*(1-f)
+    dtmp[:, hidden_size:2*hidden_size] = dc*i*(1-np.square(g))
+    dtmp[:, 2*hidden_size:3*hidden_size] = dc*g*i*(1-i)
+    dtmp[:, 3*hidden_size:] = dh*tanh_c*o*(1-o)
+    return dtmp, dc*f
+
 class LSTMCell(Function):
     @staticmethod
-    def forward(x, h, c, weight_x, weight_h, bias_x, bias_h, hidden_size):
+    def forward(x, h, c, weight_x, weight_h, bias_x, bias_h):
         '''
         Shape:
             - x: [N, input_size]
@@ -88,24 +261,122 @@ class LSTMCell(Function):
             - Output_h: [N, hidden_size]
             - Output_c: [N, hidden_size]
         '''
+        hidden_size = h.shape[1]
+        tmp = np.add(np.dot(x.data, weight_x.data), np.dot(h.data, weight_h.data))
+        if bias_x is not None and bias_h is not None:
+            tmp += bias_x.data + bias_h.data
+        gates = _lstm_gates(tmp, hidden_size)
+        c_next = gates[:, :hidden_size]*c.data + gates[:, hidden_size:2*hidden_size]*gates[:, 2*hidden_size:3*hidden_size]
+        tanh_c = np.tanh(c_next)
+        # h_next and c_next share a single node, which receives the gradients of both
+        result = Tensor(np.stack([gates[:, 3*hidden_size:]*tanh_c, c_next]))
         if bias_x is None or bias_h is None:
-            tmp = np.add(np.dot(h.data, weight_h.data), np.dot(x.data, weight_x.data))
+            result.set_creator(LSTMCell.prepare(result.shape, x, h, c, weight_x, weight_h, bias=False, gates=gates, tanh_c=tanh_c))
         else:
-            tmp = np.add(np.add(np.dot(h.data, weight_h.data), bias_x.data), np.add(np.dot(x.data, weight_x.data), bias_h.data))
-        f = np.divide(1, np.add(1, np.exp(np.negative(tmp[:, :hidden_size]))))
-        g = np.tanh(tmp[:, hidden_size:2*hidden_size])
-        i = np.divide(1, np.add(1, np.exp(np.negative(tmp[:, 2*hidden_size:3*hidden_size]))))
-        o = np.divide(1, np.add(1, np.exp(np.negative(tmp[:, 3*hidden_size:4*hidden_size]))))
-        c_next = np.add(np.multiply(f, c), np.multiply(g, i))
-        h_next = np.multiply(o, np.tanh(c_next))
-        c_next = Tensor(c_next)
-        h_next = Tensor(h_next)
-        c_next.set_creator(LSTMCell.prepare(c_next.shape, ))
-        h_next.set_creator(LSTMCell.prepare(h_next.shape, ))
-        return h_next, c_next
+            result.set_creator(LSTMCell.prepare(result.shape, x, h, c, weight_x, weight_h, bias_x, bias_h, bias=True, gates=gates, tanh_c=tanh_c))
+        return result[0], result[1]
     
-    def calc_grad(self, dh_next, dc_next):
-        pass
+    def calc_grad(self, dx):
+        dtmp, dc = _lstm_gates_grad(dx[0], dx[1], self.kwargs['gates'], self.var[2].data, self.kwargs['tanh_c'], self.var[1].shape[1])
+        dw_x = np.dot(self.var[0].data.T, dtmp)
+        dw_h = np.dot(self.var[1].data.T, dtmp)
+        dx = np.dot(dtmp, self.var[3].data.T)
+        dh = np.dot(dtmp, self.var[4].data.T)
+        if not self.kwargs['bias']:
+            return dx, dh, dc, dw_x, dw_h
+        else:
+            db = np.sum(dtmp, axis=0)
+            return dx, dh, dc, dw_x, dw_h, db, db
+
+lstmcell = LSTMCell(None)
+
+class LSTM(Function):
+    @staticmethod
+    def forward(x, h, c, weight_x, weight_h, bias_x, bias_h, num_layers):
+        '''
+        The whole sequence is a single node of the graph, hence the backpropagation through time runs in one calc_grad. 
+        The input projection of every layer is computed for all the timesteps at once, leaving only the recurrent projection in the loop.
+        For packed sequences, the batch shrinks as the shorter sequences finish, so that nothing is computed for the padding.
+        Shape:
+            - x: [seq_len, N, input_size] or PackedSequence
+            - h: [num_layers, N, hidden_size]
+            - c: [num_layers, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
+            - Hidden_h: [num_layers, N, hidden_size]
+            - Hidden_c: [num_layers, N, hidden_size]
+        '''
+        out, batch_sizes, offsets, (h0, c0) = _packed(x, (h, c))
+        hidden_size = h0.shape[2]
+        bias = bias_x is not None and bias_h is not None
+        hn, cn = np.empty_like(h0), np.empty_like(c0)
+        inputs, outs, cs, gates, tanh_cs = [], [], [], [], []
+        for l in range(num_layers):
+            tmp = np.dot(out, weight_x[l].data)
+            if bias:
+                tmp += bias_x[l].data + bias_h[l].data
+            hl = np.empty((offsets[-1], hidden_size), dtype=tmp.dtype)
+            cl = np.empty_like(hl)
+            tanh_c = np.empty_like(hl)
+            hx, cx = np.copy(h0[l]), np.copy(c0[l])
+            for t, b in enumerate(batch_sizes):
+                rows = slice(offsets[t], offsets[t+1])
+                tmp[rows] += np.dot(hx[:b], weight_h[l].data)
+                gate = _lstm_gates(tmp[rows], hidden_size)
+                cl[rows] = gate[:, :hidden_size]*cx[:b] + gate[:, hidden_size:2*hidden_size]*gate[:, 2*hidden_size:3*hidden_size]
+                np.tanh(cl[rows], out=tanh_c[rows])
+                np.multiply(gate[:, 3*hidden_size:], tanh_c[rows], out=hl[rows])
+                hx[:b] = hl[rows]
+                cx[:b] = cl[rows]
+            hn[l], cn[l] = hx, cx
+            inputs.append(out)
+            outs.append(hl)
+            cs.append(cl)
+            gates.append(tmp)
+            tanh_cs.append(tanh_c)
+            out = hl
+        # the output, h_n and c_n share a single node, which receives the gradients of all of them
+        result = Tensor(np.concatenate([out, np.reshape(_unsorted(x, hn), (-1, hidden_size)), np.reshape(_unsorted(x, cn), (-1, hidden_size))]))
+        var = x.data if isinstance(x, PackedSequence) else x
+        if not bias:
+            result.set_creator(LSTM.prepare(result.shape, var, h, c, *weight_x, *weight_h, bias=False, num_layers=num_layers, packed=x, h0=h0, c0=c0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs, cs=cs, gates=gates, tanh_cs=tanh_cs))
+        else:
+            result.set_creator(LSTM.prepare(result.shape, var, h, c, *weight_x, *weight_h, *bias_x, *bias_h, bias=True, num_layers=num_layers, packed=x, h0=h0, c0=c0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs, cs=cs, gates=gates, tanh_cs=tanh_cs))
+        return _sequence_result(result, x, out.shape[0], num_layers, 2)
+
+    def calc_grad(self, dx):
+        num_layers = self.kwargs['num_layers']
+        batch_sizes, offsets = self.kwargs['batch_sizes'], self.kwargs['offsets']
+        hidden_size = self.var[1].shape[2]
+        weight_x = self.var[3:3+num_layers]
+        weight_h = self.var[3+num_layers:3+2*num_layers]
+        size = self.var[1].shape[0]*self.var[1].shape[1]
+        dout = dx[:offsets[-1]]
+        dhn = _sorted(self.kwargs['packed'], np.reshape(dx[offsets[-1]:offsets[-1]+size], self.var[1].shape))
+        dcn = _sorted(self.kwargs['packed'], np.reshape(dx[offsets[-1]+size:], self.var[2].shape))
+        dh0, dc0 = np.empty_like(dhn), np.empty_like(dcn)
+        dw_x, dw_h, db = [None]*num_layers, [None]*num_layers, [None]*num_layers
+        for l in reversed(range(num_layers)):
+            cl, gates, tanh_c = self.kwargs['cs'][l], self.kwargs['gates'][l], self.kwargs['tanh_cs'][l]
+            c0 = self.kwargs['c0'][l]
+            dtmp = np.empty_like(gates)
+            dh, dc = dhn[l], dcn[l]
+            for t, b in reversed(list(enumerate(batch_sizes))):
+                rows = slice(offsets[t], offsets[t+1])
+                c = c0[:b] if t == 0 else cl[offsets[t-1]:offsets[t-1]+b]
+                dtmp[rows], dc[:b] = _lstm_gates_grad(dh[:b]+dout[rows], dc[:b], gates[rows], c, tanh_c[rows], hidden_size)
+                dh[:b] = np.dot(dtmp[rows], weight_h[l].data.T)
+            dh0[l], dc0[l] = dh, dc
+            dw_x[l] = np.dot(self.kwargs['inputs'][l].T, dtmp)
+            dw_h[l] = np.dot(_previous(self.kwargs['h0'][l], self.kwargs['outs'][l], batch_sizes, offsets).T, dtmp)
+            db[l] = np.sum(dtmp, axis=0)
+            dout = np.dot(dtmp, weight_x[l].data.T)
+        dh0, dc0 = _unsorted(self.kwargs['packed'], dh0), _unsorted(self.kwargs['packed'], dc0)
+        if not self.kwargs['bias']:
+            return (dout.reshape(self.var[0].shape), dh0, dc0, *dw_x, *dw_h)
+        else:
+            return (dout.reshape(self.var[0].shape), dh0, dc0, *dw_x, *dw_h, *db, *db)
+
+lstm = LSTM(None)
 
 class GRUCell(Function):
     @staticmethod
@@ -167,7 +438,7 @@ class GRUCell(Function):
             db_x = np.zeros_like(self.var[4].data)
             db_h = np.zeros_like(self.var[5].data)
             db_x[2*hidden_size:] = GRUCell.handle_broadcast(tmp, self.var[4][2*hidden_size:])
-            db_h[2*hidden_size:] = GRUCell.handle_broadcast(rtmp, self.var[5][2*hidden_size:])
+            db_h[2*hidden_size:] = GRUCell.handle_broadcast(tmp, self.var[5][2*hidden_size:])
             db_x[:2*hidden_size] = GRUCell.handle_broadcast(tmp2, self.var[4][:2*hidden_size])
             db_h[:2*hidden_size] = GRUCell.handle_broadcast(tmp2, self.var[5][:2*hidden_size])
             return dx, dh, dw_x, dw_h, db_x, db_h
@@ -178,28 +449,96 @@ class GRU(Function):
     @staticmethod
     def forward(x, h, weight_x, weight_h, bias_x, bias_h, num_layers):
         '''
+        The whole sequence is a single node of the graph, hence the backpropagation through time runs in one calc_grad. 
+        The input projection of every layer is computed for all the timesteps at once, leaving only the recurrent projection in the loop.
+        For packed sequences, the batch shrinks as the shorter sequences finish, so that nothing is computed for the padding.
         Shape:
-            - x: [seq_len, N, input_size]
+            - x: [seq_len, N, input_size] or PackedSequence
             - h: [num_layers, N, hidden_size]
-            - Output: [seq_len, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
         '''
-        seq_len = x.shape[0]
-        h_out = []
-        tmp = [x]
+        out, batch_sizes, offsets, (h0,) = _packed(x, (h,))
+        hidden_size = h0.shape[2]
+        bias = bias_x is not None and bias_h is not None
+        hn = np.empty_like(h0)
+        inputs, outs, gates, hns = [], [], [], []
         for l in range(num_layers):
-            hx = h[l]
-            tmp.append([])
-            for i in range(seq_len):
-                if bias_x is None or bias_h is None:
-                    hx = grucell(tmp[l][i], hx, weight_x[l], weight_h[l], None, None)
-                    tmp[l+1].append(hx)
-                else:
-                    hx = grucell(tmp[l][i], hx, weight_x[l], weight_h[l], bias_x[l], bias_h[l])
-                    tmp[l+1].append(hx)
-            h_out.append(hx)
-        result_x = listconcat(tmp[-1])
-        result_h = listconcat(h_out)
-        return result_x, result_h
+            # both biases of the candidate stay outside of the reset gate, as in GRUCell
+            tmp = np.dot(out, weight_x[l].data)
+            if bias:
+                tmp += bias_x[l].data + bias_h[l].data
+            hl = np.empty((offsets[-1], hidden_size), dtype=tmp.dtype)
+            hw_n = np.empty_like(hl)
+            hx = np.copy(h0[l])
+            for t, b in enumerate(batch_sizes):
+                rows = slice(offsets[t], offsets[t+1])
+                hw = np.dot(hx[:b], weight_h[l].data)
+                hw_n[rows] = hw[:, 2*hidden_size:]
+                # r and z, where sigmoid(x) = (tanh(x/2)+1)/2
+                rz = tmp[rows, :2*hidden_size]
+                rz += hw[:, :2*hidden_size]
+                rz *= 0.5
+                np.tanh(rz, out=rz)
+                rz += 1
+                rz *= 0.5
+                n = tmp[rows, 2*hidden_size:]
+                n += rz[:, :hidden_size]*hw_n[rows]
+                np.tanh(n, out=n)
+                hl[rows] = n + rz[:, hidden_size:]*(hx[:b]-n)
+                hx[:b] = hl[rows]
+            hn[l] = hx
+            inputs.append(out)
+            outs.append(hl)
+            gates.append(tmp)
+            hns.append(hw_n)
+            out = hl
+        # the output and h_n share a single node, which receives the gradients of both
+        result = Tensor(np.concatenate([out, np.reshape(_unsorted(x, hn), (-1, hidden_size))]))
+        var = x.data if isinstance(x, PackedSequence) else x
+        if not bias:
+            result.set_creator(GRU.prepare(result.shape, var, h, *weight_x, *weight_h, bias=False, num_layers=num_layers, packed=x, h0=h0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs, gates=gates, hns=hns))
+        else:
+            result.set_creator(GRU.prepare(result.shape, var, h, *weight_x, *weight_h, *bias_x, *bias_h, bias=True, num_layers=num_layers, packed=x, h0=h0, batch_sizes=batch_sizes, offsets=offsets, inputs=inputs, outs=outs, gates=gates, hns=hns))
+        return _sequence_result(result, x, out.shape[0], num_layers, 1)
+
+    def calc_grad(self, dx):
+        num_layers = self.kwargs['num_layers']
+        batch_sizes, offsets = self.kwargs['batch_sizes'], self.kwargs['offsets']
+        hidden_size = self.var[1].shape[2]
+        weight_x = self.var[2:2+num_layers]
+        weight_h = self.var[2+num_layers:2+2*num_layers]
+        dout = dx[:offsets[-1]]
+        dhn = _sorted(self.kwargs['packed'], np.reshape(dx[offsets[-1]:], self.var[1].shape))
+        dh0 = np.empty_like(dhn)
+        dw_x, dw_h, db = [None]*num_layers, [None]*num_layers, [None]*num_layers
+        for l in reversed(range(num_layers)):
+            hl, gates, hw_n = self.kwargs['outs'][l], self.kwargs['gates'][l], self.kwargs['hns'][l]
+            h0 = self.kwargs['h0'][l]
+            dtmp = np.empty_like(gates)
+            dhw = np.empty_like(gates)
+            dh = dhn[l]
+            for t, b in reversed(list(enumerate(batch_sizes))):
+                rows = slice(offsets[t], offsets[t+1])
+                h = h0[:b] if t == 0 else hl[offsets[t-1]:offsets[t-1]+b]
+                r, z, n = gates[rows, :hidden_size], gates[rows, hidden_size:2*hidden_size], gates[rows, 2*hidden_size:]
+                dy = dh[:b]+dout[rows]
+                dn = dy*(1-z)*(1-np.square(n))
+                dtmp[rows, :hidden_size] = dn*hw_n[rows]*r*(1-r)
+                dtmp[rows, hidden_size:2*hidden_size] = dy*(h-n)*z*(1-z)
+                dtmp[rows, 2*hidden_size:] = dn
+                dhw[rows, :2*hidden_size] = dtmp[rows, :2*hidden_size]
+                dhw[rows, 2*hidden_size:] = dn*r
+                dh[:b] = dy*z + np.dot(dhw[rows], weight_h[l].data.T)
+            dh0[l] = dh
+            dw_x[l] = np.dot(self.kwargs['inputs'][l].T, dtmp)
+            dw_h[l] = np.dot(_previous(h0, hl, batch_sizes, offsets).T, dhw)
+            db[l] = np.sum(dtmp, axis=0)
+            dout = np.dot(dtmp, weight_x[l].data.T)
+        dh0 = _unsorted(self.kwargs['packed'], dh0)
+        if not self.kwargs['bias']:
+            return (dout.reshape(self.var[0].shape), dh0, *dw_x, *dw_h)
+        else:
+            return (dout.reshape(self.var[0].shape), dh0, *dw_x, *dw_h, *db, *db)
 
 gru = GRU(None)
@@ -4,32 +4,30 @@ from ..autograd import *
 
 class Embedding(Function):
     @staticmethod
-    def forward(input, weight, vocab_size):
+    def forward(input, weight, vocab_size, sparse=False):
         '''
         Args:
             input (Tensor): Long Tensor containing indices into the embedding matrix
             weight (Tensor): The embedding matrix with number of rows equal to the maximum possible index + 1, and number of columns equal to the embedding size
             vocab_size (int): 
+            sparse (bool): if True, the gradient of weight is a SparseGrad holding only the rows looked up. Default: False
         '''
         if isinstance(input, Tensor):
-            result = Tensor(weight[input.data.astype('int64')].data)
-            result.set_creator(Embedding.prepare(result.shape, weight, idx=input.data))
+            idx = input.data.astype('int64')
         elif isinstance(input, np.ndarray):
-            result = Tensor(weight[input.astype('int64')].data)
-            result.set_creator(Embedding.prepare(result.shape, weight, idx=input))
+            idx = input.astype('int64')
         elif isinstance(input, int):
-            result = Tensor(weight[input].data)
-            result.set_creator(Embedding.prepare(result.shape, weight, idx=input))
+            idx = input
         else:
             raise ValueError
+        result = Tensor(weight.data[idx])
+        result.set_creator(Embedding.prepare(result.shape, weight, idx=idx, sparse=sparse))
         return result
 
     def calc_grad(self, dx):
-        dw = np.zeros_like(self.var[0].data)
-        if gpu:
-            np.scatter_add(dw, self.kwargs['idx'].astype('int64'), dx)
-        else:
-            np.add.at(dw, self.kwargs['idx'].astype('int64'), dx)
-        return dw
+        dw = SparseGrad(self.kwargs['idx'], dx, self.var[0].shape)
+        if self.kwargs['sparse']:
+            return dw
+        return dw.todense()
 
 embedding = Embedding(None)
@@ -1,19 +1,81 @@
 # -*- coding: utf-8 -*- 
+from ..core import *
+from ..autograd import Tensor
 from ..functions import sum, mean
 from ..nn.modules import Module, Embedding
+from ..util import Trainer, progressbar
+from datetime import timedelta
+import time
 
 class CBOW(Module):
     ''' Continuous Bag of Words (CBOW) Model\n
     Args:
         vocab_size (int): vocabulary size
         embedding_dim (int): embedding size
+        sparse (bool): if True, the embeddings emit row-sparse gradients, hence a step costs O(batch) instead of O(vocab_size). Default: True
     '''
-    def __init__(self, vocab_size, embedding_dim=100):
+    def __init__(self, vocab_size, embedding_dim=100, sparse=True):
         super().__init__()
-        self.word_vec = Embedding(vocab_size, embedding_dim)
-        self.out = Embedding(vocab_size, embedding_dim)
+        self.word_vec = Embedding(vocab_size, embedding_dim, sparse)
+        self.out = Embedding(vocab_size, embedding_dim, sparse)
 
-    def forward(self, ctx, trg):
+    def forward(self, ctx, trg, neg=None):
+        ''' 
+        Args:
+            ctx (Tensor or ndarray): [N, num_context] indices of the context words
+            trg (Tensor or ndarray): [N, 1] indices of the targets
+            neg (Tensor or ndarray): [N, k] indices of the negative samples. Default: None
+        Returns:
+            (score, trg) with score of [N] if neg is None, otherwise the score of [N, 1+k] whose first column is the target
+        '''
         embed = mean(self.word_vec(ctx), axis=1)
-        score = sum(embed * self.out(trg).squeeze(axis=1), axis=1)
-        return score, trg
+        if neg is None:
+            score = sum(embed * self.out(trg).squeeze(axis=1), axis=1)
+            return score, trg
+        trg = trg.data if isinstance(trg, Tensor) else trg
+        neg = neg.data if isinstance(neg, Tensor) else neg
+        samples = np.concatenate((trg.reshape(-1, 1), neg), axis=1)
+        return sum(self.out(samples) * embed.reshape(embed.shape[0], 1, embed.shape[1]), axis=2)
+
+class CBOWTrainer(Trainer):
+    ''' Trainer of CBOW with negative sampling\n
+    The dataloader should yield (ctx, trg, neg) as nlp.Word2VecStream does, and the criterion is applied to the scores 
+    and the labels that are 1 for the targets and 0 for the negative samples, e.g. logistic_binary_cross_entropy.
+    The throughput is shown in words/sec of the corpus. A checkpoint saved every interval steps resumes the epoch of a Word2VecStream at its position.
+    Args:
+        batch (int): number of targets per batch
+        path (str): path to save the weights and the train curve. Default: None
+    '''
+    def __init__(self, batch, path=None):
+        super().__init__(batch, path)
+        self.labels = {}
+
+    def label(self, shape):
+        if shape not in self.labels:
+            label = np.zeros(shape)
+            label[:,0] = 1
+            self.labels[shape] = Tensor(label, requires_grad=False)
+        return self.labels[shape]
+
+    def train_routine(self, model, dataloader, optim, criterion, epochs=5):
+        start = time.time()
+        for epoch in range(self.epoch, epochs):
+            self.before_episode(dataloader, model)
+            tmp_loss = self.train_loss
+            epoch_start = time.time()
+            for i, (ctx, trg, neg) in enumerate(dataloader):
+                score = model(ctx, trg, neg)
+                loss = criterion(score, self.label(score.shape))
+                optim.zero_grad()
+                loss.backward()
+                optim.step()
+                self.step_scheduler('step')
+                loss = float(np.sum(loss.data))
+                tmp_loss.append(loss)
+                if i % 100 == 0:
+                    progressbar(dataloader.words, dataloader.vocab.total, 'epoch: {}/{} train loss:{:.4f} '.format(epoch+1, epochs, loss), '{:.0f} words/sec (time: {})'.format(dataloader.words/(time.time()-epoch_start), str(timedelta(seconds=time.time()-start))))
+                self.save_progress(model, optim, dataloader, epoch, i)
+            self.after_episode(epoch+1, model, tmp_loss)
+            self.train_loss = []
+            self.step_scheduler('epoch')
+            self.save_progress(model, optim, dataloader, epoch+1)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+from ..core import *
+from collections import Counter
+import _pickle as pickle
+import numpy
+
+def tokenize(files, lower=True):
+    ''' tokenize\n
+    Streams a whitespace tokenized corpus line by line, hence the corpus does not need to fit in memory.
+    Args:
+        files (str or list of str): path(s) to the text file(s)
+        lower (bool): if True, tokens are lowercased. Default: True
+    Yields:
+        list of str: tokens of each line
+    '''
+    if isinstance(files, str):
+        files = [files]
+    for filename in files:
+        with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                yield (line.lower() if lower else line).split()
+
+class Vocabulary(object):
+    '''Vocabulary with frequency counts built from a stream of tokens\n
+    Args:
+        sentences (iterable of list of str): tokenized corpus, consumed once
+        min_count (int): words that appear less than min_count times are dropped. Default: 5
+        max_size (int): keeps the max_size most frequent words if given. Default: None
+    Attributes:
+        word2idx (dict): word to index map, indices are sorted by frequency
+        idx2word (list of str): index to word map
+        counts (ndarray): frequency of each word
+        total (int): number of tokens of the corpus that are in the vocabulary
+    '''
+    def __init__(self, sentences, min_count=5, max_size=None):
+        counter = Counter()
+        for tokens in sentences:
+            counter.update(tokens)
+        words = [(w, c) for w, c in counter.most_common(max_size) if c >= min_count]
+        self.idx2word = [w for w, _ in words]
+        self.word2idx = {w: i for i, w in enumerate(self.idx2word)}
+        self.counts = numpy.array([c for _, c in words], dtype='int64')
+        self.total = int(self.counts.sum())
+
+    def __repr__(self):
+        return '{}(size={}, total={}) at 0x{:0{}X}'.format(self.__class__.__name__, len(self), self.total, id(self), 16)
+
+    def __len__(self):
+        return len(self.idx2word)
+
+    def encode(self, tokens):
+        '''Returns the indices of the tokens as an int64 ndarray, dropping the words out of the vocabulary.
+        '''
+        get = self.word2idx.get
+        idx = numpy.fromiter((get(t, -1) for t in tokens), dtype='int64')
+        return idx[idx >= 0]
+
+class AliasSampler(object):
+    '''Draws indices from a discrete distribution in O(1) per sample with Walker's alias method\n
+    Args:
+        weights (ndarray): unnormalized probability of each index
+        seed (int or SeedSequence): seed of the random number generator. Default: None
+    '''
+    def __init__(self, weights, seed=None):
+        weights = numpy.asarray(weights, dtype='float64')
+        n = len(weights)
+        prob = weights * n / weights.sum()
+        alias = numpy.arange(n, dtype='int64')
+        small = list(numpy.flatnonzero(prob < 1))
+        large = list(numpy.flatnonzero(prob >= 1))
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] -= 1 - prob[s]
+            if prob[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+        # leftovers are 1 up to rounding errors
+        prob[small] = 1
+        prob[large] = 1
+        self.prob = prob
+        self.alias = alias
+        self.rng = numpy.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, size):
+        k = self.rng.integers(0, len(self.prob), size=size)
+        return numpy.where(self.rng.random(size=size) < self.prob[k], k, self.alias[k])
+
+class Word2VecStream(object):
+    '''Streams word2vec training batches of a tokenized corpus for nlp.CBOW\n
+    The corpus is read in chunks of tokens. Frequent words are subsampled with the keep probability of word2vec,
+    (sqrt(f/(t*total))+1)*t*total/f for a word of frequency f, and the positions of each chunk are shuffled and batched.
+    Windows span the chunk boundaries, hence only the ends of the corpus lack a full context, 
+    and every batch has batch targets except the last one of an epoch.
+    Args:
+        corpus (str, list of str or iterable of list of str): path(s) to the text file(s) or a re-iterable tokenized corpus
+        vocab (Vocabulary): vocabulary of the corpus
+        window (int): number of context words on each side of the target. Default: 5
+        negative (int): number of negative samples per target drawn from the unigram distribution raised to 3/4. Default: 5
+        subsample (float): threshold t for the subsampling of frequent words, 0 to disable. Default: 1e-3
+        batch (int): number of targets per batch. Default: 1024
+        chunk (int): number of tokens read at once. Default: 1048576
+        seed (int): seed of the random number generators. Default: None
+    Yields:
+        ctx (ndarray): [batch, 2*window] indices of the context words
+        trg (ndarray): [batch, 1] indices of the targets
+        neg (ndarray): [batch, negative] indices of the negative samples
+    Attributes:
+        words (int): number of tokens in the vocabulary consumed in the current epoch
+        idx (int): number of batches yielded in the current epoch
+    Note:
+        A state loaded by load_state_dict replays the subsampling and the shuffle of the epoch from its start, 
+        hence the corpus is read again up to the saved position, but the batches before it are not built.
+    '''
+    def __init__(self, corpus, vocab, window=5, negative=5, subsample=1e-3, batch=1024, chunk=1<<20, seed=None):
+        self.corpus = corpus
+        self.vocab = vocab
+        self.window = window
+        self.negative = negative
+        self.batch = batch
+        self.chunk = chunk
+        self.words = 0
+        self.idx = 0
+        self.resume = 0
+        # state of self.rng at the start of the current epoch, None between epochs
+        self.start = None
+        # the subsampling and the shuffle draw from a different stream than the negative samples
+        stream, negatives = numpy.random.SeedSequence(seed).spawn(2)
+        self.rng = numpy.random.default_rng(stream)
+        self.sampler = AliasSampler(vocab.counts**0.75, negatives)
+        if subsample > 0:
+            threshold = subsample * vocab.total
+            self.keep = numpy.minimum((numpy.sqrt(vocab.counts/threshold)+1)*threshold/vocab.counts, 1)
+        else:
+            self.keep = None
+        self.offsets = numpy.concatenate((numpy.arange(window), numpy.arange(window+1, 2*window+1)))
+
+    def __repr__(self):
+        return '{}'.format(self.__class__.__name__)
+
+    def sentences(self):
+        if isinstance(self.corpus, str) or (isinstance(self.corpus, (list, tuple)) and len(self.corpus) > 0 and isinstance(self.corpus[0], str)):
+            return tokenize(self.corpus)
+        return iter(self.corpus)
+
+    def chunks(self):
+        buffer = []
+        size = 0
+        for tokens in self.sentences():
+            idx = self.vocab.encode(tokens)
+            self.words += len(idx)
+            if self.keep is not None:
+                idx = idx[self.rng.random(len(idx)) < self.keep[idx]]
+            buffer.append(idx)
+            size += len(idx)
+            if size >= self.chunk:
+                yield numpy.concatenate(buffer)
+                buffer = []
+                size = 0
+        if size > 0:
+            yield numpy.concatenate(buffer)
+
+    def state_dict(self):
+        '''Returns the position in the current epoch and the states of the random number generators, 
+        hence a stream of the same corpus can resume the epoch with load_state_dict.
+        '''
+        stream = self.rng.bit_generator.state if self.start is None else self.start
+        state = pickle.dumps((stream, self.sampler.rng.bit_generator.state), -1)
+        return {'idx': self.idx, 'rng': numpy.frombuffer(state, dtype='uint8')}
+
+    def load_state_dict(self, state_dict):
+        '''Restores the states of the random number generators and the position returned by state_dict. The next iteration resumes from the position.
+        '''
+        stream, sampler = pickle.loads(numpy.asarray(to_cpu(state_dict['rng']), dtype='uint8').tobytes())
+        self.rng.bit_generator.state = stream
+        self.sampler.rng.bit_generator.state = sampler
+        self.resume = int(state_dict['idx'])
+
+    def __iter__(self):
+        # a loaded state resumes the epoch at its position once
+        skip = self.resume
+        self.resume = 0
+        self.start = self.rng.bit_generator.state
+        self.idx = 0
+        for windows in self.windows():
+            self.idx += 1
+            # the negatives of the skipped batches were drawn before the state was saved
+            if self.idx > skip:
+                yield self.make_batch(windows)
+        self.start = None
+        self.idx = 0
+
+    def windows(self):
+        self.words = 0
+        span = 2*self.window+1
+        rest = numpy.zeros(0, dtype='int64')
+        # the windows that do not fill a batch are carried over to the next chunk, hence only the last batch of an epoch is short
+        carry = numpy.zeros((0, span), dtype='int64')
+        for idx in self.chunks():
+            # the last 2*window tokens are carried over as they lack the right context
+            idx = numpy.concatenate((rest, idx))
+            if len(idx) < span:
+                rest = idx
+                continue
+            windows = numpy.lib.stride_tricks.sliding_window_view(idx, span)
+            rest = idx[len(idx)-span+1:]
+            perm = self.rng.permutation(len(windows))
+            first = self.batch - len(carry)
+            carry = numpy.concatenate((carry, windows[perm[:first]]))
+            if len(carry) < self.batch:
+                continue
+            yield carry
+            end = first + (len(perm)-first)//self.batch*self.batch
+            for start in range(first, end, self.batch):
+                yield windows[perm[start:start+self.batch]]
+            carry = windows[perm[end:]]
+        if len(carry) > 0:
+            yield carry
+
+    def make_batch(self, windows):
+        ctx = windows[:, self.offsets]
+        trg = windows[:, self.window:self.window+1]
+        neg = self.sampler.sample((len(windows), self.negative))
+        if gpu:
+            return np.asarray(ctx), np.asarray(trg), np.asarray(neg)
+        return ctx, trg, neg
@@ -1,7 +1,266 @@
 # -*- coding: utf-8 -*- 
 from ..core import *
-from ..autograd import Tensor
-from ..functions import cosine_similarity
+import numpy
+import weakref
+import os
+
+class EmbeddingIndex(object):
+    ''' EmbeddingIndex\n
+    Answers nearest neighbour queries in cosine similarity over the rows of an embedding with a single matrix multiply.
+    The L2-normalized embedding matrix is cached and rebuilt when the data of the weight is replaced or written in place by the library 
+    (e.g. by Optimizer.step or Module.load, which bump Tensor.version), or when invalidate is called after modifying the weight by hand.
+    Args:
+        word2idx (dict): word to index map
+        wordvecs (Embedding): vector representation of words
+        eps (float): for numerical stability Default: 1e-8
+    '''
+    def __init__(self, word2idx, wordvecs, eps=1e-8):
+        self.word2idx = word2idx
+        self.idx2word = [None] * wordvecs.num_embeddings
+        for k, v in word2idx.items():
+            self.idx2word[v] = k
+        self.weight = wordvecs.weight
+        self.eps = eps
+        self.data = None
+        self.version = None
+        self.matrix = None
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, len(self.word2idx), id(self), 16)
+
+    def invalidate(self):
+        self.matrix = None
+
+    def normalize(self, vecs):
+        return vecs / np.maximum(np.linalg.norm(vecs, axis=-1, keepdims=True), self.eps)
+
+    @property
+    def normalized(self):
+        '''L2-normalized embedding matrix of [vocab_size, embedding_dim]
+        '''
+        if self.matrix is None or self.data is not self.weight.data or self.version != self.weight.version:
+            self.data = self.weight.data
+            self.version = self.weight.version
+            self.matrix = self.normalize(self.data)
+        return self.matrix
+
+    def index(self, words):
+        for w in words:
+            if w not in self.word2idx:
+                raise Exception('[*] \'{}\' is unknown.'.format(w))
+        return np.array([self.word2idx[w] for w in words], dtype='int64')
+
+    def vectors(self, idx):
+        return self.weight.data[idx]
+
+    def search(self, vecs, n=5, exclude=None):
+        ''' search\n
+        Returns the indices and the similarities of the top n rows for each query vector in descending order of similarity.
+        Args:
+            vecs (ndarray): query vectors of [Q, embedding_dim]
+            n (int): number of neighbours
+            exclude (ndarray): [Q, *] indices to leave out of the results of each query. Default: None
+        Returns:
+            (ndarray, ndarray): indices and similarities of [Q, n]
+        '''
+        similarity = np.dot(self.normalize(vecs), self.normalized.T)
+        if exclude is not None:
+            similarity[np.arange(len(similarity))[:,None], exclude] = -np.inf
+        n = min(n, similarity.shape[1])
+        if n < similarity.shape[1]:
+            top = np.argpartition(-similarity, n-1, axis=1)[:,:n]
+        else:
+            top = np.broadcast_to(np.arange(n), similarity.shape)
+        top_sim = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_sim, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sim, order, axis=1)
+
+    def results(self, idx, similarity):
+        idx, similarity = to_cpu(idx), to_cpu(similarity)
+        return [[(self.idx2word[int(i)], float(s)) for i, s in zip(row_idx, row_sim)] for row_idx, row_sim in zip(idx, similarity)]
+
+    def most_similar(self, words, n=5):
+        ''' most_similar\n
+        Args:
+            words (str or list of str): query word(s)
+            n (int): top n similar words to return
+        Returns:
+            list of (word, similarity) for a single query, or a list of them for a list of queries
+        '''
+        single = isinstance(words, str)
+        idx = self.index([words] if single else words)
+        result = self.results(*self.search(self.vectors(idx), n, exclude=idx[:,None]))
+        return result[0] if single else result
+
+    def analogy(self, a, b, c, n=5):
+        ''' analogy\n
+        Predicts word relationship like a:b = c:?
+        Args:
+            a (str or list of str): input string(s)
+            b (str or list of str): input string(s)
+            c (str or list of str): input string(s)
+            n (int): top n similar words to return
+        Returns:
+            list of (word, similarity) for a single query, or a list of them for lists of queries
+        '''
+        single = isinstance(a, str)
+        if single:
+            a, b, c = [a], [b], [c]
+        assert len(a) == len(b) == len(c)
+        result = self.results(*self.search(self.vectors(self.index(b)) - self.vectors(self.index(a)) + self.vectors(self.index(c)), n))
+        return result[0] if single else result
+
+class IVFIndex(EmbeddingIndex):
+    ''' IVFIndex\n
+    Approximate nearest neighbour index over the rows of an embedding with an inverted file. 
+    The normalized rows are clustered by spherical k-means and stored contiguously per cluster, and a query only scans 
+    the rows of the nprobe clusters whose centroids are the most similar to it. The index is a snapshot of the embedding 
+    held in host memory, and it can be saved to a directory and loaded back memory-mapped, hence it serves vocabularies 
+    larger than the memory. Use build to create the index from an embedding. As only the normalized rows are kept, 
+    analogy adds and subtracts normalized vectors.
+    Args:
+        centroids (ndarray): [nlist, embedding_dim] normalized centroids
+        matrix (ndarray): [vocab_size, embedding_dim] normalized rows sorted by cluster
+        ids (ndarray): [vocab_size] row index of each entry of matrix
+        offsets (ndarray): [nlist+1] start of each cluster in matrix
+        idx2word (list of str): index to word map
+        nprobe (int): number of clusters to scan per query. Default: 8
+        eps (float): for numerical stability Default: 1e-8
+    '''
+    def __init__(self, centroids, matrix, ids, offsets, idx2word, nprobe=8, eps=1e-8):
+        self.centroids = centroids
+        self.matrix = matrix
+        self.ids = ids
+        self.offsets = offsets
+        self.idx2word = idx2word
+        self.word2idx = {w: i for i, w in enumerate(idx2word) if w is not None}
+        self.nprobe = nprobe
+        self.eps = eps
+        self.position = numpy.empty_like(ids)
+        self.position[ids] = numpy.arange(len(ids))
+
+    def __repr__(self):
+        return '{}({}, nlist={}, nprobe={}) at 0x{:0{}X}'.format(self.__class__.__name__, len(self.ids), len(self.centroids), self.nprobe, id(self), 16)
+
+    @classmethod
+    def build(cls, word2idx, wordvecs, nlist=None, nprobe=8, iters=10, sample=64, batch=65536, seed=None, eps=1e-8):
+        ''' build\n
+        Args:
+            word2idx (dict): word to index map
+            wordvecs (Embedding): vector representation of words
+            nlist (int): number of clusters. Default: 4*sqrt(vocab_size)
+            nprobe (int): number of clusters to scan per query. Default: 8
+            iters (int): number of k-means iterations. Default: 10
+            sample (int): k-means is trained on sample*nlist rows at most. Default: 64
+            batch (int): number of rows assigned at once, which bounds the memory of the assignment. Default: 65536
+            seed (int): seed of the random number generator. Default: None
+        '''
+        rng = numpy.random.default_rng(seed)
+        data = to_cpu(wordvecs.weight.data).astype('float32')
+        data = data / numpy.maximum(numpy.linalg.norm(data, axis=1, keepdims=True), eps)
+        if nlist is None:
+            nlist = max(int(4*numpy.sqrt(len(data))), 1)
+        nlist = min(nlist, len(data))
+        train = data[rng.choice(len(data), min(len(data), sample*nlist), replace=False)]
+        centroids = train[rng.choice(len(train), nlist, replace=False)]
+        for _ in range(iters):
+            assign = IVFIndex.assign(train, centroids, batch)
+            order = numpy.argsort(assign, kind='stable')
+            counts = numpy.bincount(assign, minlength=nlist)
+            sums = numpy.empty_like(centroids)
+            sums[counts > 0] = numpy.add.reduceat(train[order], numpy.concatenate(([0], numpy.cumsum(counts[counts > 0])[:-1])), axis=0)
+            # empty clusters are reseeded with random rows
+            sums[counts == 0] = train[rng.choice(len(train), int((counts == 0).sum()))]
+            centroids = sums / numpy.maximum(numpy.linalg.norm(sums, axis=1, keepdims=True), eps)
+        assign = IVFIndex.assign(data, centroids, batch)
+        ids = numpy.argsort(assign, kind='stable')
+        offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(assign, minlength=nlist))))
+        idx2word = [None] * len(data)
+        for k, v in word2idx.items():
+            idx2word[v] = k
+        return cls(centroids, data[ids], ids, offsets, idx2word, nprobe, eps)
+
+    @staticmethod
+    def assign(data, centroids, batch):
+        return numpy.concatenate([numpy.argmax(numpy.dot(data[i:i+batch], centroids.T), axis=1) for i in range(0, len(data), batch)])
+
+    def save(self, path):
+        '''Saves the index to the directory as .npy files and a list of words.
+        '''
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for name in ['centroids', 'matrix', 'ids', 'offsets']:
+            numpy.save(os.path.join(path, name+'.npy'), getattr(self, name))
+        with open(os.path.join(path, 'words.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join('' if w is None else w for w in self.idx2word))
+
+    @classmethod
+    def load(cls, path, nprobe=8, mmap=True):
+        ''' load\n
+        Args:
+            path (str): directory the index was saved to
+            nprobe (int): number of clusters to scan per query. Default: 8
+            mmap (bool): if True, the rows are memory-mapped instead of read into memory. Default: True
+        '''
+        arrays = [numpy.load(os.path.join(path, name+'.npy'), mmap_mode='r' if mmap and name == 'matrix' else None) for name in ['centroids', 'matrix', 'ids', 'offsets']]
+        with open(os.path.join(path, 'words.txt'), 'r', encoding='utf-8') as f:
+            idx2word = [w if w else None for w in f.read().split('\n')]
+        return cls(*arrays, idx2word, nprobe)
+
+    def invalidate(self):
+        pass
+
+    def normalize(self, vecs):
+        return vecs / numpy.maximum(numpy.linalg.norm(vecs, axis=-1, keepdims=True), self.eps)
+
+    def index(self, words):
+        return to_cpu(super().index(words))
+
+    def vectors(self, idx):
+        return numpy.asarray(self.matrix[self.position[idx]])
+
+    def search(self, vecs, n=5, exclude=None):
+        ''' search\n
+        Returns the indices and the similarities of the approximate top n rows for each query vector in descending order of similarity.
+        Args:
+            vecs (ndarray): query vectors of [Q, embedding_dim]
+            n (int): number of neighbours
+            exclude (ndarray): [Q, *] indices to leave out of the results of each query. Default: None
+        Returns:
+            (ndarray, ndarray): indices and similarities of [Q, n], padded with -1 and -inf if the scanned clusters hold less than n rows that are not excluded
+        '''
+        vecs = self.normalize(numpy.asarray(to_cpu(vecs), dtype=self.matrix.dtype))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = numpy.argpartition(-numpy.dot(vecs, self.centroids.T), nprobe-1, axis=1)[:,:nprobe]
+        top = numpy.full((len(vecs), n), -1, dtype='int64')
+        top_sim = numpy.full((len(vecs), n), -numpy.inf, dtype=self.matrix.dtype)
+        for q, probe in enumerate(probes):
+            # each cluster is a contiguous slice, hence a probe reads nprobe contiguous blocks of the memory-mapped rows
+            similarity = numpy.concatenate([numpy.dot(self.matrix[self.offsets[c]:self.offsets[c+1]], vecs[q]) for c in probe])
+            ids = numpy.concatenate([self.ids[self.offsets[c]:self.offsets[c+1]] for c in probe])
+            if exclude is not None:
+                similarity[numpy.isin(ids, exclude[q])] = -numpy.inf
+            k = min(n, len(ids))
+            if k < len(ids):
+                part = numpy.argpartition(-similarity, k-1)[:k]
+            else:
+                part = numpy.arange(k)
+            order = part[numpy.argsort(-similarity[part])]
+            top[q,:k] = ids[order]
+            top_sim[q,:k] = similarity[order]
+        return top, top_sim
+
+    def results(self, idx, similarity):
+        return [[(self.idx2word[int(i)], float(s)) for i, s in zip(row_idx, row_sim) if s > -numpy.inf] for row_idx, row_sim in zip(idx, similarity)]
+
+_indices = weakref.WeakKeyDictionary()
+
+def _index(word2idx, wordvecs):
+    index = _indices.get(wordvecs)
+    if index is None or index.word2idx is not word2idx:
+        index = EmbeddingIndex(word2idx, wordvecs)
+        _indices[wordvecs] = index
+    return index
 
 def most_similar(query, word2idx, wordvecs, n=5):
     ''' most_similar\n
@@ -15,15 +274,10 @@ def most_similar(query, word2idx, wordvecs, n=5):
     if query not in word2idx:
         raise Exception('[*] \'{}\' is unknown.'.format(query))
     print('[*] query: ' + query)
-    idx2word = {v: k for k, v in word2idx.items()}
-    query_vec = wordvecs(word2idx[query])
-
-    similarity = np.array([float(cosine_similarity(wordvecs(i), query_vec).data) for i in range(len(idx2word))])
-    idx = similarity.argsort()[::-1]
-    for i in range(n+1):
-        if idx2word[int(idx[i])] == query:
-            continue
-        print('{}: {}'.format(idx2word[int(idx[i])], similarity[int(idx[i])]))
+    result = _index(word2idx, wordvecs).most_similar(query, n)
+    for word, similarity in result:
+        print('{}: {}'.format(word, similarity))
+    return result
 
 def analogy(a, b, c, word2idx, wordvec, n=5):
     ''' analogy\n
@@ -41,11 +295,7 @@ def analogy(a, b, c, word2idx, wordvec, n=5):
     assert c in word2idx
 
     print('[*] {}:{} = {}:?'.format(a,b,c))
-    idx2word = {v: k for k, v in word2idx.items()}
-    a_vec, b_vec, c_vec = wordvec(word2idx[a]), wordvec(word2idx[b]), wordvec(word2idx[c])
-    query_vec = b_vec - a_vec + c_vec
-    
-    similarity = np.array([float(cosine_similarity(wordvec(i), query_vec).data) for i in range(len(idx2word))])
-    idx = similarity.argsort()[::-1]
-    for i in range(n):
-        print('{}: {}'.format(idx2word[int(idx[i])], similarity[int(idx[i])]))
+    result = _index(word2idx, wordvec).analogy(a, b, c, n)
+    for word, similarity in result:
+        print('{}: {}'.format(word, similarity))
+    return result
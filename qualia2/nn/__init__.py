@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*- 
 from .modules import * 
 from .optim import *
+from .scheduler import *
 from .init import *
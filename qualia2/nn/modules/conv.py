@@ -16,12 +16,13 @@ class Conv1d(Module):
         padding (int):  Zero-padding added to both sides of the input. Default: 0 
         dilation (int): Spacing between kernel elements. Default: 1 
         bias (bool):  adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, W] 
         - Output: [N, out_channels, W_out] 
     '''
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True, memory_saving=None): 
         super().__init__()  
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -38,12 +39,13 @@ class Conv1d(Module):
         self.stride = _single(stride)
         self.padding = _single(padding) 
         self.dilation = _single(dilation)
+        self.memory_saving = memory_saving
     
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = conv1d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation)
+        result = conv1d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
@@ -60,6 +62,7 @@ class Conv2d(Module):
         padding (tuple of int):  Zero-padding added to both sides of the input. Default: 0 
         dilation (tuple of int): Spacing between kernel elements. Default: 1 
         bias (bool): adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, H, W] 
@@ -68,7 +71,7 @@ class Conv2d(Module):
         H_out = (H+2*padding[0]-dilation[0]*(kernel_size[0]-1)-1)/stride[0]+1 
         W_out = (W+2*padding[1]-dilation[1]*(kernel_size[1]-1)-1)/stride[1]+1 
     ''' 
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True, memory_saving=None): 
         super().__init__() 
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -85,12 +88,13 @@ class Conv2d(Module):
         self.stride = _pair(stride)
         self.padding = _pair(padding) 
         self.dilation = _pair(dilation) 
+        self.memory_saving = memory_saving
         
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = conv2d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation)
+        result = conv2d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
@@ -107,12 +111,13 @@ class Conv3d(Module):
         padding (tuple of int):  Zero-padding added to both sides of the input. Default: 0 
         dilation (tuple of int): Spacing between kernel elements. Default: 1 
         bias (bool):  adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, D, H, W] 
         - Output: [N, out_channels, D_out, H_out, W_out] 
     '''
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, dilation=1, bias=True, memory_saving=None): 
         super().__init__() 
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -129,12 +134,13 @@ class Conv3d(Module):
         self.stride = _triple(stride)
         self.padding = _triple(padding) 
         self.dilation = _triple(dilation)
+        self.memory_saving = memory_saving
 
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = conv3d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation)
+        result = conv3d(x, self.kernel, self.bias, self.stride, self.padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
@@ -152,12 +158,13 @@ class ConvTranspose1d(Module):
         output_padding (tuple of int): Zero-padding added to both sides of the output. Default: 0
         dilation (tuple of int): Spacing between kernel elements. Default: 1 
         bias (bool):  adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, W] 
         - Output: [N, out_channels, W_out]
     ''' 
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True, memory_saving=None): 
         super().__init__() 
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -173,12 +180,13 @@ class ConvTranspose1d(Module):
         self.padding = _single(padding) 
         self.output_padding = _single(output_padding)
         self.dilation = _single(dilation)
+        self.memory_saving = memory_saving
 
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, output_padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.output_padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = convtranspose1d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation)
+        result = convtranspose1d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
@@ -196,6 +204,7 @@ class ConvTranspose2d(Module):
         output_padding (tuple of int): Zero-padding added to both sides of the output. Default: 0
         dilation (tuple of int): Spacing between kernel elements. Default: 1 
         bias (bool):  adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, H, W] 
@@ -204,7 +213,7 @@ class ConvTranspose2d(Module):
         H_out = (H-1)*stride[0]-2*padding[0]+dilation[0]*(kernel_size[0]-1)+1+output_padding[0]
         W_out = (W-1)*stride[1]-2*padding[1]+dilation[1]*(kernel_size[1]-1)+1+output_padding[1]
     ''' 
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True, memory_saving=None): 
         super().__init__() 
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -220,12 +229,13 @@ class ConvTranspose2d(Module):
         self.padding = _pair(padding) 
         self.output_padding = _pair(output_padding)
         self.dilation = _pair(dilation)
+        self.memory_saving = memory_saving
 
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, output_padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.output_padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = convtranspose2d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation)
+        result = convtranspose2d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
@@ -243,12 +253,13 @@ class ConvTranspose3d(Module):
         output_padding (tuple of int): Zero-padding added to both sides of the output. Default: 0
         dilation (tuple of int): Spacing between kernel elements. Default: 1 
         bias (bool):  adds a learnable bias to the output. Default: True 
+        memory_saving (bool): If True, the padded input is recomputed in backward instead of being kept. If None, functions.get_conv_memory_saving() is used. Default: None 
      
     Shape: 
         - Input: [N, in_channels, D, H, W] 
         - Output: [N, out_channels, D_out, H_out, W_out] 
     ''' 
-    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True): 
+    def __init__(self, in_channels, out_channels, kernel_size, stride=1, padding=1, output_padding=0, dilation=1, bias=True, memory_saving=None): 
         super().__init__() 
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -264,12 +275,13 @@ class ConvTranspose3d(Module):
         self.padding = _triple(padding) 
         self.output_padding = _triple(output_padding)
         self.dilation = _triple(dilation)
+        self.memory_saving = memory_saving
 
     def __repr__(self):
         return '{}({}, {}, {}, stride={}, padding={}, output_padding={}, dilation={}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.in_channels, self.out_channels, self.kernel_size, self.stride, self.padding, self.output_padding, self.dilation, str(self.bias is not None), id(self), 16)
 
     def forward(self, x):
-        result = convtranspose3d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation)
+        result = convtranspose3d(x, self.kernel, self.bias, self.stride, self.padding, self.output_padding, self.dilation, self.memory_saving)
         if self.input_shape is None:
             self.input_shape = x.shape
         if self.output_shape is None:
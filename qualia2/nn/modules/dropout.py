@@ -7,7 +7,8 @@ from ...autograd import Tensor
 class Dropout(Module):
     '''Dropout\n
     During training, randomly zeroes some of the elements of the input tensor with probability p using samples from a Bernoulli distribution. 
-    Each channel will be zeroed out independently on every forward call.
+    Each channel will be zeroed out independently on every forward call. The remaining elements are scaled by 1/(1-p) during training, 
+    hence the module is the identity during evaluation. Use manual_seed for reproducible masks.
     
     Args:
         p (float): probability of an element to be zeroed. Default: 0.5
@@ -129,11 +129,11 @@ class NoisyLinear(Module):
         if self.factorised_noise:
             epsilon_in = self._scale_noise(self.in_features)
             epsilon_out = self._scale_noise(self.out_features)
-            self.weight_epsilon.data = np.outer(epsilon_out, epsilon_in)
-            self.bias_epsilon.data = epsilon_out
+            self.weight_epsilon.data[...] = np.outer(epsilon_out, epsilon_in)
+            self.bias_epsilon.data[...] = epsilon_out
         else:
-            self.weight_epsilon.data = np.random.randn(self.out_features, self.in_features)
-            self.bias_epsilon.data = np.random.randn(self.out_features)
+            self.weight_epsilon.data[...] = np.random.randn(self.out_features, self.in_features)
+            self.bias_epsilon.data[...] = np.random.randn(self.out_features)
 
     def forward(self, inp):
         if self.training:
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*- 
 from ...core import *
-from ...autograd import Tensor
+from ...autograd import Tensor, no_grad, get_default_dtype
 from collections import OrderedDict 
 from itertools import chain, islice
 import h5py as h5
@@ -9,6 +9,14 @@ import gzip
 from logging import getLogger
 logger = getLogger('QualiaLogger').getChild('module')
 
+def _assign(var, value):
+    if var.flat_view:
+        # keeps the data a view into the flat buffer of the Module
+        var.data[...] = value
+    else:
+        var.data = np.copy(value.astype(var.dtype))
+    var.version += 1
+
 class Module(object):
     '''Base class for all neural network modules in qualia.\n 
     Module can incoporate Modules, allowing to nest them in a tree structure.  
@@ -38,6 +46,8 @@ class Module(object):
         self.num_params = 0
         self.input_shape = None
         self.output_shape = None
+        self.flat_data = None
+        self.flat_grad = None
     
     def __repr__(self):
         result = '{}(\n'.format(self.__class__.__name__)
@@ -76,7 +86,8 @@ class Module(object):
                 for _, module in self._modules.items():
                     module.input_shape = None
                     module.output_shape = None    
-                self.forward(x)
+                with no_grad():
+                    self.forward(x)
                 total_params = self._module_summary()
         logger.info('='*76)
         logger.info('total params: {}'.format(total_params))
@@ -137,16 +148,55 @@ class Module(object):
             else:
                 yield var 
 
+    def flatten(self, grad=None):
+        '''Moves the parameters into one contiguous buffer and preallocates one contiguous gradient buffer.\n
+        The data and the grad of each parameter become views into flat_data and flat_grad, and backward accumulates 
+        the gradients into flat_grad in place, hence the whole model can be updated, zeroed, clipped or copied with a single 
+        vectorized operation on the buffers. Parameters shared between modules are stored once, and the parameters that require grad 
+        are placed first, hence optimizers update them in one pass over the head of the buffers. 
+        Assigning a new array to the data of a parameter detaches it from the buffer, whereas load_state_dict and load copy into it.
+        Args:
+            grad (ndarray): 1-d buffer to use as flat_grad, e.g. one in shared memory. Default: None
+        Returns:
+            (Module): self
+        '''
+        params = sorted({id(var): var for var in self.params()}.values(), key=lambda var: not var.requires_grad)
+        dtypes = set(var.data.dtype for var in params)
+        if len(dtypes) > 1:
+            raise TypeError('[*] parameters of different dtypes {} cannot be flattened into one buffer.'.format(sorted(str(d) for d in dtypes)))
+        size = sum(var.data.size for var in params)
+        dtype = dtypes.pop() if dtypes else get_default_dtype()
+        self.flat_data = np.empty(size, dtype=dtype)
+        if grad is None:
+            self.flat_grad = np.zeros(size, dtype=dtype)
+        else:
+            if grad.shape != (size,) or grad.dtype != dtype:
+                raise ValueError('[*] grad should be a buffer of shape ({},) and dtype {}, got {} of {}.'.format(size, dtype, grad.shape, grad.dtype))
+            self.flat_grad = grad
+            self.flat_grad.fill(0)
+        offset = 0
+        for var in params:
+            n = var.data.size
+            self.flat_data[offset:offset+n] = var.data.reshape(-1)
+            var.data = self.flat_data[offset:offset+n].reshape(var.shape)
+            var.grad = self.flat_grad[offset:offset+n].reshape(var.shape)
+            var.flat_view = True
+            offset += n
+        return self
+
     def zero_grad(self): 
+        if self.flat_grad is not None:
+            self.flat_grad.fill(0)
+            return
         if self._modules:
             for _, module in self._modules.items(): 
                 module.zero_grad()
-        for _, var in self._params.items(): 
-            if type(var) is list:
-                for i in var:
-                    i.grad = None 
-            else:
-                var.grad = None
+        for var in self._params.values(): 
+            for i in (var if type(var) is list else [var]):
+                if i.flat_view:
+                    i.grad.fill(0)
+                else:
+                    i.grad = None
     
     def eval(self):
         if self._modules:
@@ -188,9 +238,9 @@ class Module(object):
         for key, value in self._params.items(): 
             if type(value) is list:
                 for i, val in enumerate(value):
-                    self._params[key][int(i)].data = np.copy(state_dict[name+str(key)+'.'+str(i)].astype(self._params[key][int(i)].dtype))
+                    _assign(self._params[key][int(i)], state_dict[name+str(key)+'.'+str(i)])
             else:
-                self._params[key].data = np.copy(state_dict[name+str(key)].astype(self._params[key].dtype))
+                _assign(self._params[key], state_dict[name+str(key)])
                 
     def load_state_dict_from_url(self, url, version=0):
         '''Downloads and copies parameters from the state_dict at the url into this module.\n
@@ -227,9 +277,9 @@ class Module(object):
         for key, value in self._params.items(): 
             if type(value) is list:
                 for i, val in enumerate(value):
-                    self._params[key][int(i)].data = np.array(h5file[key][str(i)])
+                    _assign(val, np.array(h5file[key][str(i)]))
             else:
-                self._params[key].data = np.array(h5file[key])
+                _assign(value, np.array(h5file[key]))
         
     def save(self, filename, dtype='float32', protocol=-1, version=0):
         '''Saves internal parameters of the Module in HDF5 format.\n 
@@ -241,7 +291,7 @@ class Module(object):
         ''' 
         if version == 1:
             with gzip.open(filename, 'wb') as f:
-                pickle.dump(self.state_dict(dtype), f, protocol)
+                pickle.dump({key: value.astype(dtype) for key, value in self.state_dict().items()}, f, protocol)
         elif version == 0:
             with h5.File(filename, 'w') as file: 
                 self.__save__(file)
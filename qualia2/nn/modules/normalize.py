@@ -45,8 +45,8 @@ class BatchNorm1d(Module):
             mean = np.mean(x.data, axis=axis, keepdims=True)
             std = np.std(x.data, axis=axis, keepdims=True)
             if self.track_running_stats:
-                self.mean.data = self.momentum*mean + (1 - self.momentum)*self.mean.data
-                self.std.data = self.momentum*std + (1 - self.momentum)*self.std.data
+                self.mean.data[...] = self.momentum*mean + (1 - self.momentum)*self.mean.data
+                self.std.data[...] = self.momentum*std + (1 - self.momentum)*self.std.data
             result = batch_norm(x, mean, std, self.weight, self.bias, axis, self.eps)
         else:
             if self.track_running_stats:
@@ -94,8 +94,8 @@ class BatchNorm2d(Module):
             mean = np.mean(x.data, axis=axis, keepdims=True)
             std = np.std(x.data, axis=axis, keepdims=True)
             if self.track_running_stats:
-                self.mean.data = self.momentum*mean + (1 - self.momentum)*self.mean.data
-                self.std.data = self.momentum*std + (1 - self.momentum)*self.std.data
+                self.mean.data[...] = self.momentum*mean + (1 - self.momentum)*self.mean.data
+                self.std.data[...] = self.momentum*std + (1 - self.momentum)*self.std.data
             result = batch_norm(x, mean, std, self.weight, self.bias, axis, self.eps)
         else:
             if self.track_running_stats:
@@ -143,8 +143,8 @@ class BatchNorm3d(Module):
             mean = np.mean(x.data, axis=axis, keepdims=True)
             std = np.std(x.data, axis=axis, keepdims=True)
             if self.track_running_stats:
-                self.mean.data = self.momentum*mean + (1 - self.momentum)*self.mean.data
-                self.std.data = self.momentum*std + (1 - self.momentum)*self.std.data
+                self.mean.data[...] = self.momentum*mean + (1 - self.momentum)*self.mean.data
+                self.std.data[...] = self.momentum*std + (1 - self.momentum)*self.std.data
             result = batch_norm(x, mean, std, self.weight, self.bias, axis, self.eps)
         else:
             if self.track_running_stats:
@@ -2,7 +2,7 @@
 from .module import Module
 from ...core import * 
 from ...util import _single, _pair, _triple
-from ...functions import maxpool1d, maxpool2d, maxpool3d, avepool1d, avepool2d, avepool3d, globalavepool1d, globalavepool2d, globalavepool3d, maxunpool1d, maxunpool2d, maxunpool3d
+from ...functions import maxpool1d, maxpool2d, maxpool3d, avepool1d, avepool2d, avepool3d, globalavepool1d, globalavepool2d, globalavepool3d, adaptivemaxpool1d, adaptivemaxpool2d, adaptivemaxpool3d, adaptiveavepool1d, adaptiveavepool2d, adaptiveavepool3d, maxunpool1d, maxunpool2d, maxunpool3d
 from ...autograd import Tensor 
 
 class MaxPool1d(Module):
@@ -296,6 +296,150 @@ class GlobalAvgPool3d(Module):
             self.output_shape = result.shape
         return result
     
+class AdaptiveMaxPool1d(Module):
+    '''Applies a 1D adaptive max pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (int): the size of the output
+
+    Shape:
+        - Input: [N,C,W]
+        - Output: [N,C,W_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _single(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptivemaxpool1d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
+class AdaptiveMaxPool2d(Module):
+    '''Applies a 2D adaptive max pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (tuple of int): the size of the output
+
+    Shape:
+        - Input: [N,C,H,W]
+        - Output: [N,C,H_out,W_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _pair(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptivemaxpool2d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
+class AdaptiveMaxPool3d(Module):
+    '''Applies a 3D adaptive max pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (tuple of int): the size of the output
+
+    Shape:
+        - Input: [N,C,H,W,D]
+        - Output: [N,C,H_out,W_out,D_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _triple(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptivemaxpool3d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
+class AdaptiveAvgPool1d(Module):
+    '''Applies a 1D adaptive average pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (int): the size of the output
+
+    Shape:
+        - Input: [N,C,W]
+        - Output: [N,C,W_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _single(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptiveavepool1d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
+class AdaptiveAvgPool2d(Module):
+    '''Applies a 2D adaptive average pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (tuple of int): the size of the output
+
+    Shape:
+        - Input: [N,C,H,W]
+        - Output: [N,C,H_out,W_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _pair(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptiveavepool2d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
+class AdaptiveAvgPool3d(Module):
+    '''Applies a 3D adaptive average pooling over an input signal composed of several input planes.\n
+    Args:
+        output_size (tuple of int): the size of the output
+
+    Shape:
+        - Input: [N,C,H,W,D]
+        - Output: [N,C,H_out,W_out,D_out]
+    '''
+    def __init__(self, output_size): 
+        super().__init__()  
+        self.output_size = _triple(output_size)
+
+    def __repr__(self):
+        return '{}({}) at 0x{:0{}X}'.format(self.__class__.__name__, self.output_size, id(self), 16)
+
+    def forward(self, x):
+        result = adaptiveavepool3d(x, self.output_size)
+        if self.input_shape is None:
+            self.input_shape = x.shape
+        if self.output_shape is None:
+            self.output_shape = result.shape
+        return result
+
 class MaxUnpool1d(Module):
     '''Applies a 1D max unpooling over an input signal composed of several input planes.\n
     Args:
@@ -2,9 +2,12 @@
 import math 
 from .module import Module
 from ...core import * 
-from ...functions import rnncell, rnn, grucell, gru
+from ...functions import rnncell, rnn, lstmcell, lstm, grucell, gru, PackedSequence
 from ...autograd import Tensor 
 
+def _shape(x):
+    return x.data.shape if isinstance(x, PackedSequence) else x.shape
+
 class RNN(Module):
     '''Applies a multi-layer Elman RNN with tanh
     Args:
@@ -13,9 +16,9 @@ class RNN(Module):
         num_layers (int): Number of recurrent layers.
         bias (bool):adds a learnable bias to the output. Default: True 
     Shape:
-            - Input: [seq_len, N, input_size]
+            - Input: [seq_len, N, input_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
-            - Output: [seq_len, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
     '''
     def __init__(self, input_size, hidden_size, num_layers, bias=True):
@@ -49,9 +52,9 @@ class RNN(Module):
     def forward(self, x, h0):
         result, hn = rnn(x, h0, self.weight_x, self.weight_h, self.bias_x, self.bias_h, self.num_layers)
         if self.input_shape is None:
-            self.input_shape = tuple([x.shape, h0.shape])
+            self.input_shape = tuple([_shape(x), h0.shape])
         if self.output_shape is None:
-            self.output_shape = tuple([result.shape, hn.shape])
+            self.output_shape = tuple([_shape(result), hn.shape])
         return result, hn
 
 class RNNCell(Module):
@@ -92,6 +95,97 @@ class RNNCell(Module):
             self.output_shape = result.shape
         return result
 
+class LSTM(Module):
+    '''Applies a multi-layer long short-term memory (LSTM) RNN to an input sequence.
+    Args:
+        input_size (int): The number of expected features in the input
+        hidden_size (int): The number of features in the hidden state
+        num_layers (int): Number of recurrent layers.
+        bias (bool):adds a learnable bias to the output. Default: True 
+    Shape:
+            - Input: [seq_len, N, input_size] or PackedSequence
+            - Hidden_h: [num_layers, N, hidden_size]
+            - Hidden_c: [num_layers, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
+            - Hidden_h: [num_layers, N, hidden_size]
+            - Hidden_c: [num_layers, N, hidden_size]
+    '''
+    def __init__(self, input_size, hidden_size, num_layers, bias=True):
+        super().__init__()
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.num_params += (4*input_size*hidden_size + (2*num_layers-1)*4*hidden_size*hidden_size)
+        self.weight_x = [Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(input_size, 4*hidden_size)))]
+        self.weight_h = []
+        for i in range(num_layers):
+            if i == 0:
+                self.weight_h.append(Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(hidden_size, 4*hidden_size))))
+            else:
+                self.weight_x.append(Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(hidden_size, 4*hidden_size))))
+                self.weight_h.append(Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(hidden_size, 4*hidden_size))))
+        if bias:
+            self.num_params += 2*num_layers*4*hidden_size
+            self.bias_x = []
+            self.bias_h = []
+            for _ in range(num_layers):
+                self.bias_x.append(Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(4*hidden_size))))
+                self.bias_h.append(Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(4*hidden_size))))
+        else:
+            self.bias_x = None
+            self.bias_h = None  
+    
+    def __repr__(self):
+        return '{}({}, {}, {}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.input_size, self.hidden_size, self.num_layers, str(self.bias_x is not None), id(self), 16)
+
+    def forward(self, x, h0, c0):
+        result, hn, cn = lstm(x, h0, c0, self.weight_x, self.weight_h, self.bias_x, self.bias_h, self.num_layers)
+        if self.input_shape is None:
+            self.input_shape = tuple([_shape(x), h0.shape, c0.shape])
+        if self.output_shape is None:
+            self.output_shape = tuple([_shape(result), hn.shape, cn.shape])
+        return result, hn, cn
+
+class LSTMCell(Module):
+    '''A long short-term memory (LSTM) cell\n
+    Args:
+        input_size (int): The number of expected features in the input
+        hidden_size (int): The number of features in the hidden state
+        bias (bool):adds a learnable bias to the output. Default: True 
+    
+    Shape:
+        - Input: [N, input_size]
+        - Hidden_h: [N, hidden_size]
+        - Hidden_c: [N, hidden_size]
+        - Output_h: [N, hidden_size]
+        - Output_c: [N, hidden_size]
+    '''
+    def __init__(self, input_size, hidden_size, bias=True):
+        super().__init__()
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_params += (4*input_size*hidden_size + 4*hidden_size*hidden_size)
+        self.weight_x = Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(input_size, 4*hidden_size)))
+        self.weight_h = Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(hidden_size, 4*hidden_size)))
+        if bias:
+            self.bias_x = Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(4*hidden_size)))
+            self.bias_h = Tensor(np.random.uniform(-math.sqrt(1/hidden_size),math.sqrt(1/hidden_size),(4*hidden_size)))
+            self.num_params += 2*4*hidden_size
+        else:
+            self.bias_x = None
+            self.bias_h = None
+    
+    def __repr__(self):
+        return '{}({}, {}, bias={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.input_size, self.hidden_size, str(self.bias_x is not None), id(self), 16)
+
+    def forward(self, x, h, c):
+        h_next, c_next = lstmcell(x, h, c, self.weight_x, self.weight_h, self.bias_x, self.bias_h)
+        if self.input_shape is None:
+            self.input_shape = tuple([x.shape, h.shape, c.shape])
+        if self.output_shape is None:
+            self.output_shape = tuple([h_next.shape, c_next.shape])
+        return h_next, c_next
+
 class GRU(Module):
     '''Applies a multi-layer gated recurrent unit (GRU) RNN to an input sequence.
     Args:
@@ -100,9 +194,9 @@ class GRU(Module):
         num_layers (int): Number of recurrent layers.
         bias (bool):adds a learnable bias to the output. Default: True 
     Shape:
-            - Input: [seq_len, N, input_size]
+            - Input: [seq_len, N, input_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
-            - Output: [seq_len, N, hidden_size]
+            - Output: [seq_len, N, hidden_size] or PackedSequence
             - Hidden: [num_layers, N, hidden_size]
     '''
     def __init__(self, input_size, hidden_size, num_layers, bias=True):
@@ -136,9 +230,9 @@ class GRU(Module):
     def forward(self, x, h0):
         result, hn = gru(x, h0, self.weight_x, self.weight_h, self.bias_x, self.bias_h, self.num_layers)
         if self.input_shape is None:
-            self.input_shape = tuple([x.shape, h0.shape])
+            self.input_shape = tuple([_shape(x), h0.shape])
         if self.output_shape is None:
-            self.output_shape = tuple([result.shape, hn.shape])
+            self.output_shape = tuple([_shape(result), hn.shape])
         return result, hn    
     
 class GRUCell(Module):
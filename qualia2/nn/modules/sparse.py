@@ -10,11 +10,14 @@ class Embedding(Module):
     Args:
         num_embeddings (int): size of the dictionary of embeddings
         embedding_dim (int): the size of each embedding vector
+        sparse (bool): if True, the gradient of weight is a SparseGrad holding only the looked up rows, 
+            which SGD, Adam and AdaGrad apply lazily. Default: False
     '''
-    def __init__(self, num_embeddings, embedding_dim):
+    def __init__(self, num_embeddings, embedding_dim, sparse=False):
         super().__init__()
         self.num_embeddings = num_embeddings
         self.embedding_dim = embedding_dim
+        self.sparse = sparse
         self.num_params += num_embeddings*embedding_dim
         self.weight = Tensor(np.random.normal(0, math.sqrt(1/num_embeddings),(num_embeddings, embedding_dim)))
 
@@ -22,7 +25,7 @@ class Embedding(Module):
         return '{}({}, {}) at 0x{:0{}X}'.format(self.__class__.__name__, self.num_embeddings, self.embedding_dim, id(self), 16)
 
     def forward(self, x):
-        result = embedding(x, self.weight, self.num_embeddings)
+        result = embedding(x, self.weight, self.num_embeddings, self.sparse)
         if self.input_shape is None:
             if isinstance(x, int):
                 self.input_shape = (1,)
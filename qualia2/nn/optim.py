@@ -1,13 +1,48 @@
 # -*- coding: utf-8 -*- 
 from ..core import *
+from ..autograd import SparseGrad
+import math
+import h5py as h5
+import _pickle as pickle
+import gzip
+
+def _dense(grad):
+    return grad.todense() if isinstance(grad, SparseGrad) else grad
+
+def _norm(a):
+    return math.sqrt(float(np.vdot(a, a)))
+
+def _address(a):
+    return a.data.ptr if gpu else a.ctypes.data
+
+def _moments(grad, m, v, tmp, betas):
+    # updates the first and second moments of the Adam family in place, tmp is scratch
+    np.multiply(m, betas[0], out=m)
+    np.multiply(grad, 1-betas[0], out=tmp)
+    np.add(m, tmp, out=m)
+    np.multiply(v, betas[1], out=v)
+    np.multiply(grad, grad, out=tmp)
+    np.multiply(tmp, 1-betas[1], out=tmp)
+    np.add(v, tmp, out=v)
+
+def _descend(data, step, l2):
+    if l2 != 0:
+        np.multiply(data, 1-l2, out=data)
+    np.subtract(data, step, out=data)
 
 class Optimizer(object): 
     '''Optimizer base class\n 
+    The state of an optimizer is keyed by the parameter itself, hence it does not depend on the order of the parameters. 
+    SGD, Adam, Nadam and RAdam update the parameters in place through reused scratch buffers, and if the parameters are the views 
+    into the flat buffers of a Module (see Module.flatten), they update all of them in one vectorized pass over the buffers, 
+    which is swept in blocks of block elements on CPU so that the intermediate passes stay in cache. 
     Args:
         parameters (generator): Parameters to optimize
     ''' 
     def __init__(self, parameters): 
         self.params = parameters
+        self.buffers = []
+        self.block = 1<<16
 
     def __repr__(self):
         return '{}() at 0x{:0{}X}'.format(self.__class__.__name__, id(self), 16)
@@ -27,7 +62,175 @@ class Optimizer(object):
     
     def zero_grad(self):
         for i in self.params(): 
-            i.grad = None
+            if i.flat_view:
+                i.grad.fill(0)
+            else:
+                i.grad = None
+
+    def state_dict(self):
+        '''Returns a dictionary containing a whole state of the optimizer.\n
+        The hyperparameters and the step count are stored by their attribute names, and the state of each parameter as name.i, 
+        where i is the position of the parameter in params, hence the state can be loaded into the optimizer of a model built anew.
+        '''
+        index = {var: i for i, var in enumerate({id(var): var for var in self.params()}.values())}
+        state_dict = {}
+        for key, value in vars(self).items():
+            if key in ['params', 'buffers']:
+                continue
+            if isinstance(value, dict):
+                for var, state in value.items():
+                    if var in index:
+                        state_dict['{}.{}'.format(key, index[var])] = state
+            elif isinstance(value, (bool, int, float, tuple, list)):
+                state_dict[key] = value
+        return state_dict
+
+    def load_state_dict(self, state_dict):
+        '''Copies the state from state_dict into this optimizer. The state of the parameters is copied in place if it exists, 
+        hence the flat state of the fused update is kept.
+        '''
+        params = list({id(var): var for var in self.params()}.values())
+        for key, value in state_dict.items():
+            name, _, i = key.rpartition('.')
+            if name and i.isdigit() and isinstance(getattr(self, name, None), dict):
+                state = getattr(self, name)
+                var = params[int(i)]
+                if var in state and state[var].shape == value.shape:
+                    state[var][...] = value
+                else:
+                    state[var] = np.array(value, dtype=var.data.dtype)
+                continue
+            current = getattr(self, key, None)
+            if isinstance(current, (bool, int, float, tuple, list)):
+                # HDF5 gives back numpy scalars and arrays
+                value = type(current)(value.tolist() if hasattr(value, 'tolist') else value)
+            setattr(self, key, value)
+
+    def __save__(self, h5file):
+        for key, value in self.state_dict().items():
+            if isinstance(value, (bool, int, float)):
+                h5file.attrs[key] = value
+            else:
+                # sequences such as the momentum schedule of Nadam grow with the steps, hence they are not attributes
+                h5file.create_dataset(key, data=value if isinstance(value, (tuple, list)) else to_cpu(value))
+
+    def __load__(self, h5file):
+        state_dict = dict(h5file.attrs.items())
+        for key in h5file.keys():
+            state_dict[key] = np.array(h5file[key])
+        self.load_state_dict(state_dict)
+
+    def save(self, filename, protocol=-1, version=0):
+        '''Saves the state of the optimizer in HDF5 format.\n 
+        Args: 
+            filename (str): specify the filename as well as the saving path with the file extension. (ex) path/to/filename.qla 
+            protocol (int): pickle protocol
+            version (int): version for the way of saving. version 1 saves a gzipped pickle. 
+        ''' 
+        if version == 1:
+            with gzip.open(filename, 'wb') as f:
+                pickle.dump(self.state_dict(), f, protocol)
+        elif version == 0:
+            with h5.File(filename, 'w') as file: 
+                self.__save__(file)
+
+    def load(self, filename, version=0):
+        '''Loads the state saved by save to the optimizer.\n 
+        Args: 
+            filename (str): specify the filename as well as the path to the file with the file extension. (ex) path/to/filename.qla 
+            version (int): version for the way of saving. 
+        ''' 
+        if version == 1:
+            with gzip.open(filename, 'rb') as f:
+                self.load_state_dict(pickle.load(f))
+        elif version == 0:
+            with h5.File(filename, 'r') as file: 
+                self.__load__(file)
+
+    def parameters(self):
+        '''Returns the parameters to update that have a gradient, each once even if it is shared. 
+        Their version is bumped as the caller updates their data in place.
+        '''
+        params = [var for var in {id(var): var for var in self.params()}.values() if var.requires_grad and var.grad is not None]
+        for var in params:
+            var.version += 1
+        return params
+
+    def fused(self, params):
+        '''Returns (offsets, data, grad) if the parameters tile the head of the flat buffers of a Module, otherwise None.\n
+        data and grad are the views of the buffers covering the parameters, and offsets is the start of each parameter in them.
+        '''
+        if not params or not all(var.flat_view for var in params):
+            return None
+        data, grad = params[0].data.base, params[0].grad.base
+        if data is None or grad is None or any(var.data.base is not data or var.grad.base is not grad for var in params):
+            return None
+        offsets = [(_address(var.data)-_address(data))//data.itemsize for var in params]
+        size = 0
+        for offset, var in sorted(zip(offsets, params), key=lambda x: x[0]):
+            if offset != size or _address(var.grad)-_address(grad) != offset*grad.itemsize:
+                return None
+            size += var.data.size
+        return offsets, data[:size], grad[:size]
+
+    def state(self, name, var):
+        '''Returns the state of the parameter, zeros on the first call.
+        '''
+        state = getattr(self, name)
+        if var not in state:
+            state[var] = np.zeros_like(var.data)
+        return state[var]
+
+    def flat_state(self, name, params, offsets, size):
+        '''Returns the state of the fused parameters as a flat array. The state of each parameter is kept as a view into it, 
+        hence the state carries over between the fused and the per-parameter updates.
+        '''
+        state = getattr(self, name)
+        flat = state[params[0]].base if params[0] in state else None
+        if flat is not None and flat.size == size and all(var in state and state[var].base is flat and _address(state[var])-_address(flat) == offset*flat.itemsize for var, offset in zip(params, offsets)):
+            return flat
+        flat = np.zeros(size, dtype=params[0].data.dtype)
+        for var, offset in zip(params, offsets):
+            view = flat[offset:offset+var.data.size].reshape(var.shape)
+            if var in state:
+                view[...] = state[var]
+            state[var] = view
+        return flat
+
+    def scratch(self, like, k=0):
+        '''Returns the k-th scratch buffer with the shape and the dtype of like. The buffers are reused over the steps.
+        '''
+        while len(self.buffers) <= k:
+            self.buffers.append(None)
+        buffer = self.buffers[k]
+        if buffer is None or buffer.size < like.size or buffer.dtype != like.dtype:
+            buffer = np.empty(like.size, dtype=like.dtype)
+            self.buffers[k] = buffer
+        return buffer[:like.size].reshape(like.shape)
+
+    def apply(self, names, update):
+        '''Calls update(data, grad, *states) once over the flat buffers if the parameters are fused, otherwise for each parameter 
+        with a dense gradient. Returns the parameters with a SparseGrad, which are left to the caller.
+        '''
+        params = self.parameters()
+        fused = self.fused(params)
+        if fused is not None:
+            offsets, data, grad = fused
+            states = [self.flat_state(name, params, offsets, data.size) for name in names]
+            # on CPU the buffers are swept in blocks that stay in cache across the passes of update
+            block = data.size if gpu else self.block
+            for start in range(0, data.size, block):
+                end = start + block
+                update(data[start:end], grad[start:end], *[state[start:end] for state in states])
+            return []
+        sparse = []
+        for var in params:
+            if isinstance(var.grad, SparseGrad):
+                sparse.append(var)
+                continue
+            assert var.data.shape == var.grad.shape
+            update(var.data, var.grad, *[self.state(name, var) for name in names])
+        return sparse
 
 class SGD(Optimizer):
     '''Implements stochastic gradient descent (optionally with momentum).\n 
@@ -36,6 +239,8 @@ class SGD(Optimizer):
         lr (float): learning rate  
         momentum (float): momentum factor Default: 0
         weight_decay (float) – weight decay (L2 penalty) Default: 0
+    Note: 
+        A SparseGrad is applied lazily, i.e. the momentum and the weight decay of a row are only updated when the row has a gradient.
     '''
     def __init__(self, parameters, lr=0.001, momentum=0, weight_decay=0):
         super().__init__(parameters)
@@ -61,15 +266,26 @@ class SGD(Optimizer):
         self.l2 = defaults['weight_decay']
 
     def step(self):
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            assert var.data.shape == var.grad.shape
-            if i not in self.v:  
-                self.v[i] = np.zeros_like(var.grad) 
-            self.v[i] = self.m * self.v[i] + (1 - self.m) * var.grad 
-            var.data -= self.l2 * var.data
-            var.data -= self.lr * self.v[i]
+        for var in self.apply(['v'] if self.m != 0 else [], self.update):
+            idx = var.grad.indices
+            v = var.grad.values
+            if self.m != 0:
+                state = self.state('v', var)
+                v = self.m * state[idx] + (1 - self.m) * v
+                state[idx] = v
+            var.data[idx] -= self.l2 * var.data[idx] + self.lr * v
+
+    def update(self, data, grad, v=None):
+        tmp = self.scratch(grad)
+        if v is not None:
+            np.multiply(v, self.m, out=v)
+            np.multiply(grad, 1 - self.m, out=tmp)
+            np.add(v, tmp, out=v)
+            grad = v
+        if self.l2 != 0:
+            np.multiply(data, 1 - self.l2, out=data)
+        np.multiply(grad, self.lr, out=tmp)
+        np.subtract(data, tmp, out=data)
 
 class Adadelta(Optimizer):
     '''Implements Adadelta algorithm.\n
@@ -106,16 +322,15 @@ class Adadelta(Optimizer):
         self.l2 = defaults['weight_decay']
 
     def step(self): 
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.g:
-                self.g[i] = np.zeros_like(var.grad) 
-            if i not in self.u: 
-                self.u[i] = np.zeros_like(var.grad) 
-            self.g[i] = self.rho * self.g[i] + (1-self.rho) * var.grad**2 
-            update = -np.sqrt(self.u[i]+self.eps) * var.grad / np.sqrt(self.g[i]+self.eps) 
-            self.u[i] = self.rho * self.u[i] + (1-self.rho) * update**2 
+        for var in self.parameters(): 
+            var.grad = _dense(var.grad)
+            if var not in self.g:
+                self.g[var] = np.zeros_like(var.grad) 
+            if var not in self.u: 
+                self.u[var] = np.zeros_like(var.grad) 
+            self.g[var] = self.rho * self.g[var] + (1-self.rho) * var.grad**2 
+            update = -np.sqrt(self.u[var]+self.eps) * var.grad / np.sqrt(self.g[var]+self.eps) 
+            self.u[var] = self.rho * self.u[var] + (1-self.rho) * update**2 
             var.data -= self.l2 * var.data
             var.data += self.lr * update 
 
@@ -126,6 +341,8 @@ class AdaGrad(Optimizer):
         lr (float): learning rate Default: 1e-03
         eps (flaot): for numerical stability Default: 1e-08
         weight_decay (float): weight decay (L2 penalty) Default: 0
+    Note: 
+        A SparseGrad is applied lazily, i.e. the weight decay of a row is only applied when the row has a gradient.
     '''
     def __init__(self, parameters, lr=0.001, eps=1e-08, weight_decay=0):
         super().__init__(parameters)
@@ -149,14 +366,18 @@ class AdaGrad(Optimizer):
         self.l2 = defaults['weight_decay']
 
     def step(self): 
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
+        for var in self.parameters(): 
+            if var not in self.h:  
+                self.h[var] = np.zeros_like(var.data) 
+            if isinstance(var.grad, SparseGrad):
+                idx = var.grad.indices
+                h = self.h[var][idx] + var.grad.values**2
+                self.h[var][idx] = h
+                var.data[idx] -= self.l2 * var.data[idx] + self.lr * var.grad.values / np.sqrt(h+self.eps)
                 continue
-            if i not in self.h:  
-                self.h[i] = np.zeros_like(var.grad) 
-            self.h[i] += var.grad**2
+            self.h[var] += var.grad**2
             var.data -= self.l2 * var.data
-            var.data -= self.lr * var.grad / np.sqrt(self.h[i]+self.eps)  
+            var.data -= self.lr * var.grad / np.sqrt(self.h[var]+self.eps)  
 
 class RMSProp(Optimizer): 
     '''Implements RMSprop algorithm.\n
@@ -192,14 +413,13 @@ class RMSProp(Optimizer):
         self.l2 = defaults['weight_decay']
 
     def step(self): 
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.h:  
-                self.h[i] = np.zeros_like(var.grad) 
-            self.h[i] = self.alpha * self.h[i] + (1-self.alpha) * var.grad**2 
+        for var in self.parameters(): 
+            var.grad = _dense(var.grad)
+            if var not in self.h:  
+                self.h[var] = np.zeros_like(var.grad) 
+            self.h[var] = self.alpha * self.h[var] + (1-self.alpha) * var.grad**2 
             var.data -= self.l2 * var.data
-            var.data -= self.lr * var.grad / np.sqrt(self.h[i]+self.eps) 
+            var.data -= self.lr * var.grad / np.sqrt(self.h[var]+self.eps) 
 
 class Adam(Optimizer):
     '''Implements Adam algorithm.\n
@@ -209,6 +429,8 @@ class Adam(Optimizer):
         betas (tuple of float): coefficients used for computing running averages of gradient and its square Default: (0.9, 0.999)
         eps (float): for numerical stability Default: 1e-08
         weight_decay (float): weight decay (L2 penalty) Default: 0
+    Note: 
+        A SparseGrad is applied lazily, i.e. the moments and the weight decay of a row are only updated when the row has a gradient.
     '''
     def __init__(self, parameters, lr=0.001, betas=(0.9, 0.999), eps=1e-08, weight_decay=0):
         super().__init__(parameters)
@@ -238,19 +460,26 @@ class Adam(Optimizer):
 
     def step(self): 
         self.t += 1
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.m:  
-                self.m[i] = np.zeros_like(var.grad) 
-            if i not in self.v:  
-                self.v[i] = np.zeros_like(var.grad) 
-            self.m[i] = self.betas[0] * self.m[i] + (1-self.betas[0]) * var.grad
-            self.v[i] = self.betas[1] * self.v[i] + (1-self.betas[1]) * var.grad**2
-            m = self.m[i] / (1-self.betas[0]**self.t)
-            v = self.v[i] / (1-self.betas[1]**self.t)
-            var.data -= self.l2 * var.data
-            var.data -= self.lr * m / np.sqrt(v+self.eps) 
+        for var in self.apply(['m', 'v'], self.update):
+            idx = var.grad.indices
+            m_state, v_state = self.state('m', var), self.state('v', var)
+            m = self.betas[0] * m_state[idx] + (1-self.betas[0]) * var.grad.values
+            v = self.betas[1] * v_state[idx] + (1-self.betas[1]) * var.grad.values**2
+            m_state[idx] = m
+            v_state[idx] = v
+            m = m / (1-self.betas[0]**self.t)
+            v = v / (1-self.betas[1]**self.t)
+            var.data[idx] -= self.l2 * var.data[idx] + self.lr * m / np.sqrt(v+self.eps)
+
+    def update(self, data, grad, m, v):
+        tmp = self.scratch(grad)
+        _moments(grad, m, v, tmp, self.betas)
+        np.multiply(v, 1/(1-self.betas[1]**self.t), out=tmp)
+        np.add(tmp, self.eps, out=tmp)
+        np.sqrt(tmp, out=tmp)
+        np.divide(m, tmp, out=tmp)
+        np.multiply(tmp, self.lr/(1-self.betas[0]**self.t), out=tmp)
+        _descend(data, tmp, self.l2)
 
 class AdaMax(Optimizer):
     '''Implements AdaMax algorithm.\n
@@ -289,17 +518,16 @@ class AdaMax(Optimizer):
 
     def step(self): 
         self.t += 1
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.m:  
-                self.m[i] = np.zeros_like(var.grad) 
-            if i not in self.v:  
-                self.v[i] = np.zeros_like(var.grad) 
-            self.m[i] = self.betas[0] * self.m[i] + (1-self.betas[0]) * var.grad
-            self.v[i] = np.maximum(self.betas[1] * self.v[i], np.abs(var.grad))
+        for var in self.parameters(): 
+            var.grad = _dense(var.grad)
+            if var not in self.m:  
+                self.m[var] = np.zeros_like(var.grad) 
+            if var not in self.v:  
+                self.v[var] = np.zeros_like(var.grad) 
+            self.m[var] = self.betas[0] * self.m[var] + (1-self.betas[0]) * var.grad
+            self.v[var] = np.maximum(self.betas[1] * self.v[var], np.abs(var.grad))
             var.data -= self.l2 * var.data
-            var.data -= self.lr / (1-self.betas[0]**self.t) * self.m[i] / self.v[i]
+            var.data -= self.lr / (1-self.betas[0]**self.t) * self.m[var] / self.v[var]
 
 class Nadam(Optimizer):
     '''Implements Nesterov-accelerated adaptive moment estimation (Nadam) algorithm.\n
@@ -340,21 +568,24 @@ class Nadam(Optimizer):
     def step(self): 
         self.t += 1
         self.mu.append(self.betas[0]*(1-0.5*(0.96**(0.004*(self.t+1)))))
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.m:  
-                self.m[i] = np.zeros_like(var.grad) 
-            if i not in self.v:  
-                self.v[i] = np.zeros_like(var.grad)
-            grad = var.grad/(1-sum(self.mu[:-1])) 
-            self.m[i] = self.betas[0] * self.m[i] + (1-self.betas[0]) * var.grad
-            self.v[i] = self.betas[1] * self.v[i] + (1-self.betas[1]) * var.grad**2
-            m = self.m[i] / (1-sum(self.mu))
-            v = self.v[i] / (1-self.betas[1]**self.t)
-            m_bar = (1-self.mu[-2]) * grad + self.mu[-1] * m   
-            var.data -= self.l2 * var.data
-            var.data -= self.lr * m_bar / np.sqrt(v+self.eps) 
+        # coefficients of the gradient and the first moment in m_bar 
+        self.coef = ((1-self.mu[-2])/(1-sum(self.mu[:-1])), self.mu[-1]/(1-sum(self.mu)))
+        for var in self.apply(['m', 'v'], self.update):
+            var.grad = var.grad.todense()
+            self.update(var.data, var.grad, self.state('m', var), self.state('v', var))
+
+    def update(self, data, grad, m, v):
+        tmp, m_bar = self.scratch(grad), self.scratch(grad, 1)
+        _moments(grad, m, v, tmp, self.betas)
+        np.multiply(grad, self.coef[0], out=m_bar)
+        np.multiply(m, self.coef[1], out=tmp)
+        np.add(m_bar, tmp, out=m_bar)
+        np.multiply(v, 1/(1-self.betas[1]**self.t), out=tmp)
+        np.add(tmp, self.eps, out=tmp)
+        np.sqrt(tmp, out=tmp)
+        np.divide(m_bar, tmp, out=m_bar)
+        np.multiply(m_bar, self.lr, out=m_bar)
+        _descend(data, m_bar, self.l2)
 
 class RAdam(Optimizer):
     ''' Implements Rectified Adam algorithm.\n
@@ -394,22 +625,113 @@ class RAdam(Optimizer):
 
     def step(self):
         self.t += 1
-        for i, var in enumerate(self.params()): 
-            if not var.requires_grad:
-                continue
-            if i not in self.m:  
-                self.m[i] = np.zeros_like(var.grad) 
-            if i not in self.v:  
-                self.v[i] = np.zeros_like(var.grad) 
-            self.m[i] = self.betas[0] * self.m[i] + (1-self.betas[0]) * var.grad
-            self.v[i] = self.betas[1] * self.v[i] + (1-self.betas[1]) * var.grad**2
-            m = self.m[i] / (1-self.betas[0]**self.t)
+        for var in self.apply(['m', 'v'], self.update):
+            var.grad = var.grad.todense()
+            self.update(var.data, var.grad, self.state('m', var), self.state('v', var))
+
+    def update(self, data, grad, m, v):
+        tmp = self.scratch(grad)
+        _moments(grad, m, v, tmp, self.betas)
+        if self.t > 4:
             rho = self.rho - 2*self.t*self.betas[1]**self.t/(1-self.betas[1]**self.t)
-            if self.t > 4:
-                v = np.sqrt(self.v[i]/(1-self.betas[1]**self.t))+self.eps
-                r = np.sqrt((rho-4)*(rho-2)*self.rho/((self.rho-4)*(self.rho-2)*rho))
-                var.data -= self.l2 * var.data
-                var.data -= self.lr * r * m / v 
-            else:
-                var.data -= self.l2 * var.data
-                var.data -= self.lr * m
+            r = np.sqrt((rho-4)*(rho-2)*self.rho/((self.rho-4)*(self.rho-2)*rho))
+            np.multiply(v, 1/(1-self.betas[1]**self.t), out=tmp)
+            np.sqrt(tmp, out=tmp)
+            np.add(tmp, self.eps, out=tmp)
+            np.divide(m, tmp, out=tmp)
+            np.multiply(tmp, self.lr*r/(1-self.betas[0]**self.t), out=tmp)
+        else:
+            np.multiply(m, self.lr/(1-self.betas[0]**self.t), out=tmp)
+        _descend(data, tmp, self.l2)
+
+class LARS(Optimizer):
+    '''Implements LARS (layer-wise adaptive rate scaling) for large-batch training.\n
+    The lr of each parameter is scaled by its trust ratio eta*||w||/(||g||+weight_decay*||w||), 
+    hence each layer is updated in proportion to its own norm regardless of the scale of its gradient.
+    Args:
+        parameters (iterable): iterable of parameters to optimize
+        lr (float): global learning rate Default: 0.1
+        momentum (float): momentum factor Default: 0.9
+        weight_decay (float): weight decay (L2 penalty) Default: 0
+        eta (float): trust coefficient Default: 0.001
+        eps (float): for numerical stability Default: 1e-08
+    '''
+    def __init__(self, parameters, lr=0.1, momentum=0.9, weight_decay=0, eta=0.001, eps=1e-08):
+        super().__init__(parameters)
+        self.lr = lr
+        self.m = momentum
+        self.l2 = weight_decay
+        self.eta = eta
+        self.eps = eps
+        self.v = {}
+
+    def __repr__(self):
+        return '{}(lr={}, momentum={}, weight_decay={}, eta={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.lr, self.m, self.l2, self.eta, id(self), 16)
+
+    @property
+    def defaults(self):
+        return {
+            'lr':0.1, 
+            'momentum':0.9, 
+            'weight_decay':0,
+            'eta':0.001
+        }
+    
+    def load_settings(self, defaults):
+        self.lr = defaults['lr']
+        self.m = defaults['momentum']
+        self.l2 = defaults['weight_decay']
+        self.eta = defaults['eta']
+
+    def step(self):
+        # the trust ratio needs the norms of each parameter, hence the parameters are updated one by one
+        for var in self.parameters():
+            var.grad = _dense(var.grad)
+            self.update(var.data, var.grad, self.state('v', var))
+
+    def update(self, data, grad, v):
+        w_norm, g_norm = _norm(data), _norm(grad)
+        trust = self.eta * w_norm / (g_norm + self.l2 * w_norm + self.eps) if w_norm > 0 and g_norm > 0 else 1
+        tmp = self.scratch(grad)
+        np.multiply(data, self.l2, out=tmp)
+        np.add(tmp, grad, out=tmp)
+        np.multiply(tmp, self.lr * trust, out=tmp)
+        np.multiply(v, self.m, out=v)
+        np.add(v, tmp, out=v)
+        np.subtract(data, v, out=data)
+
+class LAMB(Adam):
+    '''Implements LAMB (layer-wise adaptive moments) for large-batch training.\n
+    The Adam update r of each parameter, with the weight decay added to it, is scaled by the trust ratio ||w||/||r||.
+    Args:
+        parameters (iterable): iterable of parameters to optimize
+        lr (float): learning rate Default: 1e-03
+        betas (tuple of float): coefficients used for computing running averages of gradient and its square Default: (0.9, 0.999)
+        eps (float): for numerical stability Default: 1e-06
+        weight_decay (float): decoupled weight decay Default: 0
+    '''
+    def __init__(self, parameters, lr=0.001, betas=(0.9, 0.999), eps=1e-06, weight_decay=0):
+        super().__init__(parameters, lr, betas, eps, weight_decay)
+
+    def step(self):
+        self.t += 1
+        for var in self.parameters():
+            var.grad = _dense(var.grad)
+            self.update(var.data, var.grad, self.state('m', var), self.state('v', var))
+
+    def update(self, data, grad, m, v):
+        tmp = self.scratch(grad)
+        _moments(grad, m, v, tmp, self.betas)
+        np.multiply(v, 1/(1-self.betas[1]**self.t), out=tmp)
+        np.sqrt(tmp, out=tmp)
+        np.add(tmp, self.eps, out=tmp)
+        np.divide(m, tmp, out=tmp)
+        np.multiply(tmp, 1/(1-self.betas[0]**self.t), out=tmp)
+        if self.l2 != 0:
+            decay = self.scratch(grad, 1)
+            np.multiply(data, self.l2, out=decay)
+            np.add(tmp, decay, out=tmp)
+        w_norm, r_norm = _norm(data), _norm(tmp)
+        trust = w_norm / r_norm if w_norm > 0 and r_norm > 0 else 1
+        np.multiply(tmp, self.lr * trust, out=tmp)
+        np.subtract(data, tmp, out=data)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from ..core import *
+import math
+
+class Scheduler(object):
+    '''Learning rate scheduler base class\n
+    A scheduler sets the lr of the optimizer at every call of step, and can be attached to any Optimizer.
+    The lr rises linearly from base_lr/warmup to base_lr over the first warmup steps, and then follows the schedule of the subclass.
+    util.Trainer calls step after every optimizer step if interval is 'step', or after every epoch if interval is 'epoch'.
+    Args:
+        optim (Optimizer): optimizer to schedule the lr of
+        warmup (int): number of warmup steps. Default: 0
+        interval (str): 'step' or 'epoch'. Default: 'step'
+    '''
+    def __init__(self, optim, warmup=0, interval='step'):
+        if interval not in ['step', 'epoch']:
+            raise ValueError('[*] interval should be either \'step\' or \'epoch\', got {}.'.format(interval))
+        self.optim = optim
+        self.base_lr = optim.lr
+        self.warmup = warmup
+        self.interval = interval
+        self.t = 0
+        self.optim.lr = self.get_lr(0)
+
+    def __repr__(self):
+        return '{}(base_lr={}, warmup={}, interval={}) at 0x{:0{}X}'.format(self.__class__.__name__, self.base_lr, self.warmup, self.interval, id(self), 16)
+
+    def __str__(self):
+        return self.__class__.__name__
+
+    def get_lr(self, t):
+        if t < self.warmup:
+            return self.base_lr * (t+1) / self.warmup
+        return self.schedule(t - self.warmup)
+
+    def schedule(self, t):
+        raise NotImplementedError
+
+    def step(self):
+        self.t += 1
+        self.optim.lr = self.get_lr(self.t)
+
+    def state_dict(self):
+        '''Returns a dictionary containing a whole state of the scheduler.
+        '''
+        return {key: value for key, value in vars(self).items() if isinstance(value, (bool, int, float, str))}
+
+    def load_state_dict(self, state_dict):
+        '''Copies the state from state_dict into this scheduler and sets the lr of the optimizer accordingly.
+        '''
+        for key, value in state_dict.items():
+            current = getattr(self, key, None)
+            # HDF5 gives back numpy scalars
+            setattr(self, key, type(current)(value) if current is not None else value)
+        self.optim.lr = self.get_lr(self.t)
+
+class StepLR(Scheduler):
+    '''Decays the lr by gamma every step_size steps after the warmup.\n
+    Args:
+        optim (Optimizer): optimizer to schedule the lr of
+        step_size (int): period of the decay
+        gamma (float): factor of the decay. Default: 0.1
+        warmup (int): number of warmup steps. Default: 0
+        interval (str): 'step' or 'epoch'. Default: 'epoch'
+    '''
+    def __init__(self, optim, step_size, gamma=0.1, warmup=0, interval='epoch'):
+        self.step_size = step_size
+        self.gamma = gamma
+        super().__init__(optim, warmup, interval)
+
+    def schedule(self, t):
+        return self.base_lr * self.gamma ** (t // self.step_size)
+
+class CosineAnnealingLR(Scheduler):
+    '''Anneals the lr from base_lr to min_lr with a half cosine from the end of the warmup to total steps.\n
+    Args:
+        optim (Optimizer): optimizer to schedule the lr of
+        total (int): number of steps of the whole schedule including the warmup
+        min_lr (float): final lr. Default: 0
+        warmup (int): number of warmup steps. Default: 0
+        interval (str): 'step' or 'epoch'. Default: 'step'
+    '''
+    def __init__(self, optim, total, min_lr=0, warmup=0, interval='step'):
+        self.total = total
+        self.min_lr = min_lr
+        super().__init__(optim, warmup, interval)
+
+    def schedule(self, t):
+        progress = min(t / max(self.total - self.warmup, 1), 1)
+        return self.min_lr + (self.base_lr - self.min_lr) * (1 + math.cos(math.pi * progress)) / 2
+
+class OneCycleLR(Scheduler):
+    '''Implements the 1cycle policy.\n
+    The lr rises from max_lr/div_factor to max_lr over the first pct_start of the total steps, which serves as the warmup,
+    and then anneals to max_lr/(div_factor*final_div_factor), both with a half cosine.
+    Args:
+        optim (Optimizer): optimizer to schedule the lr of
+        max_lr (float): peak lr
+        total (int): number of steps of the whole schedule
+        pct_start (float): fraction of the steps that rise the lr. Default: 0.3
+        div_factor (float): max_lr/div_factor is the initial lr. Default: 25
+        final_div_factor (float): max_lr/(div_factor*final_div_factor) is the final lr. Default: 1e4
+        interval (str): 'step' or 'epoch'. Default: 'step'
+    '''
+    def __init__(self, optim, max_lr, total, pct_start=0.3, div_factor=25, final_div_factor=1e4, interval='step'):
+        self.max_lr = max_lr
+        self.total = total
+        self.rise = max(int(pct_start * total), 1)
+        self.initial_lr = max_lr / div_factor
+        self.final_lr = self.initial_lr / final_div_factor
+        super().__init__(optim, 0, interval)
+
+    def schedule(self, t):
+        if t < self.rise:
+            start, end, progress = self.initial_lr, self.max_lr, t / self.rise
+        else:
+            start, end, progress = self.max_lr, self.final_lr, min((t - self.rise) / max(self.total - self.rise, 1), 1)
+        return end + (start - end) * (1 + math.cos(math.pi * progress)) / 2
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*- 
-from ..core import ValueAgent, np
+from ..core import ValueAgent, np, no_grad
 from ..util import Trainer
 
 class DDQN(ValueAgent):
@@ -16,8 +16,9 @@ class DDQN(ValueAgent):
         self.target.eval()
         state, next_state, reward, action, done = experience
         state_action_value = self.model(state).gather(1, action) 
-        action_next = np.argmax(self.model(next_state).data, axis=1).reshape(-1,1)
-        next_state_action_value = self.target(next_state).gather(1, action_next) 
+        with no_grad():
+            action_next = np.argmax(self.model(next_state).data, axis=1).reshape(-1,1)
+            next_state_action_value = self.target(next_state).gather(1, action_next) 
         next_state_action_value[done] = 0
         target_action_value = reward + gamma * next_state_action_value
         return state_action_value, target_action_value.detach()
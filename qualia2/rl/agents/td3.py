@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*- 
-from ..core import ActorCriticAgent, np, Tensor
+from ..core import ActorCriticAgent, np, Tensor, no_grad
 from ...functions import minimum, mse_loss, mean
 from ..util import Trainer, Experience
 import numpy
@@ -36,17 +36,18 @@ class TD3(ActorCriticAgent):
 
     def get_train_signal(self, experience, max_action, policy_noise, noise_clip, gamma=0.9):
         state, next_state, reward, action, done = experience
-        # Select next action according to target policy:
-        noise = Tensor(np.random.normal(0, policy_noise, size=action.shape))
-        noise = noise.clamp(-noise_clip, noise_clip)
-        next_action = self.actor_target(next_state) + noise
-        next_action = next_action.clamp(-max_action, max_action)
+        with no_grad():
+            # Select next action according to target policy:
+            noise = Tensor(np.random.normal(0, policy_noise, size=action.shape))
+            noise = noise.clamp(-noise_clip, noise_clip)
+            next_action = self.actor_target(next_state) + noise
+            next_action = next_action.clamp(-max_action, max_action)
 
-        # Compute target Q-value:
-        target_Q1 = self.critic_target(next_state, next_action)
-        target_Q2 = self.critic2_target(next_state, next_action)
-        target_Q = minimum(target_Q1, target_Q2)
-        target_Q = (reward + (1-Tensor(done)) * gamma * target_Q).detach()
+            # Compute target Q-value:
+            target_Q1 = self.critic_target(next_state, next_action)
+            target_Q2 = self.critic2_target(next_state, next_action)
+            target_Q = minimum(target_Q1, target_Q2)
+            target_Q = (reward + (1-Tensor(done)) * gamma * target_Q).detach()
         return state, Tensor(action), target_Q
 
     def update_critic1(self, state, action, target):
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*- 
 from ..core import *
-from ..autograd import Tensor
+from ..autograd import Tensor, no_grad
 from ..functions import huber_loss, amax, mse_loss
 import random
 import numpy
@@ -75,7 +75,8 @@ class BaseAgent(object):
         state, next_state, reward, action, done = experience
         # get state action value
         state_action_value = self.model(state).gather(1, action) 
-        next_state_action_value = amax(self.model(next_state), axis=1)
+        with no_grad():
+            next_state_action_value = amax(self.model(next_state), axis=1)
         next_state_action_value[done] = 0
         target_action_value = reward + gamma * next_state_action_value
         return state_action_value, target_action_value.detach()
@@ -103,7 +104,8 @@ class ValueAgent(BaseAgent):
             return numpy.random.choice(self.actions)
         else:
             self.model.eval()
-            return numpy.argmax(self.model(observation.reshape(1,-1), *args).asnumpy())
+            with no_grad():
+                return numpy.argmax(self.model(observation.reshape(1,-1), *args).asnumpy())
     
 class PolicyAgent(BaseAgent):
     ''' PolicyAgent \n
@@ -117,7 +119,8 @@ class PolicyAgent(BaseAgent):
             return numpy.random.choice(self.actions)
         else:
             self.model.eval()
-            return numpy.random.choice(self.actions, p=self.model(observation.reshape(1,-1), *args).asnumpy())
+            with no_grad():
+                return numpy.random.choice(self.actions, p=self.model(observation.reshape(1,-1), *args).asnumpy())
 
 class ActorCriticAgent(BaseAgent):
     ''' ActorCriticAgent \n
@@ -149,7 +152,8 @@ class ActorCriticAgent(BaseAgent):
         self.critic_optim = optim(self.critic.params, **kwargs)
 
     def policy(self, observation, *args, eps=None):
-        return self.actor(observation).asnumpy()
+        with no_grad():
+            return self.actor(observation).asnumpy()
     
     def save(self, filename):
         self.actor.save(filename+'_actor')
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*- 
 from . import to_cpu
 from .core import *
-from .autograd import Tensor
+from .autograd import Tensor, no_grad, get_default_dtype, set_default_dtype
 from functools import reduce
 import sys
 import random
 import time
+import h5py as h5
+import _pickle as pickle
+import gzip
+import numpy
+import multiprocessing
 from datetime import timedelta
 import matplotlib.pyplot as plt
 from logging import getLogger
@@ -18,12 +23,18 @@ def numerical_grad(fn, tensor, *args, **kwargs):
     return np.divide(np.subtract(h1.data, h2.data), 2*delta)
 
 def check_function(fn, *args, domain=(-1e3,1e3), **kwargs):
-    arr = np.random.random_sample((100,100))
-    x = Tensor(domain[0]*arr+domain[1]*(1-arr))
-    out = fn(x, *args, **kwargs)
-    out.backward()
-    a_grad = x.grad
-    n_grad = numerical_grad(fn, x, *args, **kwargs)
+    # the numerical gradient needs double precision regardless of the default dtype
+    dtype = get_default_dtype()
+    set_default_dtype('float64')
+    try:
+        arr = np.random.random_sample((100,100))
+        x = Tensor(domain[0]*arr+domain[1]*(1-arr))
+        out = fn(x, *args, **kwargs)
+        out.backward()
+        a_grad = x.grad
+        n_grad = numerical_grad(fn, x, *args, **kwargs)
+    finally:
+        set_default_dtype(dtype)
     sse = np.sum(np.power(np.subtract(a_grad, n_grad),2))
     print('[*] measured error: ', sse)
     assert sse < 1e-10
@@ -71,13 +82,19 @@ class Trainer(object):
         self.batch = batch
         self.path = path
         self.losses = []
+        # the losses of the steps of the current epoch, which a mid-epoch checkpoint carries over
+        self.train_loss = []
+        self.epoch = 0
+        self.checkpoint = None
+        self.interval = None
+        self.scheduler = None
         self.data_transformer = lambda x:x
         self.label_transformer = lambda x:x
     
     def __repr__(self):
         print('{}'.format(self.__class__.__name__))
     
-    def train(self, model, dataloader, optim, criterion, epochs=200, filename=None):
+    def train(self, model, dataloader, optim, criterion, epochs=200, filename=None, checkpoint=None, interval=None, scheduler=None):
         ''' trainer helps the training process of supervised learning
         Args: 
             model (Module): model to train 
@@ -86,10 +103,126 @@ class Trainer(object):
             criterion (Function): loss function to use 
             epochs (int): number of epochs
             filename (string): specify the filename as well as the loading path without the file extension. (ex) path/to/filename
+            checkpoint (string): path to the checkpoint file. If it exists, the training resumes from it, 
+                and it is overwritten at the end of every epoch. Default: None
+            interval (int): the checkpoint is also saved every interval steps within an epoch if given. Default: None
+            scheduler (Scheduler): learning rate scheduler of optim, which steps per iteration or per epoch according to its interval. Default: None
         ''' 
         self.before_train(dataloader, model, filename)
+        self.epoch = 0
+        self.train_loss = []
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.scheduler = scheduler
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.epoch = self.load_checkpoint(checkpoint, model, optim, dataloader)
+            logger.info('[*] training resumed from epoch {}.'.format(self.epoch+1))
         self.train_routine(model, dataloader, optim, criterion, epochs)
         self.after_train()
+
+    def save_checkpoint(self, filename, model, optim, dataloader, epoch, version=0):
+        '''Saves a checkpoint to resume the training from, which bundles the model, the optimizer, the scheduler given to train, the epoch, 
+        the losses of the epochs and of the steps of the current epoch, the states of the random number generators and the position of the dataloader if it has state_dict.\n
+        The file is written next to filename and then renamed over it, hence a preemption while saving keeps the last checkpoint. 
+        Args: 
+            filename (str): path to the checkpoint file
+            model (Module): model to save
+            optim (Optimizer): optimizer to save
+            dataloader (DataLoader): dataloader to save the position of
+            epoch (int): number of the epochs completed
+            version (int): version for the way of saving. version 1 saves a gzipped pickle like Module.save. 
+        '''
+        loader = dataloader.state_dict() if hasattr(dataloader, 'state_dict') else {}
+        tmp = filename + '.tmp'
+        if version == 1:
+            with gzip.open(tmp, 'wb') as f:
+                pickle.dump({
+                    'model': model.state_dict(),
+                    'optim': optim.state_dict(),
+                    'epoch': epoch,
+                    'losses': self.losses,
+                    'train_loss': self.train_loss,
+                    'rng': get_rng_state(),
+                    'dataloader': loader,
+                    'scheduler': self.scheduler.state_dict() if self.scheduler is not None else {}
+                }, f, -1)
+        elif version == 0:
+            with h5.File(tmp, 'w') as file:
+                model.__save__(file.create_group('model'))
+                optim.__save__(file.create_group('optim'))
+                file.attrs['epoch'] = epoch
+                file.create_dataset('losses', data=numpy.array(self.losses, dtype='float64'))
+                file.create_dataset('train_loss', data=numpy.array(self.train_loss, dtype='float64'))
+                file.attrs['rng'] = numpy.void(pickle.dumps(get_rng_state(), -1))
+                grp = file.create_group('dataloader')
+                for key, value in loader.items():
+                    if isinstance(value, (bool, int)):
+                        grp.attrs[key] = value
+                    else:
+                        grp.create_dataset(key, data=to_cpu(value))
+                grp = file.create_group('scheduler')
+                if self.scheduler is not None:
+                    for key, value in self.scheduler.state_dict().items():
+                        grp.attrs[key] = value
+        os.replace(tmp, filename)
+
+    def load_checkpoint(self, filename, model, optim, dataloader, version=0):
+        '''Restores a checkpoint saved by save_checkpoint. The dataloader resumes the epoch at the saved position at its next iteration.
+        Args: 
+            filename (str): path to the checkpoint file
+            model (Module): model to load
+            optim (Optimizer): optimizer to load
+            dataloader (DataLoader): dataloader to restore the position of
+            version (int): version for the way of saving. 
+        Returns:
+            (int): number of the epochs completed
+        '''
+        if version == 1:
+            with gzip.open(filename, 'rb') as f:
+                checkpoint = pickle.load(f)
+            model.load_state_dict(checkpoint['model'])
+            optim.load_state_dict(checkpoint['optim'])
+            epoch = checkpoint['epoch']
+            losses = checkpoint['losses']
+            train_loss = checkpoint.get('train_loss', [])
+            rng = checkpoint['rng']
+            loader = checkpoint['dataloader']
+            scheduler = checkpoint.get('scheduler', {})
+        elif version == 0:
+            with h5.File(filename, 'r') as file:
+                model.__load__(file['model'])
+                optim.__load__(file['optim'])
+                epoch = int(file.attrs['epoch'])
+                losses = numpy.array(file['losses']).tolist()
+                train_loss = numpy.array(file['train_loss']).tolist() if 'train_loss' in file else []
+                rng = pickle.loads(file.attrs['rng'].tobytes())
+                loader = dict(file['dataloader'].attrs.items())
+                for key in file['dataloader'].keys():
+                    loader[key] = np.array(file['dataloader'][key])
+                scheduler = dict(file['scheduler'].attrs.items()) if 'scheduler' in file else {}
+        self.losses = list(losses)
+        self.train_loss = list(train_loss)
+        set_rng_state(rng)
+        if loader and hasattr(dataloader, 'load_state_dict'):
+            dataloader.load_state_dict(loader)
+        if scheduler and self.scheduler is not None:
+            self.scheduler.load_state_dict(scheduler)
+        return epoch
+
+    def step_scheduler(self, interval):
+        '''Steps the scheduler given to train if it is scheduled per interval, either 'step' or 'epoch'.
+        '''
+        if self.scheduler is not None and self.scheduler.interval == interval:
+            self.scheduler.step()
+
+    def save_progress(self, model, optim, dataloader, epoch, step=None):
+        '''Saves the checkpoint given to train at the end of an epoch, or every interval steps if step is given.
+        '''
+        if self.checkpoint is None:
+            return
+        if step is not None and (self.interval is None or (step+1) % self.interval != 0):
+            return
+        self.save_checkpoint(self.checkpoint, model, optim, dataloader, epoch)
         
     def before_train(self, dataloader, model, filename):
         self.data_name = str(dataloader)
@@ -118,18 +251,23 @@ class Trainer(object):
 
     def train_routine(self, model, dataloader, optim, criterion, epochs=200):
         start = time.time()
-        for epoch in range(epochs):
+        for epoch in range(self.epoch, epochs):
             self.before_episode(dataloader, model)
-            tmp_loss = []
+            tmp_loss = self.train_loss
             for i, (data, label) in enumerate(dataloader): 
                 output = model(self.data_transformer(data)) 
                 loss = criterion(output, self.label_transformer(label))
                 optim.zero_grad()
                 loss.backward()
                 optim.step()
-                progressbar(i, len(dataloader), 'epoch: {}/{} train loss:{:.4f} '.format(epoch+1, epochs, to_cpu(loss.data) if gpu else loss.data), '(time: {})'.format(str(timedelta(seconds=time.time()-start))))
-                tmp_loss.append(to_cpu(loss.data) if gpu else loss.data)
+                self.step_scheduler('step')
+                tmp_loss.append(loss.data.item())
+                progressbar(i, len(dataloader), 'epoch: {}/{} train loss:{:.4f} '.format(epoch+1, epochs, tmp_loss[-1]), '(time: {})'.format(str(timedelta(seconds=time.time()-start))))
+                self.save_progress(model, optim, dataloader, epoch, i)
             self.after_episode(epoch+1, model, tmp_loss)
+            self.train_loss = []
+            self.step_scheduler('epoch')
+            self.save_progress(model, optim, dataloader, epoch+1)
 
     def after_episode(self, epoch, model, loss):
             if len(loss) > 0:
@@ -163,9 +301,10 @@ class Trainer(object):
         logger.info('[*] testing started.')
         acc = 0
         for i, (data, label) in enumerate(dataloader): 
-            output = model(self.data_transformer(data)) 
+            with no_grad():
+                output = model(self.data_transformer(data)) 
             out = np.argmax(output.data, axis=1) 
-            ans = np.argmax(label.data, axis=1)
+            ans = label.data if label.ndim == 1 else np.argmax(label.data, axis=1)
             acc += sum(out == ans)/label.shape[0]
             progressbar(i, len(dataloader))
         logger.info('\n[*] test acc: {:.2f}%'.format(float(acc/len(dataloader)*100)))
@@ -179,3 +318,170 @@ class Trainer(object):
             plt.savefig(filename)
         else: 
             plt.show()
+
+class TBPTTTrainer(Trainer):
+    ''' Trainer with truncated backpropagation through time for recurrent models on long sequences\n
+    The sequences of each batch are fed in chunks of k timesteps and the optimizer steps once per chunk. The hidden state is carried over 
+    to the next chunk detached from the graph, hence the graph only spans k timesteps and the memory stays bounded for any sequence length.
+    The model is called as model(x, *hidden) and should return (output, *hidden) as nn.RNN, nn.GRU and nn.LSTM do. 
+    The data and the label given by the transformers should be time-major, i.e. [seq_len, N, *].
+    Args:
+        batch (int): batch size
+        k (int): number of timesteps to backpropagate through
+        init_hidden (callable): returns the initial hidden state (or a tuple of them) given the batch size. 
+            Default: zeros of [num_layers, N, hidden_size] for each state of nn.RNN, nn.GRU and nn.LSTM
+        stream (bool): if True, the hidden state is carried over between the batches of an epoch as well, 
+            for dataloaders that yield the consecutive segments of the same streams. Default: False
+        path (str): path to save the weights and the train curve. Default: None
+    '''
+    def __init__(self, batch, k, init_hidden=None, stream=False, path=None):
+        super().__init__(batch, path)
+        self.k = k
+        self.init_hidden = init_hidden
+        self.stream = stream
+
+    def initial_hidden(self, model, batch):
+        if self.init_hidden is not None:
+            hidden = self.init_hidden(batch)
+            return tuple(hidden) if isinstance(hidden, (tuple, list)) else (hidden,)
+        from .nn.modules.recurrent import LSTM
+        num_states = 2 if isinstance(model, LSTM) else 1
+        return tuple(Tensor(np.zeros((model.num_layers, batch, model.hidden_size))) for _ in range(num_states))
+
+    def train_routine(self, model, dataloader, optim, criterion, epochs=200):
+        start = time.time()
+        for epoch in range(self.epoch, epochs):
+            self.before_episode(dataloader, model)
+            tmp_loss = self.train_loss
+            hidden = None
+            for i, (data, label) in enumerate(dataloader): 
+                data = self.data_transformer(data)
+                label = self.label_transformer(label)
+                if hidden is None or not self.stream:
+                    hidden = self.initial_hidden(model, data.shape[1])
+                for t in range(0, data.shape[0], self.k):
+                    # chunks are cut from the arrays, since slicing the Tensors would backpropagate into the whole sequence
+                    output, *hidden = model(Tensor(data.data[t:t+self.k], requires_grad=False), *hidden)
+                    loss = criterion(output, Tensor(label.data[t:t+self.k], requires_grad=False))
+                    optim.zero_grad()
+                    loss.backward()
+                    optim.step()
+                    self.step_scheduler('step')
+                    hidden = [h.detach() for h in hidden]
+                    tmp_loss.append(loss.data.item())
+                progressbar(i, len(dataloader), 'epoch: {}/{} train loss:{:.4f} '.format(epoch+1, epochs, tmp_loss[-1]), '(time: {})'.format(str(timedelta(seconds=time.time()-start))))
+                self.save_progress(model, optim, dataloader, epoch, i)
+            self.after_episode(epoch+1, model, tmp_loss)
+            self.train_loss = []
+            self.step_scheduler('epoch')
+            self.save_progress(model, optim, dataloader, epoch+1)
+
+class DataParallelTrainer(Trainer):
+    ''' Data-parallel trainer over local processes\n
+    The trainer forks workers-1 processes that hold a replica of the model each, and runs the replica of rank 0 in this process. 
+    Every batch is split into one shard per replica, and the gradients of the shards are summed through a buffer in shared memory: 
+    each replica sums its own slice of the flat gradients of all the replicas (reduce-scatter) and then copies the whole result back 
+    (all-gather), hence every replica takes the same optimizer step and the replicas stay identical. The replicas are summed in a fixed 
+    order, hence a run is deterministic given the seed. 
+    The model is flattened (see Module.flatten). The losses of qualia2 backpropagate the gradient of each sample without dividing it by the batch size, 
+    hence the sum over the shards is the gradient of the whole batch, and the loss shown is the mean of the shard losses weighted by their sizes. 
+    Only rank 0 shows the progress and saves the weights and the checkpoints, and the model in this process holds the trained weights. 
+    Each process has its own BLAS threads, hence OMP_NUM_THREADS should be about the number of cores divided by workers. 
+    Args:
+        batch (int): batch size, which is split among the replicas
+        workers (int): number of replicas. Default: os.cpu_count()
+        seed (int): seed of the random number generators. Default: 0
+        path (str): path to save the weights and the train curve. Default: None
+    '''
+    def __init__(self, batch, workers=None, seed=0, path=None):
+        super().__init__(batch, path)
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.seed = seed
+        self.rank = 0
+
+    def train(self, model, dataloader, optim, criterion, epochs=200, filename=None, checkpoint=None, interval=None, scheduler=None):
+        if gpu:
+            raise Exception('[*] DataParallelTrainer only supports CPU processes.')
+        manual_seed(self.seed)
+        super().train(model, dataloader, optim, criterion, epochs, filename, checkpoint, interval, scheduler)
+
+    def train_routine(self, model, dataloader, optim, criterion, epochs=200):
+        ctx = multiprocessing.get_context('fork')
+        if model.flat_grad is None:
+            model.flatten()
+        size, dtype = model.flat_grad.size, model.flat_grad.dtype
+        # the losses of two consecutive steps, the gradient of each replica and the reduced gradient
+        offset = 2*self.workers*8
+        shared = ctx.RawArray('b', offset + (self.workers+1)*size*dtype.itemsize)
+        losses = numpy.frombuffer(shared, dtype='float64', count=2*self.workers).reshape(2, self.workers)
+        grads = [numpy.frombuffer(shared, dtype=dtype, count=size, offset=offset+k*size*dtype.itemsize) for k in range(self.workers+1)]
+        barrier = ctx.Barrier(self.workers)
+        # the replicas draw different dropout masks from generators seeded by rank 0
+        seeds = get_generator().integers(1<<62, size=self.workers)
+        args = (model, dataloader, optim, criterion, epochs, barrier, grads, losses)
+        processes = [ctx.Process(target=self.worker, args=(rank, seeds[rank])+args) for rank in range(1, self.workers)]
+        for process in processes:
+            process.start()
+        try:
+            self.worker(0, seeds[0], *args)
+        finally:
+            for process in processes:
+                process.join()
+            # detaches the model from the shared buffer
+            model.flatten()
+        failed = sum(process.exitcode != 0 for process in processes)
+        if failed > 0:
+            raise RuntimeError('[*] {} of the workers failed.'.format(failed))
+
+    def worker(self, rank, seed, model, dataloader, optim, criterion, epochs, barrier, grads, losses):
+        self.rank = rank
+        get_generator().bit_generator.state = numpy.random.default_rng(seed).bit_generator.state
+        model.flatten(grads[rank])
+        result = grads[-1]
+        lo, hi = result.size*rank//self.workers, result.size*(rank+1)//self.workers
+        start = time.time()
+        step = 0
+        try:
+            for epoch in range(self.epoch, epochs):
+                self.before_episode(dataloader, model)
+                tmp_loss = self.train_loss
+                for i, (data, label) in enumerate(dataloader): 
+                    data = self.data_transformer(data)
+                    label = self.label_transformer(label)
+                    a, b = data.shape[0]*rank//self.workers, data.shape[0]*(rank+1)//self.workers
+                    optim.zero_grad()
+                    loss = losses[step % 2]
+                    loss[rank] = 0
+                    if b > a:
+                        output = model(Tensor(data.data[a:b], requires_grad=False, dtype=data.dtype))
+                        shard = criterion(output, Tensor(label.data[a:b], requires_grad=False, dtype=label.dtype))
+                        shard.backward()
+                        # the loss is averaged over the shard while its gradient is summed
+                        loss[rank] = shard.data.item()*(b-a)/data.shape[0]
+                    barrier.wait()
+                    np.copyto(result[lo:hi], grads[0][lo:hi])
+                    for k in range(1, self.workers):
+                        np.add(result[lo:hi], grads[k][lo:hi], out=result[lo:hi])
+                    barrier.wait()
+                    np.copyto(model.flat_grad, result)
+                    optim.step()
+                    self.step_scheduler('step')
+                    # the losses of this step are overwritten two steps later, after every replica has passed the next barrier
+                    tmp_loss.append(float(loss.sum()))
+                    step += 1
+                    if rank == 0:
+                        progressbar(i, len(dataloader), 'epoch: {}/{} train loss:{:.4f} '.format(epoch+1, epochs, tmp_loss[-1]), '(time: {})'.format(str(timedelta(seconds=time.time()-start))))
+                    self.save_progress(model, optim, dataloader, epoch, i)
+                if rank == 0:
+                    self.after_episode(epoch+1, model, tmp_loss)
+                self.train_loss = []
+                self.step_scheduler('epoch')
+                self.save_progress(model, optim, dataloader, epoch+1)
+        except BaseException:
+            # releases the other replicas waiting at the barrier
+            barrier.abort()
+            raise
+
+    def save_progress(self, model, optim, dataloader, epoch, step=None):
+        if self.rank == 0:
+            super().save_progress(model, optim, dataloader, epoch, step)